@@ -1,29 +1,95 @@
 """
-Launch script for Pocket Friends.
+Launch script for Pocket Friends. Only the modules needed by the selected mode are imported, which keeps startup fast on
+the Raspberry Pi.
 """
 import os
 from pathlib import Path
-import pygame
 import sys
-from pocket_friends.game_files.game import main as game_main
-from pocket_friends.development.dev_menu import main as dev_menu_main
 
 if __name__ == '__main__':
     enable_dev = False
+    enable_benchmark = False
+    enable_trace = False
+    startup_profile = None
+    idle_time = 60
+    idle_display = 'blank'
+    screen_size = 320
+    scale_filter = None
+    save_backend = 'json'
+    export_path = None
+    record_path = None
+    replay_path = None
+    framebuffer = None
+    framebuffer_size = None
 
     # enable dev mode if --dev argument is passed
     if len(sys.argv) > 0:
         for args in sys.argv:
             if args == '--dev':
                 enable_dev = True
+            if args == '--benchmark':
+                enable_benchmark = True
+            if args == '--trace':
+                enable_trace = True
             if args == '--delete-save':
                 save_dir = os.path.join(Path.home(), '.pocket_friends')
-                os.remove(save_dir + '/save.json')
+                for save_file in ['save.json', 'save.journal', 'save.checkpoint.json']:
+                    if os.path.exists(save_dir + '/' + save_file):
+                        os.remove(save_dir + '/' + save_file)
+            if args == '--journal':
+                save_backend = 'journal'
+            if args.startswith('--export-save='):
+                export_path = args.split('=', 1)[1]
+            if args.startswith('--record='):
+                record_path = args.split('=', 1)[1]
+            if args.startswith('--replay='):
+                replay_path = args.split('=', 1)[1]
+            if args.startswith('--framebuffer='):
+                framebuffer = args.split('=', 1)[1]
+            if args.startswith('--framebuffer-size='):
+                framebuffer_size = tuple(int(side) for side in args.split('=', 1)[1].split('x'))
+            if args.startswith('--screen-size='):
+                screen_size = int(args.split('=', 1)[1])
+            if args.startswith('--filter='):
+                scale_filter = args.split('=', 1)[1]
+            if args.startswith('--idle-time='):
+                idle_time = args.split('=', 1)[1]
+                idle_time = None if idle_time == 'never' else float(idle_time)
+            if args == '--idle-dim':
+                idle_display = 'dim'
+            if args == '--startup-profile':
+                from pocket_friends.development.startup_profile import StartupProfile
+                startup_profile = StartupProfile()
+                startup_profile.install()
 
-    if not enable_dev:
-        game_main()
+    if export_path is not None:
+        # Write the current save out as plain JSON, wherever it is stored, without changing the save itself.
+        from pocket_friends.game_files.game import DataHandler
+        from pocket_friends.game_files.save_writer import save_writer
+        data_handler = DataHandler(save_backend)
+        try:
+            data_handler.read_save(read_only=True)
+        except FileNotFoundError:
+            print('There is no save to export.', file=sys.stderr)
+            sys.exit(1)
+        data_handler.export_save(export_path)
+        save_writer.flush()
+    elif enable_benchmark:
+        from pocket_friends.development.benchmark import main as benchmark_main
+        benchmark_main()
+    elif replay_path is not None:
+        from pocket_friends.development.replay import main as replay_main
+        replay_main()
+    elif not enable_dev:
+        from pocket_friends.game_files.game import main as game_main
+        game_main(screen_size, scale_filter, enable_trace, idle_time, idle_display, save_backend,
+                  startup_profile.frame_shown if startup_profile is not None else None, record_path, framebuffer,
+                  framebuffer_size)
     else:
+        from pocket_friends.development.dev_menu import main as dev_menu_main
         dev_menu_main()
 
-    pygame.quit()
+    # Pygame is only shut down if something started it.
+    if 'pygame' in sys.modules:
+        sys.modules['pygame'].quit()
     sys.exit()
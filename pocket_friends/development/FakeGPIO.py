@@ -8,6 +8,11 @@ BOARD = 0
 IN = 0
 FALLING = 0
 
+# Callbacks added with add_event_detect, by channel.
+_callbacks = {}
+# Channels that have had an event since event_detected was last called on them.
+_detected = set()
+
 
 def setmode(new_mode):
     """
@@ -30,27 +35,58 @@ def setup(channel, mode, initial=None, pull_up_down=None):
 
 def add_event_detect(channel, edge_type, callback=None, bouncetime=0):
     """
-    Fake function to add a non-existent event detect.
+    Fake function to add an event detect. Events only happen when trigger() is called.
     :param channel:
     :param edge_type:
     :param callback:
     :param bouncetime:
     """
-    pass
+    _callbacks[channel] = callback
+
+
+def remove_event_detect(channel):
+    """
+    Fake function to remove an event detect.
+    :param channel:
+    """
+    _callbacks.pop(channel, None)
+    _detected.discard(channel)
 
 
 def event_detected(channel):
     """
-    Fake function to detect an event. Always returns false.
+    Fake function to detect an event. Returns true only if trigger() has been called on the channel since the last
+    time this was called.
     :param channel:
     :return:
     """
+    if channel in _detected:
+        _detected.discard(channel)
+        return True
     return False
 
 
+def trigger(channel):
+    """
+    Fakes an edge on a channel, as if a button was pressed. Does nothing if there is no event detect on the channel.
+    :param channel: the channel the edge happened on
+    """
+    if channel not in _callbacks:
+        return
+
+    _detected.add(channel)
+    callback = _callbacks[channel]
+    if callback is not None:
+        callback(channel)
+
+
 def cleanup(channel=None):
     """
     Fake cleanup function.
     :param channel:
     """
-    pass
+    if channel is None:
+        _callbacks.clear()
+        _detected.clear()
+    else:
+        remove_event_detect(channel)
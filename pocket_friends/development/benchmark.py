@@ -0,0 +1,241 @@
+"""
+Headless benchmark for the game loop. Runs the game on SDL's dummy video driver with no frame rate limit, drives it
+through every game state by pressing buttons for it, and reports the frame rate and frame time percentiles of each
+state as JSON. With --trace, also reports the time each state spends blitting onto the game surface every frame. Works
+on any machine, no display or Raspberry Pi needed.
+"""
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+# Keep pygame's greeting out of the JSON printed on stdout.
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+import pygame
+import pocket_friends
+from pocket_friends.game_files.assets import asset_cache
+from pocket_friends.game_files.input_bus import input_bus
+from pocket_friends.game_files.prefetch import prefetcher
+from pocket_friends.game_files.save_writer import save_writer
+from pocket_friends.game_files.tracing import tracer
+from pocket_friends.hardware.gpio_handler import GPIOHandler
+import pocket_friends.game_files.game as game
+
+# The states that are benchmarked, and the key that moves the game on to the next state from each one. States without
+# a key move on by themselves.
+states = {
+    'title': None,
+    'init': None,
+    'egg_select': pygame.K_a,  # Open the info screen of the selected egg.
+    'bloop_info': pygame.K_a,  # Pick the egg and go to the playground.
+    'playground': pygame.K_b,  # Open the popup menu.
+    'playground_popup': pygame.K_a,  # Open a submenu that does not exist yet, which shows the error screen.
+    'error': pygame.K_b,  # Go back to the title screen.
+}
+
+
+def percentile(values, percent):
+    """
+    Gets a percentile of a sorted list of values using the nearest rank method.
+    :param values: sorted list of values
+    :param percent: the percentile to get, from 0 to 100
+    :return: the value at the percentile
+    """
+    rank = max(int(round(percent / 100 * len(values) + 0.5)) - 1, 0)
+    return values[min(rank, len(values) - 1)]
+
+
+class Driver:
+    """
+    Frame hook for the game that times every frame and presses the buttons needed to move through every state.
+    """
+
+    def __init__(self, frames):
+        self.frames = frames  # Number of frames to time in each state.
+        self.times = {state: [] for state in states}  # Frame times in seconds of each state.
+        self.blits = {state: [] for state in states}  # Seconds spent blitting each frame of each state, if traced.
+        self.popup = False  # Whether the popup menu on the playground is open.
+        self.pressed = None  # The state a button was pressed in last frame.
+        self.last_frame = None
+
+    def state(self, game_state, submenu):
+        """
+        Gets the name of the benchmarked state from the game state and submenu.
+        :param game_state: the state of the game
+        :param submenu: the submenu of the game state
+        :return: the name of the benchmarked state
+        """
+        if game_state == 'egg_select' and submenu in ('main', 'bloop_info'):
+            return 'egg_select' if submenu == 'main' else 'bloop_info'
+        if game_state == 'playground' and submenu == 'main':
+            return 'playground_popup' if self.popup else 'playground'
+        if game_state in ('title', 'init'):
+            return game_state
+
+        # Anything else is either the error screen or about to become it.
+        return 'error'
+
+    def __call__(self, game_state, submenu):
+        now = time.perf_counter()
+
+        # A button press is handled during the next frame, which is still drawn by the state it was pressed in.
+        if self.pressed is not None:
+            state = self.pressed
+            self.pressed = None
+        else:
+            state = self.state(game_state, submenu)
+
+        if self.last_frame is not None:
+            self.times[state].append(now - self.last_frame)
+
+            # The background, the scene and the sprites are everything blitted onto the game surface.
+            if tracer.enabled:
+                self.blits[state].append(tracer.last('draw_bg') + tracer.last('render') + tracer.last('compose'))
+        self.last_frame = now
+
+        if all(len(times) >= self.frames for times in self.times.values()):
+            return False
+
+        # Move on to the next state once enough frames have been timed in this one.
+        state = self.state(game_state, submenu)
+        key = states[state]
+        if key is not None and len(self.times[state]) >= self.frames:
+            pygame.event.post(pygame.event.Event(pygame.KEYDOWN, {'key': key}))
+            self.pressed = state
+
+            if state == 'playground':
+                self.popup = True
+            elif state == 'playground_popup':
+                self.popup = False
+
+        return True
+
+    def report(self):
+        """
+        Summarises the frame times of every state.
+        :return: dictionary of the frame count, frame rate and frame time percentiles of every state, and the mean
+        blit time of every state if traced
+        """
+        report = {}
+        for state, times in self.times.items():
+            if not times:
+                continue
+
+            times = sorted(times)
+            mean = sum(times) / len(times)
+            report[state] = {
+                'frames': len(times),
+                'fps': round(1 / mean, 1) if mean > 0 else None,
+                'mean_ms': round(mean * 1000, 3),
+                'p50_ms': round(percentile(times, 50) * 1000, 3),
+                'p90_ms': round(percentile(times, 90) * 1000, 3),
+                'p99_ms': round(percentile(times, 99) * 1000, 3),
+                'max_ms': round(times[-1] * 1000, 3),
+            }
+
+            blits = self.blits[state]
+            if blits:
+                report[state]['mean_blit_us'] = round(sum(blits) / len(blits) * 1000000, 3)
+        return report
+
+
+def run(frames=300, screen_size=320, scale_filter=None, framebuffer=None, framebuffer_size=None, trace=False):
+    """
+    Runs the benchmark.
+    :param frames: number of frames to time in each state
+    :param screen_size: the resolution of the display
+    :param scale_filter: pixel art filter to apply when upscaling
+    :param framebuffer: framebuffer device or file to draw straight into, or None to draw with SDL
+    :param framebuffer_size: (width, height) of the framebuffer if it is a plain file
+    :param trace: True to trace every frame, which also times the blits of every frame
+    :return: dictionary of the results
+    """
+    os.environ['SDL_VIDEODRIVER'] = 'dummy'
+    os.environ['SDL_AUDIODRIVER'] = 'dummy'
+
+    driver = Driver(frames)
+
+    # Use a save directory of its own so that the real save is left alone.
+    real_save_dir = game.save_dir
+    with tempfile.TemporaryDirectory() as save_dir:
+        game.save_dir = save_dir
+        start = time.perf_counter()
+        try:
+            game.game(screen_size, scale_filter, fps=0, title_time=0, frame_hook=driver, trace=trace, idle_time=None,
+                      framebuffer=framebuffer, framebuffer_size=framebuffer_size)
+        finally:
+            game.save_dir = real_save_dir
+        elapsed = time.perf_counter() - start
+
+    total_frames = sum(len(times) for times in driver.times.values())
+
+    results = {
+        'version': pocket_friends.__version__,
+        'python': platform.python_version(),
+        'pygame': pygame.version.ver,
+        'machine': platform.machine(),
+        'screen_size': screen_size,
+        'filter': scale_filter,
+        'framebuffer': framebuffer,
+        'trace': trace,
+        'frames': total_frames,
+        'seconds': round(elapsed, 3),
+        'fps': round(total_frames / elapsed, 1),
+        'states': driver.report(),
+        'asset_cache': asset_cache.stats(),
+        'save_writer': save_writer.stats(),
+        'prefetch': prefetcher.stats(),
+        'input': input_bus.stats(),
+    }
+
+    GPIOHandler.teardown()
+    asset_cache.clear()
+    tracer.enabled = False
+    pygame.quit()
+
+    return results
+
+
+def main():
+    """
+    Runs the benchmark with the options given on the command line and prints the results.
+    """
+    frames = 300
+    screen_size = 320
+    scale_filter = None
+    framebuffer = None
+    framebuffer_size = None
+    trace = False
+    output = None
+
+    for args in sys.argv[1:]:
+        if args.startswith('--frames='):
+            frames = int(args.split('=', 1)[1])
+        if args.startswith('--screen-size='):
+            screen_size = int(args.split('=', 1)[1])
+        if args.startswith('--filter='):
+            scale_filter = args.split('=', 1)[1]
+        if args.startswith('--framebuffer='):
+            framebuffer = args.split('=', 1)[1]
+        if args.startswith('--framebuffer-size='):
+            framebuffer_size = tuple(int(side) for side in args.split('=', 1)[1].split('x'))
+        if args == '--trace':
+            trace = True
+        if args.startswith('--output='):
+            output = args.split('=', 1)[1]
+
+    results = json.dumps(run(frames, screen_size, scale_filter, framebuffer, framebuffer_size, trace), indent=2)
+
+    if output is None:
+        print(results)
+    else:
+        with open(output, 'w') as output_file:
+            output_file.write(results + '\n')
+            output_file.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -39,12 +39,15 @@ def button_test():
         if exit_code == input_log:
             running = False
 
+    # Names of the buttons by their pin number.
+    button_names = {code: button for button, code in Constants.buttons.items()}
+
     while running:
-        for button in Constants.buttons:
-            code = Constants.buttons.get(button)
-            if GPIOHandler.get_press(code): # If a button is pressed, print it out and do a quit check.
-                print('event: {0}'.format(button))
-                log(button)
-                check_exit()
+        # Sleep until a button is pressed, then print it out and do a quit check.
+        code, _ = GPIOHandler.wait_for_press()
+        button = button_names.get(code)
+        print('event: {0}'.format(button))
+        log(button)
+        check_exit()
 
     GPIOHandler.teardown()
@@ -8,6 +8,7 @@ import pygame
 import time
 from .button_test import button_test
 from .menus import Menu
+from ..game_files.tracing import tracer
 from ..hardware.gpio_handler import GPIOHandler, Constants
 
 try:
@@ -46,6 +47,49 @@ def start_game():
     GPIOHandler.setup()
 
 
+def start_game_traced():
+    """
+    Starts the hardware with the frame time overlay and tracing turned on.
+    """
+    GPIOHandler.teardown()
+    pocket_friends.game_files.game.main(trace=True)
+    pygame.quit()
+    GPIOHandler.setup()
+
+
+def dump_trace():
+    """
+    Writes the frame trace of the last traced game to "trace.json" in the save directory.
+    """
+    pocket_friends.game_files.game.make_save_dir()
+    path = pocket_friends.game_files.game.save_dir + '/trace.json'
+    tracer.dump(path)
+    clear_screen()
+    print('{0} spans written to {1}'.format(tracer.count, path))
+    time.sleep(2)
+
+
+def button_stats():
+    """
+    Shows the presses and bounces of every button and how long presses took to be handled, then waits for a press.
+    """
+    stats = GPIOHandler.stats()
+    clear_screen()
+
+    print('Button  Presses  Bounces')
+    for button in Constants.buttons:
+        print('{0:<6}  {1:>7}  {2:>7}'.format(button, stats['presses'][button], stats['bounces'][button]))
+    print('Dropped: {0}'.format(stats['dropped']))
+
+    print('\nLatency (ms)')
+    for bucket, count in stats['latency_ms'].items():
+        print('{0:>6}  {1}'.format(bucket, count))
+    print('Max: {0}'.format(stats['max_latency_ms']))
+
+    print('\nPress any button to go back.')
+    GPIOHandler.wait_for_press()
+
+
 def quit_menu():
     """
     Quits the menu.
@@ -95,7 +139,10 @@ def main():
 
     main_menu = Menu('Pocket Friends Dev Menu')
     main_menu.add_option(Menu.Option('Start Game', start_game))
+    main_menu.add_option(Menu.Option('Start Game With Trace', start_game_traced))
+    main_menu.add_option(Menu.Option('Dump Frame Trace', dump_trace))
     main_menu.add_option(Menu.Option('Button Test', run_button_test))
+    main_menu.add_option(Menu.Option('Button Stats', button_stats))
     main_menu.add_option(Menu.Option('Restart Dev Menu', quit_with_error))
     main_menu.add_option(Menu.Option('Shutdown Pi', change_menu, 'shutdown'))
     main_menu.add_option(Menu.Option('Restart Pi', change_menu, 'restart'))
@@ -124,16 +171,16 @@ def main():
 
         while True:  # Main GPIO input loop
 
-            # Limits how often the program checks for a GPIO input. Eases CPU usage.
-            time.sleep(0.125)
+            # Sleep until a button is pressed.
+            pressed_button, _ = GPIOHandler.wait_for_press()
 
-            if GPIOHandler.get_press(Constants.buttons.get('j_d')):
+            if pressed_button == Constants.buttons.get('j_d'):
                 current_menu.select_next()
                 break
-            if GPIOHandler.get_press(Constants.buttons.get('j_u')):
+            if pressed_button == Constants.buttons.get('j_u'):
                 current_menu.select_prev()
                 break
-            if GPIOHandler.get_press(Constants.buttons.get('a')):
+            if pressed_button == Constants.buttons.get('a'):
                 current_menu.run_selection()
                 break
 
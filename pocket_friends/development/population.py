@@ -0,0 +1,292 @@
+"""
+Batch simulator for tuning the contentedness and metabolism of bloops. Runs the same rules as the game on a whole
+population of virtual bloops at once using NumPy arrays, with scripted care policies standing in for the players, and
+reports the lifespan, missed care and outcome of each species and policy as JSON. Needs NumPy, which the game itself
+does not.
+"""
+from concurrent.futures import ProcessPoolExecutor
+import json
+import os
+import sys
+import time
+import pocket_friends
+from pocket_friends.game_files import simulation
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+bloop_info_dir = os.path.join(script_dir, '..', 'game_files', 'resources', 'data', 'bloop_info')
+
+# Hours of the day that the players of each policy look after their bloop. A fraction is the chance of checking on it
+# in each of those hours instead of always doing so.
+policies = {
+    'attentive': (range(7, 23), 1.0),  # Every waking hour.
+    'school_day': ((7, 12, 16, 19, 22), 1.0),  # Before school, at lunch, after school, at dinner and before bed.
+    'forgetful': (range(7, 23), 0.25),  # Now and then while awake.
+    'weekly': ((18,), 1 / 7),  # About once a week.
+}
+
+# Fraction of care checks missed for each outcome, checked in order. Bloops that run out of health are counted as died.
+outcomes = {
+    'thriving': 0.05,
+    'healthy': 0.2,
+    'struggling': 1.0,
+}
+
+
+def advance_hour(state, alive, hunger_drop, happiness_drop):
+    """
+    Runs an hour of the game rules on every living bloop at once, ending on a care check. Gives the same result as
+    simulation.catch_up() with decay on over that hour, but on arrays of attributes. Every bloop must have hatched.
+    :param state: dictionary of attribute arrays, changed in place
+    :param alive: boolean array of the bloops that are still alive. The attributes of the others are left alone.
+    :param hunger_drop: how much hunger drops during the hour, which is the same for every bloop of a species
+    :param happiness_drop: how much happiness drops during the hour
+    """
+    hunger = state['hunger']
+    happiness = state['happiness']
+
+    # Bloops that have died stay as they were when they died.
+    hunger -= hunger_drop * alive
+    np.maximum(hunger, 0, out=hunger)
+    happiness -= happiness_drop * alive
+    np.maximum(happiness, 0, out=happiness)
+
+    # There is exactly one care check in the hour, at the end of it, so it is missed if either stat has run out.
+    missed = (hunger == 0) | (happiness == 0)
+    missed &= alive
+    state['missed_care'] += missed
+    state['health'] -= missed
+    state['care_counter'] += alive & ~missed
+
+    state['age'] += simulation.care_period
+
+
+def check(species, hours, seed):
+    """
+    Checks advance_hour() against the rules of the game, by running the same hours on single bloops with
+    simulation.catch_up() and decay on.
+    :param species: dictionary with the metabolism and contentedness of the species
+    :param hours: how many hours to check, each with bloops of every hunger and happiness
+    :param seed: seed for the random ages the hours start at
+    :return: the number of bloops whose attributes came out differently
+    """
+    rng = np.random.default_rng(seed)
+    names = ('health', 'hunger', 'happiness', 'care_counter', 'missed_care')
+    hunger_period = simulation.hunger_period(species)
+    happiness_period = simulation.happiness_period(species)
+
+    differences = 0
+    for age in rng.integers(0, 24 * 365, hours) * simulation.care_period:
+        # Every pair of hunger and happiness from 0 to 10, the range the care policies keep them in.
+        hunger, happiness = np.divmod(np.arange(121), 11)
+        state = {name: np.full(121, 5, dtype=np.int32) for name in names}
+        state['hunger'][:] = hunger
+        state['happiness'][:] = happiness
+        state['age'] = int(age)
+
+        expected = []
+        for i in range(121):
+            attributes = {name: int(state[name][i]) for name in names}
+            attributes.update({'age': int(age), 'time_elapsed': 0, 'bloop': 'check', 'evolution_stage': 'baby'})
+            simulation.catch_up(attributes, simulation.care_period, species, decay=True)
+            expected.append([attributes[name] for name in names])
+
+        end = age + simulation.care_period
+        advance_hour(state, np.ones(121, dtype=bool), end // hunger_period - age // hunger_period,
+                     end // happiness_period - age // happiness_period)
+        differences += int(np.count_nonzero((np.array(expected).T != [state[name] for name in names]).any(axis=0)))
+
+    return differences
+
+
+def simulate(species, policy, bloops, days, seed):
+    """
+    Simulates a population of bloops of one species looked after with one care policy.
+    :param species: dictionary with the metabolism and contentedness of the species
+    :param policy: the name of the care policy
+    :param bloops: how many bloops to simulate
+    :param days: how many days to simulate each bloop for
+    :param seed: seed for the random numbers used by the policy
+    :return: dictionary of the final attribute arrays, with the age each bloop died at in 'died' (-1 if it lived).
+    Bloops that died keep the attributes they had when they died.
+    """
+    rng = np.random.default_rng(seed)
+    hours, chance = policies[policy]
+    awake = np.zeros(24, dtype=bool)
+    awake[list(hours)] = True
+
+    # Newly hatched bloops. Stats never go above 10, so they fit in small integers.
+    state = {name: np.full(bloops, 10, dtype=np.int16) for name in ('health', 'hunger', 'happiness')}
+    for name in ('care_counter', 'missed_care'):
+        state[name] = np.zeros(bloops, dtype=np.int32)
+    # Every bloop has the same age, so the rules that depend on it are worked out once for all of them.
+    state['age'] = 0
+    died = np.full(bloops, -1, dtype=np.int64)
+    alive = np.ones(bloops, dtype=bool)
+
+    # Each bloop hatches at a random hour of the day. Work out which of them are looked after at each hour up front.
+    hatch_hour = rng.integers(0, 24, bloops)
+    schedule = [awake[(hatch_hour + hour) % 24] for hour in range(24)]
+
+    hunger_period = simulation.hunger_period(species)
+    happiness_period = simulation.happiness_period(species)
+
+    # Run an hour at a time so that every step ends on a care check, then let the players care for their bloops.
+    for hour in range(days * 24):
+        start = state['age']
+        end = start + simulation.care_period
+        advance_hour(state, alive, end // hunger_period - start // hunger_period,
+                     end // happiness_period - start // happiness_period)
+
+        dead = alive & (state['health'] == 0)
+        died[dead] = state['age']
+        alive &= ~dead
+        if not alive.any():
+            break
+
+        cared = alive & schedule[(hour + 1) % 24]
+        if chance < 1:
+            cared &= rng.random(bloops) < chance
+        state['hunger'][cared] = 10
+        state['happiness'][cared] = 10
+
+    state['died'] = died
+    return state
+
+
+def summarise(state):
+    """
+    Turns the final state of a population into distributions.
+    :param state: dictionary of the final attribute arrays from simulate()
+    :return: dictionary of the lifespan, missed care and outcome distributions. Lifespans of bloops that lived to the
+    end are counted as the number of days simulated.
+    """
+    died = state['died']
+    lifespan = np.where(died >= 0, died, state['age'])
+    missed = state['missed_care']
+    missed_fraction = missed / np.maximum(lifespan // simulation.care_period, 1)
+    lifespan_days = lifespan / 86400
+
+    counts = {'died': int(np.count_nonzero(died >= 0))}
+    remaining = died < 0
+    for outcome, limit in outcomes.items():
+        match = remaining & (missed_fraction <= limit)
+        counts[outcome] = int(np.count_nonzero(match))
+        remaining &= ~match
+
+    def distribution(values):
+        percentiles = np.percentile(values, [10, 50, 90])
+        return {
+            'mean': round(float(values.mean()), 3),
+            'p10': round(float(percentiles[0]), 3),
+            'p50': round(float(percentiles[1]), 3),
+            'p90': round(float(percentiles[2]), 3),
+        }
+
+    return {
+        'lifespan_days': distribution(lifespan_days),
+        'missed_care': distribution(missed),
+        'outcomes': {outcome: round(count / len(died), 4) for outcome, count in counts.items()},
+    }
+
+
+def run_species(args):
+    """
+    Simulates every care policy for one species. Takes a single tuple so it can be handed to a process pool.
+    :param args: tuple of the species name, its info, the number of bloops and days, and the seed
+    :return: tuple of the species name and a dictionary of the summary for each policy
+    """
+    name, species, bloops, days, seed = args
+    results = {}
+    for i, policy in enumerate(policies):
+        results[policy] = summarise(simulate(species, policy, bloops, days, seed + i))
+    return name, results
+
+
+def load_species():
+    """
+    Reads the contentedness and metabolism of every species in the bloop_info folder.
+    :return: dictionary of the info of each species by name
+    """
+    species = {}
+    for file_name in sorted(os.listdir(bloop_info_dir)):
+        if file_name.endswith('.json'):
+            with open(os.path.join(bloop_info_dir, file_name), 'r') as info_file:
+                info = json.load(info_file)
+                info_file.close()
+            species[file_name[:-5]] = {'contentedness': info['contentedness'], 'metabolism': info['metabolism']}
+    return species
+
+
+def grid():
+    """
+    Makes made up species for every combination of contentedness and metabolism from 1 to 5.
+    :return: dictionary of the info of each species by name
+    """
+    return {'c{0}_m{1}'.format(contentedness, metabolism): {'contentedness': contentedness, 'metabolism': metabolism}
+            for contentedness in range(1, 6) for metabolism in range(1, 6)}
+
+
+def main():
+    """
+    Simulates every species and prints the results.
+    """
+    if np is None:
+        print('The population simulator needs NumPy. Install it with "pip install numpy".', file=sys.stderr)
+        sys.exit(1)
+
+    bloops = 10000
+    days = 30
+    workers = 1
+    seed = 0
+    species = None
+    check_rules = False
+
+    for args in sys.argv[1:]:
+        if args.startswith('--bloops='):
+            bloops = int(args.split('=', 1)[1])
+        if args.startswith('--days='):
+            days = int(args.split('=', 1)[1])
+        if args.startswith('--workers='):
+            workers = int(args.split('=', 1)[1])
+        if args.startswith('--seed='):
+            seed = int(args.split('=', 1)[1])
+        if args == '--sweep':
+            species = grid()
+        if args == '--check':
+            check_rules = True
+
+    if species is None:
+        species = load_species()
+
+    jobs = [(name, info, bloops, days, seed + i * len(policies)) for i, (name, info) in enumerate(species.items())]
+
+    start = time.perf_counter()
+    if workers > 1:
+        with ProcessPoolExecutor(workers) as pool:
+            results = dict(pool.map(run_species, jobs))
+    else:
+        results = dict(map(run_species, jobs))
+
+    report = {
+        'version': pocket_friends.__version__,
+        'bloops': bloops,
+        'days': days,
+        'workers': workers,
+        'seconds': round(time.perf_counter() - start, 3),
+        'species': {name: dict(species[name], policies=results[name]) for name in species},
+    }
+
+    # Make sure the arrays still follow the rules of the game, in case either has changed since.
+    if check_rules:
+        report['check'] = {name: check(info, 100, seed) for name, info in species.items()}
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
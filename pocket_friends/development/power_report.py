@@ -0,0 +1,87 @@
+"""
+Measures how much of the CPU the game uses in each power mode. Runs the playground headlessly at the normal frame rate
+with a bloop that moves (active), with an egg (reduced frame rate) and with nobody pressing anything (idle), and prints
+the CPU utilisation of each as JSON.
+"""
+import json
+import os
+import sys
+import tempfile
+import threading
+
+# Keep pygame's greeting out of the JSON printed on stdout.
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+import pygame
+import pocket_friends
+from pocket_friends.game_files.assets import asset_cache
+from pocket_friends.game_files.power import power_manager
+from pocket_friends.hardware.gpio_handler import GPIOHandler
+import pocket_friends.game_files.game as game
+
+# The scenarios that are measured, as the evolution stage of the bloop, the idle time and the power mode to report.
+scenarios = {
+    'active': ('baby', None, 'active'),
+    'reduced': ('egg', None, 'reduced'),
+    'idle': ('baby', 1, 'idle'),
+}
+
+
+def measure(evolution_stage, idle_time, seconds):
+    """
+    Runs the playground with a bloop at the given evolution stage for a number of seconds.
+    :param evolution_stage: the evolution stage of the bloop
+    :param idle_time: seconds without input before going idle, or None to never go idle
+    :param seconds: how long to run the game for
+    :return: the utilisation report of the power manager
+    """
+    real_save_dir = game.save_dir
+    with tempfile.TemporaryDirectory() as save_dir:
+        game.save_dir = save_dir
+
+        data_handler = game.DataHandler()
+        data_handler.attributes.update({'bloop': 'dev_egg', 'evolution_stage': evolution_stage, 'health': 10,
+                                        'hunger': 10, 'happiness': 10})
+        data_handler.write_save(wait=True)
+
+        # Quit the game once the time is up. Posting events is safe from other threads.
+        timer = threading.Timer(seconds, pygame.event.post, [pygame.event.Event(pygame.QUIT)])
+        timer.start()
+
+        try:
+            game.game(title_time=0, idle_time=idle_time)
+        finally:
+            timer.cancel()
+            game.save_dir = real_save_dir
+
+    report = power_manager.utilisation()
+
+    GPIOHandler.teardown()
+    asset_cache.clear()
+    pygame.quit()
+
+    return report
+
+
+def main():
+    """
+    Measures every scenario and prints the results.
+    """
+    seconds = 10
+
+    for args in sys.argv[1:]:
+        if args.startswith('--seconds='):
+            seconds = float(args.split('=', 1)[1])
+
+    os.environ['SDL_VIDEODRIVER'] = 'dummy'
+    os.environ['SDL_AUDIODRIVER'] = 'dummy'
+
+    results = {'version': pocket_friends.__version__, 'seconds': seconds, 'modes': {}}
+    for name, (evolution_stage, idle_time, mode) in scenarios.items():
+        results['modes'][name] = measure(evolution_stage, idle_time, seconds)[mode]
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,187 @@
+"""
+Plays back a game recorded with --record. The game is run on SDL's dummy video driver with no frame rate limit, on the
+times and button presses of the recording, so a long session plays back much faster than it was played. Reports the
+frame times of the playback and the slowest frames as JSON, and can write a hash of every frame drawn, or compare them
+against the hashes of an earlier playback to check that a change does not alter what ends up on screen.
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+
+# Keep pygame's greeting out of the JSON printed on stdout.
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+import pygame
+import pocket_friends
+from pocket_friends.development.benchmark import percentile
+from pocket_friends.game_files.assets import asset_cache
+from pocket_friends.game_files.save_writer import write_atomic
+from pocket_friends.game_files.timeline import ReplayTimeline, read_recording
+from pocket_friends.hardware.gpio_handler import GPIOHandler
+import pocket_friends.game_files.game as game
+
+
+class Driver:
+    """
+    Frame hook for the game that times every frame and stops the game once the recording is over.
+    """
+
+    def __init__(self, timeline):
+        self.timeline = timeline
+        self.times = []  # Frame time in seconds of every frame.
+        self.states = []  # Game state of every frame.
+        self.last_frame = None
+
+    def __call__(self, game_state, submenu):
+        now = time.perf_counter()
+        if self.last_frame is not None:
+            self.times.append(now - self.last_frame)
+            self.states.append(game_state)
+        self.last_frame = now
+
+        return not self.timeline.done()
+
+    def report(self, slowest=10):
+        """
+        Summarises the frame times.
+        :param slowest: the number of slowest frames to list
+        :return: dictionary of the frame time percentiles and the slowest frames
+        """
+        if not self.times:
+            return {}
+
+        times = sorted(self.times)
+        worst = sorted(range(len(self.times)), key=lambda frame: self.times[frame], reverse=True)[:slowest]
+        return {
+            'mean_ms': round(sum(times) / len(times) * 1000, 3),
+            'p50_ms': round(percentile(times, 50) * 1000, 3),
+            'p99_ms': round(percentile(times, 99) * 1000, 3),
+            'max_ms': round(times[-1] * 1000, 3),
+
+            # Frame numbers count from 0 at the first frame drawn, like the lines of the hashes file.
+            'slowest': [{'frame': frame + 1, 'state': self.states[frame], 'ms': round(self.times[frame] * 1000, 3)}
+                        for frame in worst],
+        }
+
+
+def compare(hashes, path):
+    """
+    Compares the hashes of every frame against the hashes written by an earlier playback.
+    :param hashes: list of the hash of every frame
+    :param path: the file of hashes to compare against
+    :return: dictionary of the first frame that differs and the number of frames that differ
+    """
+    with open(path, 'r') as hash_file:
+        expected = hash_file.read().split()
+        hash_file.close()
+
+    differing = [frame for frame in range(max(len(hashes), len(expected)))
+                 if frame >= len(hashes) or frame >= len(expected) or hashes[frame] != expected[frame]]
+    return {
+        'first_difference': differing[0] if differing else None,
+        'differing_frames': len(differing),
+    }
+
+
+def run(path, hashes=False):
+    """
+    Plays back a recording.
+    :param path: the recording file
+    :param hashes: True to hash every frame drawn
+    :return: tuple of the dictionary of the results and the list of frame hashes, or None if not hashed
+    """
+    os.environ['SDL_VIDEODRIVER'] = 'dummy'
+    os.environ['SDL_AUDIODRIVER'] = 'dummy'
+
+    header, steps = read_recording(path)
+    loaded = next((step for step in steps if step.attributes is not None), None)
+    if loaded is None:
+        raise ValueError('{0} ends before the title finished loading'.format(path))
+
+    timeline = ReplayTimeline(steps, hashes)
+    driver = Driver(timeline)
+
+    # Start from the save as it was once loaded. It has already been caught up on the time the game was off, so the
+    # time it was last seen is cleared to not catch it up again.
+    attributes = dict(loaded.attributes)
+    attributes['last_seen'] = 0
+
+    real_save_dir = game.save_dir
+    with tempfile.TemporaryDirectory() as save_dir:
+        game.save_dir = save_dir
+        write_atomic(save_dir + '/save.json', json.dumps(attributes))
+
+        start = time.perf_counter()
+        try:
+            game.game(header['screen_size'], header['filter'], fps=0, title_time=header['title_time'],
+                      frame_hook=driver, idle_time=header['idle_time'], timeline=timeline)
+        finally:
+            game.save_dir = real_save_dir
+        elapsed = time.perf_counter() - start
+
+    recorded = steps[-1].us / 1000000 if steps else 0.0
+    results = {
+        'version': pocket_friends.__version__,
+        'recorded_version': header['version'],
+        'steps': timeline.position,
+        'recorded_steps': len(steps),
+        'frames': len(driver.times) + 1,
+        'seconds': round(elapsed, 3),
+        'recorded_seconds': round(recorded, 3),
+        'speedup': round(recorded / elapsed, 1) if elapsed > 0 else None,
+        'diverged': timeline.diverged,
+        'frame_times': driver.report(),
+    }
+
+    GPIOHandler.teardown()
+    asset_cache.clear()
+    pygame.quit()
+
+    return results, timeline.hashes
+
+
+def main():
+    """
+    Plays back the recording given on the command line and prints the results.
+    """
+    path = None
+    hashes_path = None
+    compare_path = None
+    output = None
+
+    for args in sys.argv[1:]:
+        if args.startswith('--replay='):
+            path = args.split('=', 1)[1]
+        if args.startswith('--hashes='):
+            hashes_path = args.split('=', 1)[1]
+        if args.startswith('--compare='):
+            compare_path = args.split('=', 1)[1]
+        if args.startswith('--output='):
+            output = args.split('=', 1)[1]
+
+    if path is None:
+        print('Usage: --replay=<recording> [--hashes=<file>] [--compare=<file>] [--output=<file>]')
+        return
+
+    results, hashes = run(path, hashes_path is not None or compare_path is not None)
+
+    if compare_path is not None:
+        results['hashes'] = compare(hashes, compare_path)
+    if hashes_path is not None:
+        with open(hashes_path, 'w') as hash_file:
+            hash_file.write('\n'.join(hashes) + '\n')
+            hash_file.close()
+
+    results = json.dumps(results, indent=2)
+    if output is None:
+        print(results)
+    else:
+        with open(output, 'w') as output_file:
+            output_file.write(results + '\n')
+            output_file.close()
+
+
+if __name__ == '__main__':
+    main()
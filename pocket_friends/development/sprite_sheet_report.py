@@ -0,0 +1,81 @@
+"""
+Reports the load time and pixel memory of every sprite sheet in the game, both with frames copied into their own
+surfaces and with frames that are views into the sprite sheet.
+"""
+import os
+import statistics
+import time
+import pygame
+from pocket_friends.game_files.assets import AssetCache, asset_cache
+from pocket_friends.game_files.game import SpriteSheet, script_dir
+
+
+def find_sheets():
+    """
+    Finds every sprite sheet under the images directory. A sprite sheet is a png file with a json file next to it.
+    :return: list of (png path, json path) tuples
+    """
+    sheets = []
+    for directory, _, files in sorted(os.walk(script_dir + '/resources/images')):
+        for file in sorted(files):
+            name, extension = os.path.splitext(file)
+            if extension == '.png' and name + '.json' in files:
+                sheets.append((os.path.join(directory, file), os.path.join(directory, name + '.json')))
+    return sheets
+
+
+def measure(sheet, copy_frames, repeats):
+    """
+    Loads a sprite sheet from disk and touches every frame of it.
+    :param sheet: (png path, json path) tuple of the sprite sheet
+    :param copy_frames: passed on to SpriteSheet
+    :param repeats: how many times to load the sheet
+    :return: tuple of the median load time in milliseconds and the bytes of pixel data held
+    """
+    times = []
+    memory = 0
+
+    for _ in range(repeats):
+        asset_cache.clear()
+
+        start = time.perf_counter()
+        sprite_sheet = SpriteSheet(sheet[0], sheet[1], copy_frames)
+        frames = [image for image in sprite_sheet.images]
+        times.append((time.perf_counter() - start) * 1000)
+
+        # Views share the pixels of the sprite sheet, copies have pixels of their own.
+        memory = AssetCache.surface_size(sprite_sheet.sprite_sheet)
+        for frame in frames:
+            if frame.get_parent() is None:
+                memory += AssetCache.surface_size(frame)
+
+    return statistics.median(times), memory
+
+
+def main(repeats=25):
+    """
+    Prints the report for every sprite sheet.
+    :param repeats: how many times to load each sheet
+    """
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    pygame.display.init()
+    pygame.display.set_mode((1, 1))
+
+    print('{0:<40} {1:>7} {2:>11} {3:>11} {4:>10} {5:>10}'.format('sheet', 'frames', 'copy ms', 'view ms',
+                                                                  'copy bytes', 'view bytes'))
+
+    for sheet in find_sheets():
+        copy_time, copy_memory = measure(sheet, True, repeats)
+        view_time, view_memory = measure(sheet, False, repeats)
+        frames = len(SpriteSheet(sheet[0], sheet[1]).images)
+
+        print('{0:<40} {1:>7} {2:>11.3f} {3:>11.3f} {4:>10} {5:>10}'.format(
+            os.path.relpath(sheet[0], script_dir + '/resources/images'), frames, copy_time, view_time,
+            copy_memory, view_memory))
+
+    asset_cache.clear()
+    pygame.quit()
+
+
+if __name__ == '__main__':
+    main()
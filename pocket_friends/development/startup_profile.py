@@ -0,0 +1,97 @@
+"""
+Measures how long the game takes to start. Times every module imported while the game starts, and the time until the
+title is on screen. Turned on with the --startup-profile flag, which prints the report as JSON once the title is shown.
+"""
+import builtins
+import importlib.util
+import json
+import sys
+import time
+
+
+class StartupProfile:
+    """
+    Times imports by wrapping the built in import function. The time of each import does not include the modules it
+    imported itself, so the slow modules stand out.
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.first_frame = None  # Seconds from the start until the title was on screen.
+        self.imports = {}  # Seconds spent importing each module, not counting the modules it imported.
+
+        self._import = None  # The import function that was wrapped.
+        self._children = [0.0]  # Time spent in nested imports, one entry for each import in progress.
+
+    def install(self):
+        """
+        Starts timing imports.
+        """
+        self._import = builtins.__import__
+        builtins.__import__ = self._timed_import
+
+    def uninstall(self):
+        """
+        Stops timing imports.
+        """
+        if self._import is not None:
+            builtins.__import__ = self._import
+            self._import = None
+
+    def _timed_import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        """
+        Imports a module the same way as the built in import function, timing it if anything new is loaded.
+        """
+        loaded = len(sys.modules)
+        self._children.append(0.0)
+        start = time.perf_counter()
+        try:
+            return self._import(name, globals, locals, fromlist, level)
+        finally:
+            elapsed = time.perf_counter() - start
+            children = self._children.pop()
+            self._children[-1] += elapsed
+
+            # Imports of modules that were already loaded are not worth listing.
+            if len(sys.modules) > loaded:
+                module = self._module_name(name, globals, fromlist, level)
+                self.imports[module] = self.imports.get(module, 0.0) + elapsed - children
+
+    @staticmethod
+    def _module_name(name, globals, fromlist, level):
+        """
+        Gets the full name of the module an import statement imports.
+        :return: the module name
+        """
+        if level > 0 and globals is not None:
+            try:
+                name = importlib.util.resolve_name('.' * level + name, globals.get('__package__'))
+            except (ImportError, ValueError):
+                pass
+
+        # "from . import module" imports a module from the fromlist rather than the package named.
+        if fromlist and name in sys.modules and '{0}.{1}'.format(name, fromlist[0]) in sys.modules:
+            name = '{0}.{1}'.format(name, fromlist[0])
+
+        return name
+
+    def frame_shown(self):
+        """
+        Records that the title is on screen and prints the report. Passed to the game as its first frame function.
+        """
+        self.first_frame = time.perf_counter() - self.start
+        self.uninstall()
+        print(json.dumps(self.report(), indent=2))
+
+    def report(self, top=15):
+        """
+        Gets the startup times.
+        :param top: the number of slowest imports to list
+        :return: dictionary of the time to first frame, the total import time and the slowest imports, in milliseconds
+        """
+        slowest = sorted(self.imports.items(), key=lambda item: item[1], reverse=True)[:top]
+        return {
+            'first_frame_ms': round(self.first_frame * 1000, 1) if self.first_frame is not None else None,
+            'imports_ms': round(sum(self.imports.values()) * 1000, 1),
+            'slowest_imports_ms': {module: round(seconds * 1000, 2) for module, seconds in slowest},
+        }
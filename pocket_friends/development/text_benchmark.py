@@ -0,0 +1,154 @@
+"""
+Micro-benchmark for wrapping text. Wraps long descriptions with the 5Pts5 font using the old character by character
+algorithm and with the glyph width tables, checks that both give the same lines, and prints the timings as JSON.
+"""
+import json
+import os
+import random
+import sys
+import time
+
+# Keep pygame's greeting out of the JSON printed on stdout.
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+import pygame
+import pocket_friends
+from pocket_friends.game_files import text as text_module
+from pocket_friends.game_files.game import game_res, script_dir
+
+# Words the descriptions are made out of. Includes some long ones so that words get split across lines.
+words = ['bloop', 'is', 'a', 'happy', 'little', 'friend', 'who', 'likes', 'to', 'eat,', 'play', 'and', 'sleep.',
+         'They', 'are', 'very', 'easy', 'going!', 'Incomprehensibilities', 'supercalifragilistic', 'of', 'the']
+
+
+def old_wrap(font, text, max_line_width):
+    """
+    Wraps text the way InfoText used to, growing a line one character at a time and measuring it after every character.
+    :param font: the font the text is drawn with
+    :param text: the text to wrap
+    :param max_line_width: the maximum pixel width of a line
+    :return: list of the lines
+    """
+    lines = []
+    raw_text = text
+    cut_chars = '.,! '
+
+    if raw_text[-1:] not in cut_chars:
+        raw_text += ' '
+
+    while len(raw_text) > 0:
+        index = 0
+        test_text = ''
+
+        while True:
+            if index + 1 > len(raw_text):
+                index -= 1
+                break
+
+            test_text += raw_text[index]
+            text_width = font.size(test_text)[0]
+
+            if text_width > max_line_width:
+                break
+            index += 1
+
+        text_chunk = raw_text[0:index + 1]
+        has_breaks = any(cut_chars in text_chunk for cut_chars in cut_chars)
+
+        if has_breaks:
+            while raw_text[index] not in cut_chars:
+                index -= 1
+            text_chunk = raw_text[0:index + 1]
+        else:
+            index -= 1
+            text_chunk = raw_text[0:index + 1]
+            text_chunk += '-'
+
+        lines.append(text_chunk)
+        raw_text = raw_text[index + 1:]
+
+    return lines
+
+
+def description(length, rng):
+    """
+    Makes up a description out of random words.
+    :param length: the least number of characters in the description
+    :param rng: random number generator to pick the words with
+    :return: the description
+    """
+    text = ''
+    while len(text) < length:
+        text += rng.choice(words) + ' '
+    return text.strip()
+
+
+def time_call(function, repeats):
+    """
+    Times a function.
+    :param function: the function to call with no arguments
+    :param repeats: how many times to call it
+    :return: the mean time of a call in milliseconds
+    """
+    start = time.perf_counter()
+    for i in range(repeats):
+        function()
+    return (time.perf_counter() - start) / repeats * 1000
+
+
+def main():
+    """
+    Runs the benchmark and prints the results.
+    """
+    length = 4096
+    count = 20
+    repeats = 3
+
+    for args in sys.argv[1:]:
+        if args.startswith('--length='):
+            length = int(args.split('=', 1)[1])
+        if args.startswith('--count='):
+            count = int(args.split('=', 1)[1])
+
+    pygame.font.init()
+    font = pygame.font.Font(script_dir + '/resources/fonts/5Pts5.ttf', 10)
+    max_line_width = game_res - 4.5 * 2
+
+    rng = random.Random(0)
+    texts = [description(length, rng) for i in range(count)]
+
+    # Both algorithms have to give exactly the same lines.
+    for text in texts:
+        if list(text_module.wrap(font, text, max_line_width)) != old_wrap(font, text, max_line_width):
+            print('Wrapped lines differ for: {0}'.format(text), file=sys.stderr)
+            sys.exit(1)
+
+    def old():
+        for text in texts:
+            old_wrap(font, text, max_line_width)
+
+    def new():
+        text_module._fonts.clear()
+        for text in texts:
+            text_module.wrap(font, text, max_line_width)
+
+    def cached():
+        for text in texts:
+            text_module.wrap(font, text, max_line_width)
+
+    results = {
+        'version': pocket_friends.__version__,
+        'texts': count,
+        'characters': length,
+        'old_ms': round(time_call(old, repeats) / count, 4),
+        'new_ms': round(time_call(new, repeats) / count, 4),
+        'cached_ms': round(time_call(cached, repeats * 100) / count, 6),
+    }
+    results['speedup'] = round(results['old_ms'] / results['new_ms'], 1)
+    print(json.dumps(results, indent=2))
+
+    pygame.quit()
+
+
+if __name__ == '__main__':
+    main()
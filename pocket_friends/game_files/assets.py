@@ -0,0 +1,342 @@
+"""
+Module that handles loading the game's assets. Every image and data file is read from disk once and kept in a
+process-wide cache so that drawing a frame never has to decode a file again.
+
+Images are prepared for the surface the game is drawn on when they are loaded, so drawing them never converts pixels.
+Per-pixel alpha has to be blended on every blit, which is slow on the 16 bit displays the game runs on, so it is only
+kept for images with partly see through pixels. Images whose pixels are all either see through or opaque, which is
+most of the pixel art, are drawn with a colour key instead.
+"""
+from collections import OrderedDict
+from collections.abc import Sequence
+import json
+import threading
+import pygame
+from pygame.locals import RLEACCEL
+
+# Colours tried in turn as the colour key of an image, until one is found that the image does not use.
+colorkeys = [(255, 0, 255), (0, 255, 255), (255, 255, 0), (0, 255, 0), (1, 2, 3)]
+
+
+def accelerate(surface):
+    """
+    Turns on RLE acceleration of a colour keyed surface, so that runs of see through pixels are skipped as a whole when
+    it is drawn. Does nothing to surfaces without a colour key.
+    :param surface: the surface
+    """
+    colorkey = surface.get_colorkey()
+    if colorkey is not None:
+        surface.set_colorkey(colorkey, RLEACCEL)
+
+
+class AssetCache:
+    """
+    Keyed least recently used cache for images and JSON data. Images are prepared for the game surface once when
+    they are loaded, and the cache evicts the least recently used images once the memory budget is exceeded. Images
+    that are pinned, such as the ones of the scene on screen, are never evicted. JSON data can be read from any thread,
+    such as the workers that load the save while the title is up, so the cache is locked while it is used. Images can
+    only be loaded on the thread that owns the display.
+    """
+
+    def __init__(self, budget=8 * 1024 * 1024):
+        self.budget = budget  # Maximum number of bytes of image data to keep loaded.
+        self.used = 0  # Number of bytes of image data currently loaded.
+
+        # Counters used to see how well the cache is working.
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.prepared = {'opaque': 0, 'colorkey': 0, 'alpha': 0}  # Number of images prepared in each form.
+
+        self.format = None  # Surface in the pixel format images are prepared in, or None for the display format.
+        self._images = OrderedDict()  # Loaded images in order of least to most recently used.
+        self._data = {}  # Loaded JSON files.
+        self._pins = {}  # Number of times each pinned image has been pinned.
+        self._lock = threading.RLock()  # Held while the cache is read or changed.
+
+    @staticmethod
+    def surface_size(surface):
+        """
+        Gets the number of bytes of pixel data a surface takes up.
+        :param surface: the surface to be measured
+        :return: the size of the surface in bytes
+        """
+        return surface.get_pitch() * surface.get_height()
+
+    def set_format(self, surface):
+        """
+        Changes the pixel format images are prepared in. Images that were prepared in another format are thrown away,
+        and loaded again the next time they are asked for.
+        :param surface: a surface in the new format, usually the surface the game is drawn on. None for the display
+        format.
+        """
+        def layout(target):
+            return None if target is None else (target.get_bitsize(), target.get_masks())
+
+        with self._lock:
+            if layout(surface) != layout(self.format):
+                self._images.clear()
+                self.used = 0
+            self.format = surface
+
+    def prepare(self, surface, alpha=True):
+        """
+        Converts an image to the pixel format of the game surface in the fastest form that draws it the same. Images
+        without see through pixels are converted without alpha, and images with only fully see through and fully
+        opaque pixels are given a colour key that no opaque pixel uses, and RLE accelerated. Anything else keeps its
+        per-pixel alpha, which is always 32 bit.
+        :param surface: the image
+        :param alpha: False to convert without alpha no matter what the image holds
+        :return: the prepared surface
+        """
+        target = self.format if self.format is not None else pygame.display.get_surface()
+
+        opaque = pygame.mask.from_surface(surface, 254).count() if alpha else 0
+        if not alpha or opaque == surface.get_width() * surface.get_height():
+            self.prepared['opaque'] += 1
+            return surface.convert(target)
+
+        # Pixels that are neither fully see through nor fully opaque have to be blended.
+        if pygame.mask.from_surface(surface, 0).count() == opaque:
+            for colorkey in colorkeys:
+                prepared = pygame.Surface(surface.get_size(), 0, target)
+                prepared.fill(colorkey)
+                prepared.blit(surface, (0, 0))
+                prepared.set_colorkey(colorkey, RLEACCEL)
+
+                # The key is only usable if no opaque pixel came out in the colour of it, after being converted.
+                if pygame.mask.from_surface(prepared).count() == opaque:
+                    self.prepared['colorkey'] += 1
+                    return prepared
+
+        self.prepared['alpha'] += 1
+        return surface.convert_alpha()
+
+    def image(self, path, alpha=True):
+        """
+        Gets an image, loading it from disk and preparing it for the game surface if it is not already loaded.
+        :param path: the path to the image file
+        :param alpha: True to keep the see through pixels of the image, False to convert it without alpha
+        :return: the prepared surface. It is shared by all callers and should not be drawn on.
+        """
+        key = (path, alpha)
+
+        with self._lock:
+            try:
+                surface = self._images[key]
+            except KeyError:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._images.move_to_end(key)
+                return surface
+
+            return self.preload(path, pygame.image.load(path), alpha)
+
+    def preload(self, path, surface, alpha=True):
+        """
+        Puts an image that has already been decoded into the cache, preparing it for the game surface. Used for
+        images decoded on another thread, since converting has to be done on the thread that owns the display.
+        :param path: the path the image was loaded from
+        :param surface: the decoded image
+        :param alpha: True to keep the see through pixels of the image, False to convert it without alpha
+        :return: the prepared surface, or the one already in the cache if the image was loaded already
+        """
+        key = (path, alpha)
+
+        with self._lock:
+            if key in self._images:
+                return self._images[key]
+
+            surface = self.prepare(surface, alpha)
+
+            self._images[key] = surface
+            self.used += self.surface_size(surface)
+            self._evict()
+
+            return surface
+
+    def baked(self, key, bake):
+        """
+        Gets a surface drawn by the game instead of loaded from disk, drawing it if it is not already cached. Used to
+        share the surfaces of widgets that look the same. The surface is prepared for the game surface like an image.
+        :param key: a key that is the same for every surface that looks the same
+        :param bake: function that draws and returns the surface
+        :return: the prepared surface. It is shared by all callers and should not be drawn on.
+        """
+        key = ('baked', key)
+
+        with self._lock:
+            try:
+                surface = self._images[key]
+            except KeyError:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._images.move_to_end(key)
+                return surface
+
+            surface = self.prepare(bake())
+
+            self._images[key] = surface
+            self.used += self.surface_size(surface)
+            self._evict()
+
+            return surface
+
+    def pin(self, path, alpha=True):
+        """
+        Loads an image if it is not already loaded and keeps it from being evicted until it is unpinned. An image can
+        be pinned more than once, and stays pinned until it has been unpinned as many times.
+        :param path: the path to the image file
+        :param alpha: True to keep the see through pixels of the image, False to convert it without alpha
+        :return: the prepared surface
+        """
+        key = (path, alpha)
+
+        with self._lock:
+            self._pins[key] = self._pins.get(key, 0) + 1
+            return self.image(path, alpha)
+
+    def unpin(self, path, alpha=True):
+        """
+        Lets a pinned image be evicted again. The image stays loaded until the memory budget runs out.
+        :param path: the path to the image file
+        :param alpha: True if the image was pinned with alpha, False if not
+        """
+        key = (path, alpha)
+
+        with self._lock:
+            count = self._pins.get(key, 0) - 1
+            if count > 0:
+                self._pins[key] = count
+            else:
+                self._pins.pop(key, None)
+                self._evict()
+
+    def data(self, path):
+        """
+        Gets the parsed contents of a JSON file, reading it from disk if it is not already loaded.
+        :param path: the path to the JSON file
+        :return: the parsed JSON data. It is shared by all callers and should not be modified.
+        """
+        with self._lock:
+            try:
+                data = self._data[path]
+            except KeyError:
+                self.misses += 1
+            else:
+                self.hits += 1
+                return data
+
+        # The file is read without holding the lock, so other threads can use the cache in the meantime.
+        with open(path, 'r') as json_file:
+            data = json.load(json_file)
+            json_file.close()
+
+        # Another thread may have read the same file first, in which case its copy is the one that is shared.
+        with self._lock:
+            return self._data.setdefault(path, data)
+
+    def set_budget(self, budget):
+        """
+        Changes the memory budget of the cache, evicting images if the new budget is already exceeded.
+        :param budget: the new budget in bytes
+        """
+        with self._lock:
+            self.budget = budget
+            self._evict()
+
+    def _evict(self):
+        """
+        Removes the least recently used images that are not pinned until the cache is within its budget. The most
+        recently used image is always kept, even if it is larger than the budget by itself.
+        """
+        if self.used <= self.budget:
+            return
+
+        for key in list(self._images)[:-1]:
+            if key in self._pins:
+                continue
+
+            surface = self._images.pop(key)
+            self.used -= self.surface_size(surface)
+            self.evictions += 1
+            if self.used <= self.budget:
+                break
+
+    def clear(self):
+        """
+        Removes everything from the cache. Used when the display is shut down, as the prepared images depend on it.
+        """
+        with self._lock:
+            self._images.clear()
+            self._data.clear()
+            self._pins.clear()
+            self.used = 0
+            self.format = None
+
+    def stats(self):
+        """
+        Gets the counters of the cache.
+        :return: dictionary of the cache counters
+        """
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'images': len(self._images),
+                'pinned': len(self._pins),
+                'used': self.used,
+                'budget': self.budget,
+                'prepared': dict(self.prepared),
+            }
+
+
+class SpriteFrames(Sequence):
+    """
+    List-like collection of the frames on a sprite sheet. Each frame is a subsurface that shares its pixels with the
+    sprite sheet, and is only sliced out the first time it is accessed.
+    """
+
+    def __init__(self, sprite_sheet, sprite_size, frames):
+        self.sprite_sheet = sprite_sheet
+        self.sprite_size = sprite_size
+
+        # RLE acceleration frees the pixels of a surface once it is drawn, which the frames point into. Only the frames
+        # are RLE accelerated, as their own pixels are never freed.
+        if sprite_sheet.get_colorkey() is not None:
+            sprite_sheet.set_colorkey(sprite_sheet.get_colorkey())
+
+        # Number of sprites that fit on each row and column of the sprite sheet.
+        self.columns = sprite_sheet.get_size()[0] // sprite_size[0]
+        rows = sprite_sheet.get_size()[1] // sprite_size[1]
+
+        # Frames that have been sliced so far. None until a frame is first accessed.
+        self._frames = [None] * min(frames, self.columns * rows)
+
+    def __len__(self):
+        return len(self._frames)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+
+        frame = self._frames[index]
+
+        # Slice the frame out of the sprite sheet if it has not been accessed before.
+        if frame is None:
+            if index < 0:
+                index += len(self._frames)
+            row, column = divmod(index, self.columns)
+            frame = self.sprite_sheet.subsurface((column * self.sprite_size[0], row * self.sprite_size[1],
+                                                  self.sprite_size[0], self.sprite_size[1]))
+            accelerate(frame)
+            self._frames[index] = frame
+
+        return frame
+
+
+# Cache shared by the entire game.
+asset_cache = AssetCache()
@@ -0,0 +1,113 @@
+"""
+Module for the catalog of bloop species. The info files and sprite sheets of every species are found once when the
+catalog is first used, so adding a species only takes adding its files. The frames of each sprite sheet are loaded the
+first time they are needed and shared by every sprite that uses them.
+"""
+import os
+from .assets import asset_cache, SpriteFrames
+
+
+class Species:
+    """
+    Everything known about a species of bloop: its info file and the sprite sheets of each of its evolution stages.
+    """
+
+    def __init__(self, name, info, stages):
+        self.name = name
+        self.info = info  # The contents of the info file of the species.
+        self.description = info.get('description')
+        self.contentedness = info.get('contentedness')
+        self.metabolism = info.get('metabolism')
+
+        # The sprite sheet of each stage by stage name, as (image path, sprite size, number of frames) tuples.
+        self.stages = stages
+
+
+class SpeciesCatalog:
+    """
+    Index of every species by name. Species are found by looking for info files in the bloop_info folder that have a
+    matching folder of sprite sheets. Folders that start with an underscore are ignored.
+    """
+
+    def __init__(self, info_dir, image_dir):
+        self.info_dir = info_dir
+        self.image_dir = image_dir
+
+        self._species = None  # Every species by name. None until the folders have been scanned.
+        self._frames = {}  # The shared frames of each sprite sheet by (species, stage), with the sheet they came from.
+
+    def scan(self):
+        """
+        Finds every species and its sprite sheets. The species are only put in the catalog once they have all been
+        found, as the scan can run on a worker thread while the title is up.
+        """
+        species = {}
+
+        for entry in sorted(os.scandir(self.info_dir), key=lambda e: e.name):
+            name, extension = os.path.splitext(entry.name)
+            species_dir = os.path.join(self.image_dir, name)
+            if extension != '.json' or name.startswith('_') or not os.path.isdir(species_dir):
+                continue
+
+            # Every sprite sheet of a stage has a JSON file next to it with the size and number of frames.
+            stages = {}
+            for sheet in os.scandir(species_dir):
+                stage, extension = os.path.splitext(sheet.name)
+                image_path = os.path.join(species_dir, stage + '.png')
+                if extension != '.json' or not os.path.isfile(image_path):
+                    continue
+
+                attributes = asset_cache.data(sheet.path)
+                stages[stage] = image_path, (attributes['width'], attributes['height']), attributes['frames']
+
+            species[name] = Species(name, asset_cache.data(entry.path), stages)
+
+        self._species = species
+
+    def species(self):
+        """
+        Gets every species in the catalog.
+        :return: dictionary of every species by name, in alphabetical order
+        """
+        if self._species is None:
+            self.scan()
+        return self._species
+
+    def get(self, name):
+        """
+        Gets a species by name.
+        :param name: the name of the species
+        :return: the species
+        """
+        return self.species()[name]
+
+    def selectable(self):
+        """
+        Gets the names of the species that can be picked on the egg selection screen, which are the ones with an egg.
+        :return: list of species names
+        """
+        return [name for name, species in self.species().items() if 'egg' in species.stages]
+
+    def frames(self, name, stage):
+        """
+        Gets the frames of a species at an evolution stage. The same frames are given to every caller.
+        :param name: the name of the species
+        :param stage: the name of the stage, such as "egg" or "baby"
+        :return: list-like collection of the frames
+        """
+        image_path, sprite_size, frames = self.get(name).stages[stage]
+        sprite_sheet = asset_cache.image(image_path)
+
+        # Frames are kept for as long as their sprite sheet is still the one in the asset cache.
+        cached = self._frames.get((name, stage))
+        if cached is None or cached[0] is not sprite_sheet:
+            cached = sprite_sheet, SpriteFrames(sprite_sheet, sprite_size, frames)
+            self._frames[name, stage] = cached
+
+        return cached[1]
+
+
+# Catalog of the species that come with the game, shared by the entire game.
+_resources_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'resources')
+catalog = SpeciesCatalog(os.path.join(_resources_dir, 'data', 'bloop_info'),
+                         os.path.join(_resources_dir, 'images', 'bloops'))
@@ -0,0 +1,172 @@
+"""
+Module for drawing straight into a Linux framebuffer device. The device is mapped into memory and the changed regions
+of the window are written into it row by row, which skips the copy and full format conversion SDL does on every flip.
+The window is a surface in the pixel format of the device, so the game is drawn in that format from the start and
+writing it out is a plain copy.
+
+The device does not have to be a real framebuffer. Any file can be drawn into as long as its size is given, which is
+taken to be a 16 bit RGB565 display, the same as the SPI displays the game runs on. The file is made, or made longer,
+to hold the whole display.
+"""
+from collections import namedtuple
+import mmap
+import os
+import stat
+import struct
+import time
+import pygame
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None  # Not on Windows, where there are no framebuffer devices anyway.
+
+# ioctl requests to get the variable and fixed screen info of a framebuffer device, from linux/fb.h.
+FBIOGET_VSCREENINFO = 0x4600
+FBIOGET_FSCREENINFO = 0x4602
+
+# The size and layout of the display memory. Each colour is an (offset, length) bitfield of a pixel, and the offset is
+# the (x, y) of the visible area in the memory.
+Geometry = namedtuple('Geometry', ['width', 'height', 'stride', 'bits_per_pixel', 'red', 'green', 'blue', 'offset'])
+
+
+def read_geometry(path, size=None):
+    """
+    Reads the geometry and pixel format of a framebuffer device.
+    :param path: the framebuffer device, such as "/dev/fb1"
+    :param size: (width, height) of the display to use if the path is a plain file rather than a device
+    :return: the geometry of the display
+    """
+    try:
+        if fcntl is None:
+            raise OSError('framebuffer devices are only supported on Linux')
+
+        with open(path, 'rb') as device:
+            var_info = bytearray(160)
+            fcntl.ioctl(device, FBIOGET_VSCREENINFO, var_info)
+            fix_info = bytearray(80)
+            fcntl.ioctl(device, FBIOGET_FSCREENINFO, fix_info)
+            device.close()
+    except OSError:
+        if size is None:
+            raise ValueError('{0} is not a framebuffer device, so its size has to be given'.format(path))
+        return Geometry(size[0], size[1], size[0] * 2, 16, (11, 5), (5, 6), (0, 5), (0, 0))
+
+    # struct fb_var_screeninfo starts with the resolution and offsets, then the bitfields of each colour.
+    fields = struct.unpack_from('8I12I', var_info)
+    width, height, _, _, x_offset, y_offset, bits_per_pixel, _ = fields[:8]
+    red, green, blue = fields[8:10], fields[11:13], fields[14:16]
+
+    # The line length of struct fb_fix_screeninfo can be longer than the visible width.
+    stride = struct.unpack_from('16sL4I3HI', fix_info)[-1]
+
+    return Geometry(width, height, stride, bits_per_pixel, red, green, blue, (x_offset, y_offset))
+
+
+class FramebufferDisplay:
+    """
+    Stands in for pygame.display when drawing straight into a framebuffer. Makes the window the game is drawn on, which
+    is drawn in the middle of the display, and only the regions that are updated are written.
+    """
+
+    def __init__(self, window_size, path='/dev/fb1', size=None):
+        self.path = path
+        self.geometry = read_geometry(path, size)
+
+        geometry = self.geometry
+        if geometry.bits_per_pixel not in (16, 32):
+            raise ValueError('{0} bit framebuffers are not supported'.format(geometry.bits_per_pixel))
+        if window_size[0] > geometry.width or window_size[1] > geometry.height:
+            raise ValueError('the window is bigger than the {0}x{1} display'.format(geometry.width, geometry.height))
+
+        self.bytes_per_pixel = geometry.bits_per_pixel // 8
+        memory_size = geometry.stride * (geometry.offset[1] + geometry.height)
+
+        self._file = os.fdopen(os.open(path, os.O_RDWR | os.O_CREAT), 'r+b')
+
+        # A plain file standing in for a display has to be long enough to be mapped.
+        file_info = os.fstat(self._file.fileno())
+        if stat.S_ISREG(file_info.st_mode) and file_info.st_size < memory_size:
+            self._file.truncate(memory_size)
+
+        try:
+            self.memory = mmap.mmap(self._file.fileno(), memory_size)
+        except (OSError, ValueError):
+            self._file.close()
+            raise ValueError('{0} could not be mapped, it has to hold at least {1} bytes'.format(path, memory_size))
+
+        # Where the top left of the window is drawn, in the display memory.
+        self.x = geometry.offset[0] + (geometry.width - window_size[0]) // 2
+        self.y = geometry.offset[1] + (geometry.height - window_size[1]) // 2
+
+        # The window in the pixel format of the display, made from the mask of each colour of the display.
+        masks = [((1 << length) - 1) << offset for offset, length in (geometry.red, geometry.green, geometry.blue)]
+        self.window = pygame.Surface(window_size, 0, geometry.bits_per_pixel, masks + [0])
+
+        # Counters to see how long writing to the display takes.
+        self.updates = 0
+        self.bytes_written = 0
+        self.write_time = 0.0
+
+    def flip(self):
+        """
+        Writes the entire window to the display.
+        """
+        self.update([self.window.get_rect()])
+
+    def update(self, rects):
+        """
+        Writes regions of the window to the display.
+        :param rects: list of the regions of the window to write
+        """
+        start = time.perf_counter()
+
+        for rect in rects:
+            rect = pygame.Rect(rect).clip(self.window.get_rect())
+            if rect.width <= 0 or rect.height <= 0:
+                continue
+
+            self._write(rect)
+            self.bytes_written += rect.width * rect.height * self.bytes_per_pixel
+
+        self.updates += 1
+        self.write_time += time.perf_counter() - start
+
+    def _write(self, rect):
+        """
+        Writes a region of the window into the display memory one row at a time.
+        :param rect: the region of the window
+        """
+        bytes_per_pixel = self.bytes_per_pixel
+        pitch = self.window.get_pitch()
+        stride = self.geometry.stride
+        row_bytes = rect.width * bytes_per_pixel
+
+        # The window stays locked until its pixels are released.
+        pixels = memoryview(self.window.get_buffer())
+        for row in range(rect.top, rect.bottom):
+            source = row * pitch + rect.left * bytes_per_pixel
+            destination = (self.y + row) * stride + (self.x + rect.left) * bytes_per_pixel
+            self.memory[destination:destination + row_bytes] = pixels[source:source + row_bytes]
+        pixels.release()
+
+    def close(self):
+        """
+        Unmaps the display memory and closes the device.
+        """
+        self.memory.close()
+        self._file.close()
+
+    def stats(self):
+        """
+        Gets the counters of the display.
+        :return: dictionary of the display geometry and the time spent writing in microseconds
+        """
+        return {
+            'device': self.path,
+            'geometry': '{0}x{1}x{2}'.format(self.geometry.width, self.geometry.height,
+                                             self.geometry.bits_per_pixel),
+            'updates': self.updates,
+            'bytes_written': self.bytes_written,
+            'mean_write_us': round(self.write_time / self.updates * 1000000, 3) if self.updates else None,
+        }
@@ -1,15 +1,30 @@
 """
 Main file for the entire game. Controls everything except for GPIO input.
 """
-from collections import deque
 import importlib.util
 import json
 import os
 from pathlib import Path
+import time
 import pocket_friends
 import pygame
 from pygame.locals import *
-from ..hardware.gpio_handler import Constants, GPIOHandler
+from .assets import accelerate, asset_cache, SpriteFrames
+from .catalog import catalog
+from .power import power_manager
+from .prefetch import prefetcher
+from .renderer import DirtyRenderer
+from .scene import Scene, SceneManager
+from .input_bus import input_bus
+from .journal import JournalStore
+from .save_writer import save_writer, write_atomic
+from . import simulation
+from .text import wrap
+from .timeline import Recorder, Timeline
+from .timestep import FixedStep
+from .tracing import tracer
+from .widgets import RetainedWidget, blit_over
+from ..hardware.gpio_handler import GPIOHandler
 
 # FPS for the entire game to run at.
 game_fps = 16
@@ -20,54 +35,49 @@ game_res = 80
 script_dir = os.path.dirname(os.path.abspath(__file__))
 save_dir = os.path.join(Path.home(), '.pocket_friends')
 
-# Tries to make the save directory. Does nothing if it already exists.
-try:
-    os.mkdir(save_dir)
-except FileExistsError:
-    pass
+# Attributes that change on every save. A save where nothing else has changed is not written.
+volatile_attributes = ('last_seen',)
+
+
+def make_save_dir():
+    """
+    Tries to make the save directory. Does nothing if it already exists.
+    """
+    try:
+        os.mkdir(save_dir)
+    except FileExistsError:
+        pass
 
 
 class SpriteSheet:
     """
-    Imports a sprite sheet as separate pygame images given an image file and a json file.
+    Imports a sprite sheet as separate pygame images given an image file and a json file. By default the images are
+    views into the sprite sheet, set copy_frames to copy every frame into its own surface instead.
     """
 
-    def __init__(self, sprite_sheet, texture_json):
+    def __init__(self, sprite_sheet, texture_json, copy_frames=False):
         # Load in whole sprite sheet as one image.
-        self.sprite_sheet = pygame.image.load(sprite_sheet).convert_alpha()
-        self.images = []
+        self.sprite_sheet = asset_cache.image(sprite_sheet)
 
         # Get the sprite sheet json file.
-        with open(texture_json, 'r') as json_file:
-            self.img_attrib = json.load(json_file)
-            json_file.close()
-
-        # Count for how many images have been added in the image list
-        image_count = 0
+        self.img_attrib = asset_cache.data(texture_json)
 
         # Get the sprite size as a tuple
         sprite_size = self.img_attrib['width'], self.img_attrib['height']
 
-        # Iterate through every image location on the sprite sheet given the sprite size
-        for i in range(self.sprite_sheet.get_size()[1] // sprite_size[1]):
-            i *= sprite_size[1]
-            for j in range(self.sprite_sheet.get_size()[0] // sprite_size[0]):
-                j *= sprite_size[0]
-
-                # Create a new transparent surface
-                sprite = pygame.Surface(sprite_size, SRCALPHA)
-                # Blit the sprite onto the image
-                sprite.blit(self.sprite_sheet, (0, 0), (j, i, sprite_size[0], sprite_size[1]))
-                # Add the image to the list of images
-                self.images.append(sprite)
-
-                image_count += 1
-
-                # Break the loop if the specified number of frames has been reached.
-                if image_count >= self.img_attrib['frames']:
-                    break
-            if image_count >= self.img_attrib['frames']:
-                break
+        frames = SpriteFrames(self.sprite_sheet, sprite_size, self.img_attrib['frames'])
+
+        # Frames are views into the sprite sheet unless copies were asked for.
+        if not copy_frames:
+            self.images = frames
+            return
+
+        # Copy every frame into a surface of its own, which keeps the colour key or alpha of the sprite sheet.
+        self.images = []
+        for frame in frames:
+            sprite = frame.copy()
+            accelerate(sprite)
+            self.images.append(sprite)
 
 
 class DataHandler:
@@ -75,7 +85,9 @@ class DataHandler:
     Class that handles the hardware attributes and save files.
     """
 
-    def __init__(self):
+    def __init__(self, backend='json'):
+        make_save_dir()
+
         # Attributes that are saved to a file to recover upon startup.
         self.attributes = {
             'version': pocket_friends.__version__,
@@ -89,51 +101,140 @@ class DataHandler:
             'missed_care': 0,
             'adult': 0,
             'evolution_stage': '',
+            'last_seen': 0,
         }
 
-        # Frame counter
-        self.frames_passed = 0
+        # Runs the game logic once a second of real time, however fast frames are being drawn.
+        self.clock = FixedStep()
 
-    def write_save(self):
+        # Either 'json' to rewrite "save.json" on every save, or 'journal' to only append the changes to a journal.
+        self.backend = backend
+        self.journal = JournalStore(save_dir) if backend == 'journal' else None
+
+    def write_save(self, wait=False):
         """
-        Writes attributes of class to "save.json" file.
+        Writes attributes of class to "save.json" file, or to the journal if the journal backend is used. The file is
+        written on a background thread.
+        :param wait: True to wait until the file has been written before returning
         """
-        with open(save_dir + '/save.json', 'w') as save_file:
-            json.dump(self.attributes, save_file)
-            save_file.close()
+        # Wall clock time of the save, used to catch up on the time the game was off.
+        self.attributes['last_seen'] = int(time.time())
+
+        if self.journal is not None:
+            save_writer.submit(self.journal.journal_path, self.attributes, self.journal.write, volatile_attributes)
+        else:
+            save_writer.submit(save_dir + '/save.json', self.attributes, ignore=volatile_attributes)
+        if wait:
+            save_writer.flush()
 
-    def read_save(self):
+    def read_save(self, read_only=False):
         """
-        Reads from "save.json" and inserts into attributes dictionary. Creates file if it does not exist.
+        Reads from "save.json" and inserts into attributes dictionary. Creates file if it does not exist. With the
+        journal backend the save is rebuilt from the journal instead, and an existing "save.json" is imported into it.
+        The bloop is then caught up on the time that has passed since the save was written.
+        :param read_only: True to read the save as it is on disk without changing it, such as to export it. The bloop
+        is not caught up and nothing is written.
+        :raises FileNotFoundError: if there is no save to read and read_only is True
         """
-        # Open up the save file and read it into self.attributes.
-        try:
-            with open(save_dir + '/save.json', 'r') as save_file:
-                self.attributes = json.load(save_file)
-                save_file.close()
+        # Wait for any save still being written so that the newest one is read.
+        save_writer.flush()
 
-        # If there is no save file, write one with the defaults.
-        except FileNotFoundError:
-            self.write_save()
+        if self.journal is not None:
+            self.read_journal(read_only)
+        else:
+            # Open up the save file and read it into self.attributes.
+            try:
+                with open(save_dir + '/save.json', 'r') as save_file:
+                    self.attributes = json.load(save_file)
+                    save_file.close()
+                save_writer.remember(save_dir + '/save.json', self.attributes, volatile_attributes)
+
+            # If there is no save file, write one with the defaults.
+            except FileNotFoundError:
+                if read_only:
+                    raise
+                self.write_save()
+
+        if not read_only:
+            self.catch_up()
+
+    def catch_up(self):
+        """
+        Runs the game logic for every second between the last save and now, all at once.
+        """
+        # Saves from before the time was recorded have nothing to catch up from.
+        last_seen = self.attributes.get('last_seen', 0)
+        seconds = int(time.time()) - last_seen
+
+        # Nothing is done if the clock has gone backwards.
+        if last_seen == 0 or seconds <= 0:
+            return
+
+        simulation.catch_up(self.attributes, seconds, self.species())
+        self.write_save()
+
+    def species(self):
+        """
+        Gets the info file of the bloop in the save.
+        :return: dictionary of the info file, or an empty dictionary if there is no bloop yet
+        """
+        if self.attributes['bloop'] == '':
+            return {}
+        return catalog.get(self.attributes['bloop']).info
+
+    def read_journal(self, read_only=False):
+        """
+        Rebuilds the attributes dictionary from the journal. Imports "save.json" if there is no journal yet, or writes
+        the defaults if there is neither.
+        :param read_only: True to leave the files as they are, without repairing a damaged journal or writing the
+        imported save to it
+        :raises FileNotFoundError: if there is no save to read and read_only is True
+        """
+        attributes = self.journal.load(repair=not read_only)
+
+        if attributes is None:
+            try:
+                attributes = self.journal.import_json(save_dir + '/save.json', compact=not read_only)
+            except FileNotFoundError:
+                if read_only:
+                    raise
+                self.write_save()
+                return
+
+        self.attributes = attributes
+        save_writer.remember(self.journal.journal_path, self.attributes, volatile_attributes)
+
+    def export_save(self, path):
+        """
+        Writes the attributes dictionary to a file in the "save.json" format. With the journal backend the save the
+        journal holds is written once any save still being appended to it is done.
+        :param path: the file to write to
+        """
+        if self.journal is not None:
+            save_writer.flush()
+            self.journal.export_json(path)
+        else:
+            write_atomic(path, json.dumps(self.attributes))
 
     def update(self):
         """
-        Run the game logic.
+        Run the game logic for every second that has passed since the last update.
         """
-        self.frames_passed += 1
-        # Run logic of the game every second.
-        if self.frames_passed >= game_fps:
+        ticks, batch = self.clock.advance()
 
-            # Add one to the age of the bloop.
-            self.attributes['age'] += 1
+        # If the game fell far behind, such as after a long stall, the oldest seconds are run all at once.
+        if batch:
+            simulation.catch_up(self.attributes, batch, self.species())
+            self.write_save()
+
+        for i in range(ticks):
+            # Age the bloop by a second and change its stats.
+            simulation.step(self.attributes, self.species())
 
             # Save the data when the age of the bloop is a multiple of 10.
             if self.attributes['age'] % 10 == 0:
                 self.write_save()
 
-            # Reset frame counter
-            self.frames_passed = 0
-
 
 class PlaygroundFriend(pygame.sprite.Sprite):
     """
@@ -149,17 +250,8 @@ class PlaygroundFriend(pygame.sprite.Sprite):
         self.evolution_stage = data_handler.attributes['evolution_stage']
         self.direction = 0
 
-        if self.evolution_stage == 'adult':
-            image = self.evolution_stage + self.adult
-        else:
-            image = self.evolution_stage
-
-        # Draw the correct bloop depending on the stage
-        sprite_sheet = SpriteSheet(script_dir + '/resources/images/bloops/{0}/{1}.png'.format(self.bloop, image),
-                                   script_dir + '/resources/images/bloops/{0}/{1}.json'.format(self.bloop, image))
-
-        # Load the images from the sprite sheet
-        self.images = sprite_sheet.images
+        # Draw the correct bloop depending on the stage. The frames are shared with every other sprite of the bloop.
+        self.images = catalog.frames(self.bloop, self.sprite_stage(data_handler.attributes))
 
         # Put the egg in the middle of the screen.
         self.rect = self.images[0].get_rect()
@@ -173,6 +265,27 @@ class PlaygroundFriend(pygame.sprite.Sprite):
         self.movement_frames = game_fps / 2  # How many frames pass before the bloop moves
         self.current_frame = 0
 
+    @staticmethod
+    def sprite_stage(attributes):
+        """
+        Gets the name of the sprite sheet of a bloop, which is its evolution stage. Adults also have the kind of adult
+        at the end.
+        :param attributes: the attributes of the save
+        :return: the name of the sprite sheet
+        """
+        if attributes['evolution_stage'] == 'adult':
+            return attributes['evolution_stage'] + attributes['adult']
+        return attributes['evolution_stage']
+
+    def matches(self, attributes):
+        """
+        Checks if the sprite still shows the bloop in the save.
+        :param attributes: the attributes of the save
+        :return: True if the bloop and its stage are the same
+        """
+        return (self.bloop, self.evolution_stage, self.adult) == (attributes['bloop'], attributes['evolution_stage'],
+                                                                  attributes['adult'])
+
     def pet(self):
         """
         Pet the bloop!
@@ -223,20 +336,14 @@ class SelectionEgg(pygame.sprite.Sprite):
 
         self.egg_color = egg_color
 
-        # Loads the JSON file of the egg to read in data.
-        with open(script_dir + '/resources/data/bloop_info/{0}.json'.format(egg_color), 'r') as save_file:
-            json_file = json.load(save_file)
-            save_file.close()
+        # Gets the description off the egg from the species catalog.
+        species = catalog.get(egg_color)
+        self.description = species.description
+        self.contentedness = species.contentedness
+        self.metabolism = species.metabolism
 
-        # Gets the description off the egg from the JSON file.
-        self.description = json_file.get('description')
-        self.contentedness = json_file.get('contentedness')
-        self.metabolism = json_file.get('metabolism')
-
-        # Load the egg from the given color and get the bounding rectangle for the image.
-        sprite_sheet = SpriteSheet(script_dir + '/resources/images/bloops/{0}/egg.png'.format(self.egg_color),
-                                   script_dir + '/resources/images/bloops/{0}/egg.json'.format(self.egg_color))
-        self.images = sprite_sheet.images
+        # Get the frames of the egg, which are shared with every other sprite of the egg.
+        self.images = catalog.frames(egg_color, 'egg')
 
         # Get the rectangle from the first image in the list
         self.rect = self.images[0].get_rect()
@@ -252,49 +359,57 @@ class SelectionEgg(pygame.sprite.Sprite):
         self.image = self.images[self.index]
 
 
-class EggInfo:
+class EggInfo(RetainedWidget):
     """
-    Class to draw the contentedness and metabolism value off the egg on the info screen.
+    Class to draw the contentedness and metabolism value off the egg on the info screen. Eggs with the same values share
+    one surface.
     """
 
     def __init__(self, contentedness, metabolism, location):
+        RetainedWidget.__init__(self, (location[0], location[1], 44, 15))
         self.contentedness = contentedness
         self.metabolism = metabolism
         self.x = location[0]
         self.y = location[1]
 
+    def key(self):
+        """
+        Gets a key that is the same for every egg info that looks the same as this one.
+        :return: tuple of the contentedness and metabolism
+        """
+        return self.contentedness, self.metabolism
+
+    def bake(self):
+        """
+        Draws the indicator icons and stars onto a new surface.
+        :return: the surface
+        """
         # Create a new surface to blit onto the other surface
-        self.surface = pygame.Surface((44, 15), SRCALPHA)
+        surface = pygame.Surface((44, 15), SRCALPHA)
 
         # Blit the two indicator icons on screen
-        smiley = pygame.image.load(script_dir + '/resources/images/gui/smiley.png').convert_alpha()
-        self.surface.blit(smiley, (0, 0))
-        apple = pygame.image.load(script_dir + '/resources/images/gui/apple.png').convert_alpha()
-        self.surface.blit(apple, (1, 9))
+        smiley = asset_cache.image(script_dir + '/resources/images/gui/smiley.png')
+        surface.blit(smiley, (0, 0))
+        apple = asset_cache.image(script_dir + '/resources/images/gui/apple.png')
+        surface.blit(apple, (1, 9))
 
         # Draw 5 stars. If the value of the contentedness is less than the current star, make it a blank star.
         for i in range(5):
             if i < self.contentedness:
-                star = pygame.image.load(script_dir + '/resources/images/gui/star.png').convert_alpha()
+                star = asset_cache.image(script_dir + '/resources/images/gui/star.png')
             else:
-                star = pygame.image.load(script_dir + '/resources/images/gui/blank_star.png').convert_alpha()
-            self.surface.blit(star, (11 + (i * 6), 1))
+                star = asset_cache.image(script_dir + '/resources/images/gui/blank_star.png')
+            surface.blit(star, (11 + (i * 6), 1))
 
         # Draw 5 stars. If the value of the metabolism is less than the current star, make it a blank star.
         for i in range(5):
             if i < self.metabolism:
-                star = pygame.image.load(script_dir + '/resources/images/gui/star.png').convert_alpha()
+                star = asset_cache.image(script_dir + '/resources/images/gui/star.png')
             else:
-                star = pygame.image.load(script_dir + '/resources/images/gui/blank_star.png').convert_alpha()
-            self.surface.blit(star, (11 + (i * 6), 10))
+                star = asset_cache.image(script_dir + '/resources/images/gui/blank_star.png')
+            surface.blit(star, (11 + (i * 6), 10))
 
-    def draw(self, surface):
-        """
-        Draw the info icons on a given surface.
-        :param surface: the surface to draw the icons on.
-        """
-        # Blit the info onto the given surface.
-        surface.blit(self.surface, (self.x, self.y))
+        return surface
 
 
 class InfoText:
@@ -303,98 +418,110 @@ class InfoText:
     """
 
     def __init__(self, font, text='Lorem ipsum dolor sit amet, consectetur adipiscing elit. Nam commodo tempor '
-                                  'aliquet. Suspendisse placerat accumsan neque, nec volutpat nunc porta ut.'):
+                                  'aliquet. Suspendisse placerat accumsan neque, nec volutpat nunc porta ut.',
+                 color=(64, 64, 64)):
 
         self.font = font
-        self.text = []  # Text broken up into a list according to how it will fit on screen.
+        self.color = color
         self.max_lines = 6  # Max number of lines to be shown on screen at a time.
         self.offset = 0
+        self.changed = False  # Whether the text has scrolled since it was last drawn.
+
+        # Constants to help draw the text
+        self.line_separation = 7
+        self.left_margin = 3
+        self.top_margin = 25
+        self.bottom_margin = 10
+
+        # The region of the screen the text and arrows are drawn in.
+        self.rect = pygame.Rect(0, self.top_margin - 3, game_res, game_res - self.top_margin + 3)
 
         # Arrow icons to indicate scrolling
-        self.up_arrow = pygame.image.load(script_dir + '/resources/images/gui/up_arrow.png').convert_alpha()
-        self.down_arrow = pygame.image.load(script_dir + '/resources/images/gui/down_arrow.png').convert_alpha()
+        self.up_arrow = asset_cache.image(script_dir + '/resources/images/gui/up_arrow.png')
+        self.down_arrow = asset_cache.image(script_dir + '/resources/images/gui/down_arrow.png')
 
-        raw_text = text  # Copy the text to a different variable to be cut up.
+        # All the lines rendered onto tall surfaces, so that drawing any part of the text takes a fixed number of blits.
+        self.rendered = None
 
+        self.text = []  # Text broken up into a list according to how it will fit on screen.
+        self.set_text(text)
+
+    def set_text(self, text):
+        """
+        Changes the text and scrolls back to the top. The same text is only wrapped once, then it comes from a cache.
+        :param text: the new text
+        """
         margins = 4.5
         max_line_width = game_res - (margins * 2)  # The maximum pixel width that drawn text can be.
-        cut_chars = '.,! '  # Characters that will be considered "cuts" aka when a line break can occur.
-
-        # Prevents freezing if the end of the string does not end in a cut character
-        # Will fix eventually more elegantly
-        if raw_text[-1:] not in cut_chars:
-            raw_text += ' '
-
-        # Calculating line breaks.
-        while len(raw_text) > 0:
-            index = 0
-            test_text = ''  # Chunk of text to pseudo-render and test the width of.
-
-            # Loops until the testing text has reached the size limit.
-            while True:
-
-                # Break if the current index is larger than the remaining text.
-                if index + 1 > len(raw_text):
-                    index -= 1
-                    break
-
-                # Add one character to the testing text from the raw text.
-                test_text += raw_text[index]
-                # Get the width of the pseudo-rendered text.
-                text_width = font.size(test_text)[0]
-
-                # Break if the text is larger than the defined max width.
-                if text_width > max_line_width:
-                    break
-                index += 1
-                pass
-
-            # Gets the chunk of text to be added to the list.
-            text_chunk = raw_text[0:index + 1]
-            # Determines if the chunk of text has any break characters.
-            has_breaks = any(cut_chars in text_chunk for cut_chars in cut_chars)
-
-            # If the text has break characters, start with the last character and go backwards until
-            # one has been found, decreasing the index each time.
-            if has_breaks:
-                while raw_text[index] not in cut_chars:
-                    index -= 1
-                text_chunk = raw_text[0:index + 1]
-            # If there are no break characters in the chunk, simply decrease the index by one and insert
-            # a dash at the end of the line to indicate the word continues.
-            else:
-                index -= 1
-                text_chunk = raw_text[0:index + 1]
-                text_chunk += '-'
 
-            # Append the text chunk to the list of text to draw.
-            self.text.append(text_chunk)
+        self.text = list(wrap(self.font, text, max_line_width))
+        self.offset = 0
+        self.rendered = None
+        self.changed = True
+
+    def set_color(self, color):
+        """
+        Changes the colour of the text.
+        :param color: the new colour
+        """
+        if color != self.color:
+            self.color = color
+            self.rendered = None
+            self.changed = True
+
+    def render(self):
+        """
+        Renders every line of the text onto the tall surfaces. Lines are taller than the space between them, so cutting
+        the lines on screen out of a single surface would also cut out the edges of the lines next to them. Instead,
+        the lines are shared out between just enough surfaces that no two lines on the same surface overlap.
+        """
+        line_height = self.font.get_height()
+        height = max((len(self.text) - 1) * self.line_separation + line_height, 0)
+        count = -(-line_height // self.line_separation)  # Number of surfaces needed, rounded up.
+
+        rendered = [pygame.Surface((game_res - self.left_margin, height), SRCALPHA) for i in range(count)]
+        for i, line in enumerate(self.text):
+            rendered[i % count].blit(self.font.render(line, False, self.color), (0, i * self.line_separation))
 
-            # Cut the text to repeat the process with the new cut string.
-            raw_text = raw_text[index + 1:]
+        # The text is not anti-aliased, so it ends up colour keyed instead of blended on every frame.
+        self.rendered = [asset_cache.prepare(surface) for surface in rendered]
 
     def draw(self, surface):
         """
         Draws the text on a given surface.
         :param surface: The surface for the text to be drawn on.
         """
-        # Constants to help draw the text
-        line_separation = 7
-        left_margin = 3
-        top_margin = 25
-        bottom_margin = 10
-
-        # Draw the lines on the screen
-        for i in range(min(len(self.text), self.max_lines)):
-            text = self.font.render(self.text[i + self.offset], False, (64, 64, 64))
-            surface.blit(text, (left_margin, top_margin + (i * line_separation)))
+        if self.rendered is None:
+            self.render()
+
+        # Draw the lines on screen by cutting them out of the tall surfaces, one blit per surface.
+        last = self.offset + min(len(self.text), self.max_lines) - 1
+        for first in range(self.offset, min(self.offset + len(self.rendered), last + 1)):
+            # The last line on screen that is on the same surface as the first one.
+            end = last - (last - first) % len(self.rendered)
+            area = pygame.Rect(0, first * self.line_separation, self.rendered[0].get_width(),
+                               (end - first) * self.line_separation + self.font.get_height())
+            surface.blit(self.rendered[first % len(self.rendered)],
+                         (self.left_margin, self.top_margin + (first - self.offset) * self.line_separation), area)
 
         # Draw the arrows if there is more text than is on screen.
         if self.offset != 0:
-            surface.blit(self.up_arrow, ((game_res / 2) - (self.up_arrow.get_rect().width / 2), top_margin - 3))
+            surface.blit(self.up_arrow,
+                         ((game_res / 2) - (self.up_arrow.get_rect().width / 2), self.top_margin - 3))
         if len(self.text) - (self.offset + 1) >= self.max_lines:
             surface.blit(self.down_arrow,
-                         ((game_res / 2) - (self.down_arrow.get_rect().width / 2), game_res - bottom_margin))
+                         ((game_res / 2) - (self.down_arrow.get_rect().width / 2), game_res - self.bottom_margin))
+
+    def dirty_rects(self):
+        """
+        Gets the regions of the screen that have changed since the last call.
+        :return: list of the changed regions
+        """
+        if not self.changed:
+            return []
+
+        self.changed = False
+        return [self.rect]
 
     def scroll_down(self):
         """
@@ -403,6 +530,7 @@ class InfoText:
         # Ensures that the offset cannot be too big as to try to render non-existent lines.
         if len(self.text) - (self.offset + 1) >= self.max_lines:
             self.offset += 1
+            self.changed = True
 
     def scroll_up(self):
         """
@@ -410,6 +538,7 @@ class InfoText:
         """
         if self.offset > 0:  # Ensures a non-zero offset is not possible.
             self.offset -= 1
+            self.changed = True
 
 
 class MenuIcon(pygame.sprite.Sprite):
@@ -443,25 +572,29 @@ class MenuIcon(pygame.sprite.Sprite):
         self.image = self.images[0]
 
 
-class PopupMenu:
+class PopupMenu(RetainedWidget):
     """
-    Class to create a popup menu that can be hidden and shown at will
+    Class to create a popup menu that can be hidden and shown at will. The frame and icons are drawn onto one surface,
+    which is only drawn again when the selection changes.
     """
 
+    # The names of the icons to be drawn
+    icon_names = ['apple', 'dumbbell', 'stats', 'controller', 'bed']
+
     def __init__(self, position):
+        RetainedWidget.__init__(self, (3, 3, 0, 0))
+        self.position = position
+
         # Background frame of the popup menu
-        self.frame = pygame.image.load(script_dir + '/resources/images/gui/popup_menu/frame.png').convert_alpha()
+        self.frame = asset_cache.image(script_dir + '/resources/images/gui/popup_menu/frame.png')
 
         self.draw_menu = False  # Whether or not to draw the popup menu
         self.menu_sprites = pygame.sprite.Group()  # Sprite group for the icons
         self.selected = 0  # The currently selected icon
 
-        # The names of the icons to be drawn
-        icon_names = ['apple', 'dumbbell', 'stats', 'controller', 'bed']
-
         self.icons = []
         # Create an icon sprite for each name in the list and add it to the icon list
-        for i in icon_names:
+        for i in self.icon_names:
             self.icons.append(MenuIcon(i))
 
         # Add each sprite in the icon list to the sprite group
@@ -477,11 +610,15 @@ class PopupMenu:
             # Add the icon to the sprite group.
             self.menu_sprites.add(icon)
 
+        # The region of the screen the menu covers.
+        self.rect = self.frame.get_rect(topleft=(3, 3)).unionall([icon.rect for icon in self.icons])
+
     def toggle(self):
         """
         Toggles the menu on or off.
         """
         self.draw_menu = not self.draw_menu
+        self.invalidate()
 
     def next(self):
         """
@@ -494,6 +631,7 @@ class PopupMenu:
             if self.selected >= len(self.icons):  # Wrap around if new value is invalid
                 self.selected = 0
             self.icons[self.selected].select()  # Select the newly selected icon
+            self.invalidate()
 
     def prev(self):
         """
@@ -506,6 +644,26 @@ class PopupMenu:
             if self.selected < 0:  # Wrap around if new value is invalid
                 self.selected = len(self.icons) - 1
             self.icons[self.selected].select()  # Select the newly selected icon
+            self.invalidate()
+
+    def key(self):
+        """
+        Gets a key that is the same for every popup menu that looks the same as this one.
+        :return: tuple of the position and the selected icon
+        """
+        return tuple(self.position), self.selected
+
+    def bake(self):
+        """
+        Draws the frame and icons onto a new surface the size of the menu.
+        :return: the surface
+        """
+        # The icons sit on see through parts of the frame, so they are blended in properly instead of just blitted.
+        surface = pygame.Surface(self.rect.size, SRCALPHA)
+        surface.blit(self.frame, (3 - self.rect.x, 3 - self.rect.y))
+        for icon in self.icons:
+            blit_over(surface, icon.image, (icon.rect.x - self.rect.x, icon.rect.y - self.rect.y))
+        return surface
 
     def draw(self, surface):
         """
@@ -514,12 +672,453 @@ class PopupMenu:
         """
         # Draw the menu only if it is toggled on.
         if self.draw_menu:
-            surface.blit(self.frame, (3, 3))
-            self.menu_sprites.draw(surface)
+            RetainedWidget.draw(self, surface)
+
+
+class TitleScene(Scene):
+    """
+    The title screen. Stays up while the save and the first screen are loaded on other threads.
+    """
+
+    state = 'title'
+
+    def __init__(self, scenes, data_handler, title_time, timeline):
+        Scene.__init__(self, scenes)
+        self.data_handler = data_handler
+        self.timeline = timeline  # The time of the game, which also knows when loading is done.
+        self.title_time = title_time  # The least time to show the title for in milliseconds.
+        self.end = 0.0  # Time the title has been up for long enough.
+        self.frames = 0  # Number of frames the title has been on screen for.
+
+    def images(self):
+        """
+        Gets the images the title draws.
+        :return: list of (image path, alpha) tuples
+        """
+        return [(script_dir + '/resources/images/title.png', True)]
+
+    def enter(self, previous):
+        """
+        Starts reading the save and loading the screen after the title on other threads.
+        :param previous: the scene that was on screen before
+        """
+        prefetcher.start(self.data_handler, self.scenes)
+        self.end = self.timeline.clock() + self.title_time / 1000
+        self.frames = 0
+
+    def update(self):
+        """
+        Moves on to the initialization phase of the game once everything is loaded. The title is always on screen for
+        at least one whole frame so that it does not just flash by. Waiting for up to a frame here keeps the title from
+        taking time away from the loading by drawing frames as fast as it can.
+        """
+        if self.frames > 0 and self.timeline.clock() >= self.end and self.timeline.loaded(self.data_handler,
+                                                                                         1 / game_fps):
+            self.scenes.switch('init')
+        self.frames += 1
+
+    def render(self, surface):
+        """
+        Draws the title image in the middle of the screen.
+        :param surface: the surface to draw on
+        """
+        surface.blit(asset_cache.image(script_dir + '/resources/images/title.png'), (0, 0))
+
+
+class InitScene(Scene):
+    """
+    Takes the save and the images loaded during the title and moves on to the first screen.
+    """
+
+    state = 'init'
 
+    def update(self):
+        """
+        Moves on to the first screen. The prefetch has already worked out if it is a new game or not by looking at the
+        bloop in the save. If there is none, the egg has not been picked yet, and the game sends you to the egg
+        selection screen. If not, the game sends you to the playground.
+        """
+        self.scenes.switch(prefetcher.finish())
+
+
+class EggSelectScene(Scene):
+    """
+    The screen to pick an egg from when starting a new game.
+    """
+
+    state = 'egg_select'
+    buttons = {'j_r': 'sel_right', 'j_l': 'sel_left', 'j_d': 'sel_down', 'j_u': 'sel_up', 'a': 'open_info'}
+
+    # How many eggs per row should be displayed.
+    eggs_per_row = 3
+
+    def __init__(self, scenes):
+        Scene.__init__(self, scenes)
+        self.eggs = None  # The egg objects, made the first time the screen is shown.
+        self.selected = 0  # The index of the selected egg.
+
+    def images(self):
+        """
+        Gets the images the egg selection screen draws, which are the egg of every species that can be picked and
+        the cursor.
+        :return: list of (image path, alpha) tuples
+        """
+        images = [(catalog.get(name).stages['egg'][0], True) for name in catalog.selectable()]
+        images.append((script_dir + '/resources/images/gui/egg_selector.png', True))
+        return images
+
+    def total_rows(self):
+        """
+        Counts the total rows of eggs.
+        :return: the number of rows
+        """
+        return -(-len(self.eggs) // self.eggs_per_row)
+
+    def enter(self, previous):
+        """
+        Puts every egg in its place on screen.
+        :param previous: the scene that was on screen before
+        """
+        # Creates and holds the egg objects in a list. Every species with an egg can be picked.
+        if self.eggs is None:
+            self.eggs = [SelectionEgg(name) for name in catalog.selectable()]
+
+        # Start from the first egg, unless coming back from the info screen of the selected one.
+        if not isinstance(previous, BloopInfoScene):
+            self.selected = 0
+
+        distance_between_eggs = 36 / self.eggs_per_row
+        total_rows = self.total_rows()
+        distance_between_rows = 32 / self.eggs_per_row
+
+        # Determine the location of each egg.
+        for index, egg in enumerate(self.eggs):
+            current_row = index // self.eggs_per_row
+            rows_after = total_rows - (current_row + 1)
+            egg_in_row = index % self.eggs_per_row
+            eggs_after = min(len(self.eggs) - (current_row * self.eggs_per_row), self.eggs_per_row) - (egg_in_row + 1)
+
+            x_offset = 32
+            y_offset = 30
+
+            # The x coordinate of an egg is determined by which egg in the row it is, and how many eggs are in that
+            # row. If there is only 1 egg in a row, it is in the middle of the screen. If there are two, they're on
+            # equal halves and so on.
+            egg.rect.x = x_offset - (eggs_after * distance_between_eggs) + (egg_in_row * distance_between_eggs)
+            egg.rect.y = y_offset - (rows_after * distance_between_rows) + (current_row * distance_between_rows)
+
+            # Add the egg to the sprite list.
+            self.scenes.sprites.add(egg)
+
+    def get_cursor_coords(self, selection):
+        """
+        Gets the coordinates of an egg on the selection screen by index and returns it as a tuple
+        :param selection: index of the egg to be selected
+        :return: tuple of the coordinates of the selected egg
+        """
+        cursor_x_offset = -2
+        cursor_y_offset = -2
+
+        return self.eggs[selection].rect.x + cursor_x_offset, self.eggs[selection].rect.y + cursor_y_offset
+
+    def sel_left(self):
+        """
+        Select the egg to the left with constraints.
+        """
+        if self.selected % self.eggs_per_row != 0:
+            self.selected -= 1
+
+    def sel_right(self):
+        """
+        Select the egg to the right with constraints.
+        """
+        row = self.selected // self.eggs_per_row
+        eggs_in_row = min(len(self.eggs) - (row * self.eggs_per_row), self.eggs_per_row)
+
+        if self.selected % self.eggs_per_row != eggs_in_row - 1:
+            self.selected += 1
+
+    def sel_up(self):
+        """
+        Select the egg above with constraints.
+        """
+        if self.selected // self.eggs_per_row != 0:
+            self.selected -= self.eggs_per_row
+
+    def sel_down(self):
+        """
+        Select the egg below with constraints.
+        """
+        # The last row can have fewer eggs, so move to its last egg if there is none right below.
+        if self.selected // self.eggs_per_row != self.total_rows() - 1:
+            self.selected = min(self.selected + self.eggs_per_row, len(self.eggs) - 1)
+
+    def open_info(self):
+        """
+        Advance to the egg info screen for the selected egg.
+        """
+        self.scenes.switch('bloop_info')
+
+    def render(self, surface):
+        """
+        Draws the cursor on screen.
+        :param surface: the surface to draw on
+        """
+        cursor = asset_cache.image(script_dir + '/resources/images/gui/egg_selector.png')
+        self.scenes.renderer.track_blit('cursor', surface.blit(cursor, self.get_cursor_coords(self.selected)))
+
+
+class BloopInfoScene(Scene):
+    """
+    The info screen of the egg selected on the egg selection screen, where the egg can be picked.
+    """
+
+    state = 'egg_select'
+    submenu = 'bloop_info'
+    buttons = {'j_d': 'scroll_down', 'j_u': 'scroll_up', 'a': 'pick', 'b': 'back'}
+
+    def __init__(self, scenes, data_handler, font):
+        Scene.__init__(self, scenes)
+        self.data_handler = data_handler
+        self.font = font
+
+        self.egg = None  # The egg the info is shown for.
+        self.info_text = None  # The description of the egg, made the first time the screen is shown.
+        self.info_icons = None  # The contentedness and metabolism of the egg.
+
+    def images(self):
+        """
+        Gets the images the info screen draws.
+        :return: list of (image path, alpha) tuples
+        """
+        return [(script_dir + '/resources/images/gui/{0}.png'.format(name), True)
+                for name in ['smiley', 'apple', 'star', 'blank_star', 'up_arrow', 'down_arrow']]
+
+    def enter(self, previous):
+        """
+        Shows the info of the egg selected on the egg selection screen.
+        :param previous: the scene that was on screen before
+        """
+        egg_select = self.scenes.scene('egg_select')
+        self.egg = egg_select.eggs[egg_select.selected]
+
+        # Draw the selected egg on screen
+        self.egg.rect.x = 8
+        self.egg.rect.y = 3
+        self.scenes.sprites.add(self.egg)
+
+        # Info screen for the eggs.
+        if self.info_text is None:
+            self.info_text = InfoText(self.font, self.egg.description)
+        else:
+            self.info_text.set_text(self.egg.description)
+        self.info_icons = EggInfo(self.egg.contentedness, self.egg.metabolism, (32, 4))
+
+    def scroll_down(self):
+        """
+        Scroll down on the info screen.
+        """
+        self.info_text.scroll_down()
+
+    def scroll_up(self):
+        """
+        Scroll up on the info screen.
+        """
+        self.info_text.scroll_up()
+
+    def pick(self):
+        """
+        Picks the egg and goes to the playground.
+        """
+        # Write save file with new attributes
+        self.data_handler.attributes['bloop'] = self.egg.egg_color
+        self.data_handler.attributes['health'] = 10
+        self.data_handler.attributes['hunger'] = 10
+        self.data_handler.attributes['happiness'] = 10
+        self.data_handler.attributes['evolution_stage'] = 'egg'
+        self.data_handler.write_save()
+
+        # Go to playground
+        self.scenes.switch('playground')
+
+    def back(self):
+        """
+        Go back to the egg selection screen.
+        """
+        self.scenes.switch('egg_select')
+
+    def render(self, surface):
+        """
+        Draws the info screen.
+        :param surface: the surface to draw on
+        """
+        self.info_text.draw(surface)
+        self.info_icons.draw(surface)
+        self.scenes.renderer.track(self.info_text)
+
+
+class PlaygroundScene(Scene):
+    """
+    The main screen of the game, where the bloop lives.
+    """
+
+    state = 'playground'
+    buttons = {'j_r': 'next_icon', 'j_l': 'prev_icon', 'a': 'select', 'b': 'toggle_menu'}
+
+    def __init__(self, scenes, data_handler):
+        Scene.__init__(self, scenes)
+        self.data_handler = data_handler
+
+        # Made the first time the screen is shown, and kept for as long as they are still right.
+        self.bloop = None
+        self.popup_menu = None
+
+    def images(self):
+        """
+        Gets the images the playground draws, which are the bloop in the save and the popup menu.
+        :return: list of (image path, alpha) tuples
+        """
+        attributes = self.data_handler.attributes
+        sprite_sheet = catalog.get(attributes['bloop']).stages[PlaygroundFriend.sprite_stage(attributes)][0]
+
+        images = [(sprite_sheet, True), (script_dir + '/resources/images/gui/popup_menu/frame.png', True)]
+        images += [(script_dir + '/resources/images/gui/popup_menu/{0}.png'.format(icon), True)
+                   for icon in PopupMenu.icon_names]
+        return images
+
+    def data(self):
+        """
+        Gets the JSON files of the popup menu icons.
+        :return: list of JSON file paths
+        """
+        return [script_dir + '/resources/images/gui/popup_menu/{0}.json'.format(icon) for icon in PopupMenu.icon_names]
+
+    def enter(self, previous):
+        """
+        Puts the bloop on screen with the popup menu closed.
+        :param previous: the scene that was on screen before
+        """
+        # Create the bloop again only if it is not the one in the save anymore.
+        if self.bloop is None or not self.bloop.matches(self.data_handler.attributes):
+            self.bloop = PlaygroundFriend(self.data_handler)
+        self.scenes.sprites.add(self.bloop)
+
+        if self.popup_menu is None:
+            self.popup_menu = PopupMenu((3, 3))
+        elif self.popup_menu.draw_menu:
+            self.popup_menu.toggle()
+
+        # The save is already up to date, so the logic starts counting time from now.
+        self.data_handler.clock.reset()
+
+    def next_icon(self):
+        """
+        Move selection to the next item
+        """
+        self.popup_menu.next()
+
+    def prev_icon(self):
+        """
+        Move selection to the previous item
+        """
+        self.popup_menu.prev()
+
+    def select(self):
+        """
+        Change to the menu the selected icon points to, or pet the bloop if the menu is closed.
+        """
+        if self.popup_menu.draw_menu:
+            self.scenes.switch(self.popup_menu.icons[self.popup_menu.selected].icon)
+        else:
+            self.bloop.pet()
+
+    def toggle_menu(self):
+        """
+        Toggle the popup menu on or off
+        """
+        self.popup_menu.toggle()
+
+    def update(self):
+        """
+        Runs the game logic.
+        """
+        with tracer.span('logic'):
+            self.data_handler.update()
+
+    def render(self, surface):
+        """
+        Draws the popup menu if toggled on.
+        :param surface: the surface to draw on
+        """
+        self.popup_menu.draw(surface)
+        self.scenes.renderer.track(self.popup_menu)
+
+    def still(self):
+        """
+        Eggs do not move, so the frame rate is reduced while one is on screen by itself.
+        :return: True if the bloop is an egg and the popup menu is closed
+        """
+        return self.bloop.evolution_stage == 'egg' and not self.popup_menu.draw_menu
+
+    def can_idle(self):
+        """
+        The game only goes idle while the popup menu is closed.
+        :return: True if the popup menu is closed
+        """
+        return not self.popup_menu.draw_menu
+
+
+class ErrorScene(Scene):
+    """
+    Error screen. This appears when a scene that does not exist has been switched to.
+    """
+
+    buttons = {'b': 'restart'}
+
+    def __init__(self, scenes, font):
+        Scene.__init__(self, scenes)
+        self.font = font
+        self.frames_passed = 0  # Counter for frames, helps ensure the game isn't frozen.
+
+    def images(self):
+        """
+        Gets the error screen image.
+        :return: list of (image path, alpha) tuples
+        """
+        return [(script_dir + '/resources/images/debug/invalid.png', True)]
+
+    def enter(self, previous):
+        """
+        Starts the frame counter from 0.
+        :param previous: the scene that was on screen before
+        """
+        self.frames_passed = 0
+
+    def restart(self):
+        """
+        Reset back to the title screen.
+        """
+        self.scenes.switch('title')
+
+    def update(self):
+        """
+        Counts the frames passed. Resets every second.
+        """
+        self.frames_passed += 1
+        if self.frames_passed >= game_fps:
+            self.frames_passed = 0
+
+    def render(self, surface):
+        """
+        Draws the error screen and the frame counter.
+        :param surface: the surface to draw on
+        """
+        error_screen = asset_cache.image(script_dir + '/resources/images/debug/invalid.png')
+        surface.blit(error_screen, (0, -8))
+
+        frame_counter = self.font.render('frames: {0}'.format(self.frames_passed), False, (64, 64, 64))
+        self.scenes.renderer.track_blit('frame_counter', surface.blit(frame_counter, (1, game_res - 10)), changed=True)
 
-# Makes Pygame draw on the display of the RPi.
-os.environ["SDL_FBDEV"] = "/dev/fb1"
 
 # Useful for debugging on the PC. Imports a fake RPi.GPIO library if one is not found (which it can't
 # be on a PC, RPi.GPIO cannot be installed outside of a Raspberry Pi.
@@ -534,27 +1133,73 @@ except ImportError:
     on_hardware = False
 
 
-def game():
+def game(screen_size=320, scale_filter=None, fps=game_fps, title_time=0, frame_hook=None, trace=False,
+         idle_time=60, save_backend='json', on_first_frame=None, keymap=None, timeline=None, framebuffer=None,
+         framebuffer_size=None):
     """
     Starts the game.
+    :param screen_size: the resolution of the display. The game is rendered at 80 pixels and upscaled from there.
+    :param scale_filter: pixel art filter to apply when upscaling, either None, 'scale2x' or 'scale3x'
+    :param fps: the most frames to draw per second. 0 draws frames as fast as possible.
+    :param title_time: the least time to show the title screen for in milliseconds. The title is always shown until
+    the save and the first screen have been loaded.
+    :param frame_hook: function called with the game state and submenu after every frame. Returning False from it
+    stops the game.
+    :param trace: True to time every frame and draw the frame time on screen. Press T to dump the trace.
+    :param idle_time: seconds without input on the playground before the display is turned off and only the game
+    logic runs. None to never go idle.
+    :param save_backend: how the save is stored, either 'json' or 'journal'
+    :param on_first_frame: function called as soon as the title is on screen, before anything else is loaded
+    :param keymap: dictionary of the name of the button each keyboard key stands in for by pygame key code, or None to
+    keep the keymap of the input bus
+    :param timeline: the timeline the game takes its time from, which can record the game or play a recording back.
+    None to run on the monotonic clock without recording.
+    :param framebuffer: framebuffer device to draw straight into, such as "/dev/fb1". None to draw with SDL.
+    :param framebuffer_size: (width, height) of the framebuffer, only needed if it is a plain file rather than a device
     """
-    pygame.init()
+    if framebuffer is None:
+        # Makes Pygame draw on the display of the RPi.
+        os.environ["SDL_FBDEV"] = "/dev/fb1"
+    else:
+        # SDL only draws into memory, and the game copies the changed parts into the framebuffer itself.
+        os.environ['SDL_VIDEODRIVER'] = 'dummy'
+
+    # Only start the parts of pygame that are used. Sound and joysticks are not, and take a while to start.
+    pygame.display.init()
+    pygame.font.init()
 
     # Hide the cursor for the Pi display.
     pygame.mouse.set_visible(False)
 
-    # The game is normally rendered at 80 pixels and upscaled from there. If changing displays, change the
-    # screen_size to reflect what the resolution of the new display is.
-    screen_size = 320
-
     window = pygame.display.set_mode((screen_size, screen_size))
-    surface = pygame.Surface((game_res, game_res))
+
+    display = None
+    if framebuffer is not None:
+        from .framebuffer import FramebufferDisplay
+        display = FramebufferDisplay(window.get_size(), framebuffer, framebuffer_size)
+
+        # The game is drawn in the pixel format of the framebuffer instead of the one SDL draws in.
+        window = display.window
+
+    # Draw in the pixel format of the window, and prepare every image for it, so that nothing is converted while
+    # drawing a frame.
+    surface = pygame.Surface((game_res, game_res), 0, window)
+    asset_cache.set_format(surface)
+
+    # Sends only the changed parts of the surface to the display.
+    renderer = DirtyRenderer(window, surface, scale_filter, display)
+
+    # Put the title on screen straight away so that there is something to look at while the rest of the game loads.
+    surface.blit(asset_cache.image(script_dir + '/resources/images/title.png'), (0, 0))
+    renderer.present()
+    if on_first_frame is not None:
+        on_first_frame()
 
     # Only really useful for PCs. Does nothing on the Raspberry Pi.
     pygame.display.set_caption('Pocket Friends {0}'.format(pocket_friends.__version__))
 
     # Add an icon to the pygame window.
-    icon = pygame.image.load(script_dir + '/resources/images/icon/icon.png').convert_alpha()
+    icon = asset_cache.image(script_dir + '/resources/images/icon/icon.png')
     pygame.display.set_icon(icon)
 
     clock = pygame.time.Clock()
@@ -562,10 +1207,15 @@ def game():
     # Font used for small text in the game. Bigger text is usually image files.
     small_font = pygame.font.Font(script_dir + '/resources/fonts/5Pts5.ttf', 10)
 
-    # Default game state when the game first starts.
-    game_state = 'title'
     running = True
-    data_handler = DataHandler()
+    data_handler = DataHandler(save_backend)
+
+    # Everything that keeps time reads it from the timeline, so that a recorded game plays back the same.
+    if timeline is None:
+        timeline = Timeline()
+    timeline.start()
+    data_handler.clock.clock = timeline.clock
+    power_manager.clock = timeline.clock
 
     # A group of all the sprites on screen. Used to update all sprites at onc
     all_sprites = pygame.sprite.Group()
@@ -573,62 +1223,78 @@ def game():
     # Start the GPIO handler to take in buttons from the RPi HAT.
     GPIOHandler.setup()
 
-    # Dev code used to exit the game. Default Down, Down, Up, Up, Down, Down, Up, Up, A, A, B
-    dev_code = deque()
-    for button in [Constants.buttons.get('j_d'), Constants.buttons.get('j_d'), Constants.buttons.get('j_u'),
-                   Constants.buttons.get('j_u'), Constants.buttons.get('j_d'), Constants.buttons.get('j_d'),
-                   Constants.buttons.get('j_u'), Constants.buttons.get('j_u'), Constants.buttons.get('a'),
-                   Constants.buttons.get('a'), Constants.buttons.get('b')]:
-        dev_code.append(button)
+    # Start with no presses waiting from a previous game.
+    input_bus.clear()
+    if keymap is not None:
+        input_bus.set_keymap(keymap)
+
+    # Time the current frame started, used for tracing.
+    frame_start = 0.0
+    tracer.enabled = trace
+
+    power_manager.idle_time = idle_time
+    power_manager.reset()
+
+    def draw_frame_time():
+        """
+        Draws a bar and the number of milliseconds the last frame took along the bottom of the screen. A full bar means
+        the frame took as long as a frame at the game's frame rate is allowed to.
+        """
+        frame_time = tracer.last('frame')
+        area = pygame.Rect(0, game_res - 9, game_res, 9)
+
+        bar_width = min(round(frame_time * game_fps * game_res), game_res)
+        surface.fill((64, 64, 64), (0, game_res - 2, bar_width, 2))
 
-    # Log of the inputs.
-    input_log = deque()
+        text = small_font.render('{0:.1f}ms'.format(frame_time * 1000), False, (64, 64, 64))
+        surface.blit(text, (game_res - text.get_width() - 1, game_res - 9))
 
-    # Time since last input. Used to help regulate double presses of buttons.
-    last_input_tick = 0
+        renderer.mark(area)
 
     def draw():
         """
         Draws the main pygame display.
         """
+        nonlocal running
+
+        # Draws all the sprites on screen and scales the changed parts of the screen to the correct size from the
+        # rendered size.
+        with tracer.span('sprite_update'):
+            all_sprites.update()
+        with tracer.span('compose'):
+            all_sprites.draw(surface)
+            renderer.track_sprites(all_sprites)
+
+        if tracer.enabled:
+            draw_frame_time()
 
-        # Draws all the sprites on screen and scales the screen to the correct size from the rendered size.
-        all_sprites.update()
-        all_sprites.draw(surface)
-        frame = pygame.transform.scale(surface, (screen_size, screen_size))
-        window.blit(frame, frame.get_rect())
+        # Update the changed parts of the display.
+        renderer.present()
+        tracer.add('frame', frame_start, tracer.now())
+        timeline.frame_drawn(surface)
 
-        # Update the entire display.
-        pygame.display.flip()
+        if frame_hook is not None and frame_hook(scenes.current.state, scenes.current.submenu) is False:
+            running = False
 
     def draw_bg():
         """
         Draws the main game background image onto a given surface.
         """
-        bg_image = pygame.image.load(script_dir + '/resources/images/bg.png').convert()
+        bg_image = asset_cache.image(script_dir + '/resources/images/bg.png', alpha=False)
         surface.blit(bg_image, (0, 0))
 
-    def log_button(pressed_button):
+    def accept_press(event):
         """
-        Logs the button presses to register the dev code.
-        :param pressed_button: The button code to be logged
+        Checks a button press before it goes on the input bus. Every press counts as an input. Bounces of the GPIO
+        buttons have already been thrown away by the GPIO handler, one button at a time.
+        :param event: the input event of the press
+        :return: True if the press should be handled
         """
-        input_log.append(pressed_button)
-        if len(input_log) > len(dev_code):
-            input_log.popleft()
+        power_manager.input()
+        timeline.event(event)
+        return True
 
-    def create_event(pressed_button):
-        """
-        Creates a pygame event with a given keyboard code
-        :param pressed_button:
-        """
-        nonlocal last_input_tick
-        # Register a button click so long as the last button click happened no less than two frames ago
-        if pygame.time.get_ticks() - last_input_tick > clock.get_time() * 2 or not on_hardware:
-            pygame.event.post(pygame.event.Event(KEYDOWN, {'key': pressed_button}))
-            pygame.event.post(pygame.event.Event(KEYUP, {'key': pressed_button}))
-            log_button(pressed_button)
-        last_input_tick = pygame.time.get_ticks()
+    input_bus.accept = accept_press
 
     def check_dev_code():
         """
@@ -636,349 +1302,193 @@ def game():
         """
         nonlocal running
 
-        if dev_code == input_log:
+        if input_bus.dev_code_entered:
             running = False
 
     def handle_gpio():
         """
-        Handles getting GPIO button presses and making a pygame event when a press is detected.
+        Puts every GPIO button pressed since the last frame on the input bus, in the order they were pressed.
         """
-        for pressed_button in Constants.buttons:
-            code = Constants.buttons.get(pressed_button)
-
-            # Check if a button has been pressed. If it has, create a pygame event for it.
-            if GPIOHandler.get_press(code):
-                create_event(code)
+        for pin, timestamp in GPIOHandler.get_presses():
+            input_bus.pin(pin, timestamp)
 
     def keyboard_handler():
         """
-        Simulates key presses to GPIO button presses. Also handles quitting the game.
+        Puts keys that stand in for GPIO buttons on the input bus. Also handles quitting the game.
         """
         nonlocal running
 
-        # Checks if a corresponding keyboard key has been pressed. If it has, emulate a button press.
         for keyboard_event in pygame.event.get():
             if keyboard_event.type == pygame.QUIT:
                 running = False
-            if keyboard_event.type == pygame.KEYDOWN:
-                if keyboard_event.key == pygame.K_a:
-                    create_event(Constants.buttons.get('a'))
-                if keyboard_event.key == pygame.K_b:
-                    create_event(Constants.buttons.get('b'))
-                if keyboard_event.key == pygame.K_PERIOD:
-                    create_event(Constants.buttons.get('j_i'))
-                if keyboard_event.key == pygame.K_RIGHT:
-                    create_event(Constants.buttons.get('j_r'))
-                if keyboard_event.key == pygame.K_LEFT:
-                    create_event(Constants.buttons.get('j_l'))
-                if keyboard_event.key == pygame.K_DOWN:
-                    create_event(Constants.buttons.get('j_d'))
-                if keyboard_event.key == pygame.K_UP:
-                    create_event(Constants.buttons.get('j_u'))
+            # Keys that are not in the keymap control the game itself.
+            if keyboard_event.type == pygame.KEYDOWN and not input_bus.key(keyboard_event.key):
                 if keyboard_event.key == pygame.K_ESCAPE:
                     running = False
+                if keyboard_event.key == pygame.K_t and tracer.enabled:
+                    tracer.dump(save_dir + '/trace.json')
 
-    def pre_handler():
+    def wait_for_input(timeout):
         """
-        Runs at the beginning of each loop, handles drawing the background, controlling game speed, and
-        controlling the GPIO button inputs and keyboard handler
+        Sleeps until there is an input or the timeout runs out. The input that ends the wait is thrown away.
+        :param timeout: the most seconds to wait for
+        :return: True if there was an input, False if the timeout ran out
         """
-        # Regulate the speed of the game.
-        clock.tick(game_fps)
-
-        # Handle all inputs for both debugging and real GPIO button presses.
-        keyboard_handler()
-        handle_gpio()
-        check_dev_code()
-
-        # Draw the background.
-        draw_bg()
+        nonlocal running
 
-    while running:
-        if game_state == 'title':
-            all_sprites.empty()
-            pre_handler()
-
-            # Draw the title image in the middle of the screen.
-            title_image = pygame.image.load(script_dir + '/resources/images/title.png').convert_alpha()
-            surface.blit(title_image, (0, 0))
-            draw()
-
-            # Show the title for 1 second then move on to the initialization phase of the game.
-            pygame.time.wait(1000)
-            game_state = 'init'
-
-        elif game_state == 'playground':
-
-            # Submenu used within the playground.
-            submenu = 'main'
-
-            while running and game_state == 'playground':
-
-                all_sprites.empty()
-
-                if submenu == 'main':
-
-                    # Create the bloop and the menu
-                    bloop = PlaygroundFriend(data_handler)
-                    all_sprites.add(bloop)
-                    popup_menu = PopupMenu((3, 3))
-
-                    while running and game_state == 'playground' and submenu == 'main':
-                        pre_handler()
-                        data_handler.update()
-
-                        for event in pygame.event.get():
-                            if event.type == pygame.KEYDOWN:
-                                if event.key == Constants.buttons.get('j_r'):
-                                    # Move selection to the next item
-                                    popup_menu.next()
-                                if event.key == Constants.buttons.get('j_l'):
-                                    # Move selection to the previous item
-                                    popup_menu.prev()
-                                if event.key == Constants.buttons.get('a'):
-                                    # Change submenu to the menu the icon points to
-                                    if popup_menu.draw_menu:
-                                        submenu = popup_menu.icons[popup_menu.selected].icon
-                                    else:  # Pet the bloop otherwise
-                                        bloop.pet()
-                                if event.key == Constants.buttons.get('b'):
-                                    # Toggle the popup menu on or off
-                                    popup_menu.toggle()
-
-                        # Draw the popup menu if toggled on
-                        popup_menu.draw(surface)
-
-                        draw()
-
-                else:  # Go to the error state if an invalid state is set.
-                    game_state = None
-
-        elif game_state == 'init':
-            all_sprites.empty()
-            pre_handler()
-            draw()
-
-            # Read the save file.
-            data_handler.read_save()
-
-            # Determines if it is a new game or not by looking at the evolution stage. If it is -1, the egg has
-            # not been created yet, and the game sends you to the egg selection screen. If not, the game sends
-            # you to the playground.
-            if data_handler.attributes['bloop'] == '':
-                game_state = 'egg_select'
-            else:
-                game_state = 'playground'
+        # On the hardware, sleep until the GPIO interrupt thread queues a press.
+        if on_hardware:
+            return GPIOHandler.wait_for_press(timeout) is not None
 
-        elif game_state == 'egg_select':
+        # Otherwise wait on faked GPIO presses as well as the keyboard, checking the keyboard once a frame.
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
 
-            # Submenu used within the egg selection menu.
-            submenu = 'main'
+            if GPIOHandler.wait_for_press(min(remaining, 1 / game_fps)) is not None:
+                return True
 
-            selected = 0
-            selected_color = ""
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    running = False
+                    return True
+                if event.type == pygame.KEYDOWN:
+                    return True
 
-            while running and game_state == 'egg_select':
+    def idle():
+        """
+        Turns off or dims the display and only runs the game logic once a second until there is an input.
+        """
+        power_manager.enter('idle')
 
-                all_sprites.empty()
+        if power_manager.idle_display == 'dim':
+            window.fill((64, 64, 64), special_flags=BLEND_MULT)
+        else:
+            window.fill((0, 0, 0))
+        renderer.display.flip()
 
-                if submenu == 'main':
-
-                    # Creates and holds the egg objects in a list.
-                    eggs = [SelectionEgg('dev_egg'), SelectionEgg('blue'), SelectionEgg('rainbow')]
+        while running:
+            if timeline.wait(data_handler.clock.until_next(), wait_for_input):
+                break
 
-                    # How many eggs per row should be displayed.
-                    eggs_per_row = 3
-                    distance_between_eggs = 36 / eggs_per_row
+            # Catch up on every second that has passed.
+            with tracer.span('logic'):
+                data_handler.update()
 
-                    # Count the total rows.
-                    total_rows = -(-len(eggs) // eggs_per_row)
-                    distance_between_rows = 32 / eggs_per_row
+        power_manager.enter('active')
+        power_manager.input()
+        renderer.invalidate()
 
-                    # Determine the location of each egg.
-                    for egg in eggs:
-                        current_row = eggs.index(egg) // eggs_per_row
-                        rows_after = total_rows - (current_row + 1)
-                        egg_in_row = eggs.index(egg) % eggs_per_row
-                        eggs_after = min(len(eggs) - (current_row * eggs_per_row), eggs_per_row) - (egg_in_row + 1)
+    def pre_handler(still=False):
+        """
+        Runs at the beginning of each loop, handles drawing the background, controlling game speed, and
+        controlling the GPIO button inputs and keyboard handler
+        :param still: True if nothing on screen is moving, which lets the game draw at a reduced frame rate
+        """
+        nonlocal frame_start
 
-                        x_offset = 32
-                        y_offset = 30
+        # Regulate the speed of the game.
+        clock.tick(power_manager.frame_rate(fps, still))
+        timeline.frame()
+        frame_start = tracer.now()
 
-                        # The x coordinate of an egg is determined by which egg in the row it is, and how many eggs
-                        # are in that row. If there is only 1 egg in a row, it is in the middle of the screen. If
-                        # there are two, they're on equal halves and so on.
-                        x = x_offset - (eggs_after * distance_between_eggs) + (egg_in_row * distance_between_eggs)
-                        y = y_offset - (rows_after * distance_between_rows) + (current_row * distance_between_rows)
+        # Handle all inputs for both debugging and real GPIO button presses.
+        with tracer.span('keyboard_handler'):
+            keyboard_handler()
+        with tracer.span('handle_gpio'):
+            handle_gpio()
+        check_dev_code()
 
-                        egg.rect.x = x
-                        egg.rect.y = y
+        # Draw the background.
+        with tracer.span('draw_bg'):
+            draw_bg()
 
-                        # Add the egg to the sprite list.
-                        all_sprites.add(egg)
+    # Every screen of the game, made once and switched between by name.
+    scenes = SceneManager(surface, renderer, all_sprites)
+    scenes.add('title', TitleScene(scenes, data_handler, title_time, timeline))
+    scenes.add('init', InitScene(scenes))
+    scenes.add('egg_select', EggSelectScene(scenes))
+    scenes.add('bloop_info', BloopInfoScene(scenes, data_handler, small_font))
+    scenes.add('playground', PlaygroundScene(scenes, data_handler))
+    scenes.add('error', ErrorScene(scenes, small_font))
 
-                    def get_cursor_coords(selection):
-                        """
-                        Gets the coordinates of an egg on the selection screen by index and returns it as a tuple
-                        :param selection: index of the egg to be selected
-                        :return: tuple of the coordinates of the selected egg
-                        """
-                        cursor_x_offset = -2
-                        cursor_y_offset = -2
-
-                        return eggs[selection].rect.x + cursor_x_offset, eggs[selection].rect.y + cursor_y_offset
-
-                    def sel_left():
-                        """
-                        Select the egg to the left with constraints.
-                        """
-                        nonlocal selected
-
-                        if selected % eggs_per_row != 0:
-                            selected -= 1
-
-                    def sel_right():
-                        """
-                        Select the egg to the right with constraints.
-                        """
-                        nonlocal selected
-
-                        row = selected // eggs_per_row
-                        eggs_in_row = min(len(eggs) - (row * eggs_per_row), eggs_per_row)
-
-                        if selected % eggs_per_row != eggs_in_row - 1:
-                            selected += 1
-
-                    def sel_up():
-                        """
-                        Select the egg above with constraints.
-                        """
-                        nonlocal selected
-
-                        if selected // eggs_per_row != 0:
-                            selected -= eggs_per_row
-
-                    def sel_down():
-                        """
-                        Select the egg below with constraints.
-                        """
-                        nonlocal selected
-
-                        if selected // eggs_per_row != total_rows - 1:
-                            selected += eggs_per_row
-
-                    while running and game_state == 'egg_select' and submenu == 'main':
-
-                        pre_handler()
-
-                        for event in pygame.event.get():
-                            if event.type == pygame.KEYDOWN:
-                                if event.key == Constants.buttons.get('j_r'):
-                                    sel_right()
-                                if event.key == Constants.buttons.get('j_l'):
-                                    sel_left()
-                                if event.key == Constants.buttons.get('j_d'):
-                                    sel_down()
-                                if event.key == Constants.buttons.get('j_u'):
-                                    sel_up()
-                                if event.key == Constants.buttons.get('a'):
-                                    # Advance to the egg info screen for the selected egg.
-                                    submenu = 'bloop_info'
-
-                        # Draws the cursor on screen.
-                        cursor = pygame.image.load(
-                            script_dir + '/resources/images/gui/egg_selector.png').convert_alpha()
-                        surface.blit(cursor, get_cursor_coords(selected))
-
-                        selected_color = eggs[selected].egg_color
-
-                        draw()
-
-                elif submenu == 'bloop_info':
-
-                    # Draw the selected egg on screen
-                    egg = SelectionEgg(selected_color)
-                    egg.rect.x = 8
-                    egg.rect.y = 3
-                    all_sprites.add(egg)
-
-                    # Info screen for the eggs.
-                    info_text = InfoText(small_font, egg.description)
-                    info_icons = EggInfo(egg.contentedness, egg.metabolism, (32, 4))
-
-                    while running and game_state == 'egg_select' and submenu == 'bloop_info':
-
-                        pre_handler()
-
-                        for event in pygame.event.get():
-                            if event.type == pygame.KEYDOWN:
-                                if event.key == Constants.buttons.get('j_d'):
-                                    # Scroll down on the info screen.
-                                    info_text.scroll_down()
-                                if event.key == Constants.buttons.get('j_u'):
-                                    # Scroll up on the info screen.
-                                    info_text.scroll_up()
-                                if event.key == Constants.buttons.get('a'):
-                                    # Write save file with new attributes
-                                    data_handler.attributes['bloop'] = egg.egg_color
-                                    data_handler.attributes['health'] = 10
-                                    data_handler.attributes['hunger'] = 10
-                                    data_handler.attributes['happiness'] = 10
-                                    data_handler.attributes['evolution_stage'] = 'egg'
-                                    data_handler.write_save()
-
-                                    # Go to playground
-                                    game_state = 'playground'
-                                if event.key == Constants.buttons.get('b'):
-                                    # Go back to the egg selection screen.
-                                    submenu = 'main'
-
-                        # Draw the info screen.
-                        info_text.draw(surface)
-                        info_icons.draw(surface)
-
-                        draw()
-
-                else:  # Go to the error state if an invalid state is set.
-                    game_state = None
+    # Go to the error screen if a scene that does not exist is switched to.
+    scenes.error = 'error'
 
-        else:
-            # Error screen. This appears when an invalid game state has been selected.
+    # Default scene when the game first starts.
+    scenes.switch('title')
+    scenes.apply()
 
-            all_sprites.empty()
-            frames_passed = 0  # Counter for frames, helps ensure the game isn't frozen.
+    while running:
+        scene = scenes.current
 
-            while running and game_state != 'title':
+        # Still scenes are drawn at a reduced frame rate.
+        pre_handler(scene.still())
 
-                pre_handler()
+        # Hand the buttons pressed since the last frame to the scene.
+        input_bus.dispatch(scene.dispatch)
 
-                # Draw the error screen
-                error_screen = pygame.image.load(script_dir + '/resources/images/debug/invalid.png').convert_alpha()
-                surface.blit(error_screen, (0, -8))
+        # The game logic keeps to real time by itself, so frames can be drawn at any rate.
+        scene.update()
 
-                # Counts the frames passed. Resets every second.
-                frames_passed += 1
-                if frames_passed >= game_fps:
-                    frames_passed = 0
+        # Switch scenes if a button or the logic asked for it, so that the new scene is drawn on this frame.
+        scene = scenes.apply()
 
-                # Draws the frame counter.
-                frame_counter = small_font.render('frames: {0}'.format(frames_passed), False, (64, 64, 64))
-                surface.blit(frame_counter, (1, game_res - 10))
+        with tracer.span('render'):
+            scene.render(surface)
+        draw()
 
-                for event in pygame.event.get():
-                    if event.type == pygame.KEYDOWN:
-                        if event.key == Constants.buttons.get('b'):
-                            # Reset back to the title screen.
-                            game_state = 'title'
+        # Stop drawing if nobody has touched the game in a while.
+        if power_manager.is_idle() and scene.can_idle():
+            idle()
 
-                draw()
+    # Make sure the last save is on disk before the game closes.
+    save_writer.flush()
+    timeline.close()
+    if display is not None:
+        display.close()
 
 
-def main():
+def main(screen_size=320, scale_filter=None, trace=False, idle_time=60, idle_display='blank', save_backend='json',
+         on_first_frame=None, record=None, framebuffer=None, framebuffer_size=None):
     """
     Calls the game() function to start the game.
+    :param screen_size: the resolution of the display
+    :param scale_filter: pixel art filter to apply when upscaling
+    :param trace: True to time every frame. The trace is written to "trace.json" in the save directory on exit.
+    :param idle_time: seconds without input before going idle, or None to never go idle
+    :param idle_display: what to show while idle, either 'blank' or 'dim'
+    :param save_backend: how the save is stored, either 'json' or 'journal'
+    :param on_first_frame: function called as soon as the title is on screen
+    :param record: file to record the game to, to be played back with --replay. None to not record.
+    :param framebuffer: framebuffer device to draw straight into, or None to draw with SDL
+    :param framebuffer_size: (width, height) of the framebuffer if it is a plain file
     """
-    game()
+    power_manager.idle_display = idle_display
+
+    timeline = None
+    if record is not None:
+        header = {
+            'version': pocket_friends.__version__,
+            'fps': game_fps,
+            'title_time': 0,
+            'screen_size': screen_size,
+            'filter': scale_filter,
+            'idle_time': idle_time,
+            'started': time.time(),
+        }
+        timeline = Timeline(Recorder(record, header))
+
+    game(screen_size, scale_filter, trace=trace, idle_time=idle_time, save_backend=save_backend,
+         on_first_frame=on_first_frame, timeline=timeline, framebuffer=framebuffer, framebuffer_size=framebuffer_size)
+
+    if trace:
+        tracer.dump(save_dir + '/trace.json')
+        tracer.enabled = False
 
     GPIOHandler.teardown()
+    # Converted images depend on the display, so they are dropped along with it.
+    asset_cache.clear()
     pygame.quit()
@@ -0,0 +1,208 @@
+"""
+Module for the input of the game. Key presses from the keyboard and button presses from the GPIO pins are turned into
+one stream of input events, named after the buttons of the HAT and stamped with the time of the press. Scenes handle
+the events with a table of the buttons they use, so handling a press is a single lookup however many buttons there are.
+"""
+from collections import deque, namedtuple
+import time
+import pygame
+from ..hardware.gpio_handler import Constants
+
+# A press of a button. The button is the name of the button on the HAT, such as 'a' or 'j_u', the source is either
+# 'keyboard' or 'gpio', and the timestamp is the time.monotonic() time of the press.
+InputEvent = namedtuple('InputEvent', ['button', 'source', 'timestamp'])
+
+# Keyboard keys that stand in for the buttons of the HAT when playing on a PC.
+default_keymap = {
+    pygame.K_a: 'a',
+    pygame.K_b: 'b',
+    pygame.K_PERIOD: 'j_i',
+    pygame.K_UP: 'j_u',
+    pygame.K_DOWN: 'j_d',
+    pygame.K_LEFT: 'j_l',
+    pygame.K_RIGHT: 'j_r',
+}
+
+# The name of the button on each GPIO pin.
+pin_buttons = {pin: button for button, pin in Constants.buttons.items()}
+
+# Dev code used to exit the game. Down, Down, Up, Up, Down, Down, Up, Up, A, A, B
+dev_code = ['j_d', 'j_d', 'j_u', 'j_u', 'j_d', 'j_d', 'j_u', 'j_u', 'a', 'a', 'b']
+
+
+class SequenceMatcher:
+    """
+    Spots a sequence of buttons in a stream of presses, one press at a time. A press that does not continue the
+    sequence only falls back as far as it has to, using the prefix table of the Knuth-Morris-Pratt algorithm, so every
+    press takes about the same time no matter how long the sequence is.
+    """
+
+    def __init__(self, sequence):
+        self.sequence = list(sequence)
+        self.matched = 0  # Number of buttons at the start of the sequence matched by the latest presses.
+
+        # For each number of matched buttons, how many of them still match if the next press does not.
+        self._fallback = [0] * len(self.sequence)
+        matched = 0
+        for i in range(1, len(self.sequence)):
+            while matched > 0 and self.sequence[i] != self.sequence[matched]:
+                matched = self._fallback[matched - 1]
+            if self.sequence[i] == self.sequence[matched]:
+                matched += 1
+            self._fallback[i] = matched
+
+    def feed(self, button):
+        """
+        Adds a press to the ones seen so far.
+        :param button: the name of the button that was pressed
+        :return: True if the press finishes the sequence
+        """
+        while self.matched > 0 and button != self.sequence[self.matched]:
+            self.matched = self._fallback[self.matched - 1]
+        if button == self.sequence[self.matched]:
+            self.matched += 1
+
+        if self.matched == len(self.sequence):
+            self.matched = self._fallback[-1]
+            return True
+        return False
+
+    def reset(self):
+        """
+        Forgets every press seen so far.
+        """
+        self.matched = 0
+
+
+class InputBus:
+    """
+    Queue of input events from every source. Events are published as the keyboard and GPIO pins are read, and handed
+    to the dispatch table of the scene on screen once a frame. Keeps counters of the time spent in the bus and the time
+    from a press to it being handled.
+    """
+
+    def __init__(self, keymap=None, code=dev_code):
+        # Keyboard key to the name of the button it stands in for.
+        self.keymap = dict(default_keymap if keymap is None else keymap)
+
+        self.events = deque()  # Events waiting to be dispatched.
+        self.accept = None  # Function called with every new event that can return False to throw it away.
+        self.clock = time.monotonic  # Function that gets the time events are stamped and timed with.
+
+        self.dev_code = SequenceMatcher(code)
+        self.dev_code_entered = False  # Whether the dev code has been entered.
+
+        # Counters to see how much input there is and how long it takes to handle.
+        self.published = {'keyboard': 0, 'gpio': 0}
+        self.rejected = 0  # Events thrown away by the accept function.
+        self.handled = 0  # Events given to a handler.
+        self.unhandled = 0  # Events for buttons the scene on screen does not use.
+        self.overhead = 0.0  # Seconds spent in the bus itself, not counting the handlers.
+        self.latency_total = 0.0  # Seconds from press to handler, added up over every handled event.
+        self.latency_max = 0.0  # The longest time from a press to its handler in seconds.
+
+    def set_keymap(self, keymap):
+        """
+        Changes which keyboard keys stand in for which buttons.
+        :param keymap: dictionary of the name of each button by pygame key code
+        """
+        self.keymap = dict(keymap)
+
+    def key(self, key, timestamp=None):
+        """
+        Publishes the press of a keyboard key, if it stands in for a button.
+        :param key: the pygame key code of the key
+        :param timestamp: the time.monotonic() time of the press, or None for now
+        :return: True if the key stands in for a button
+        """
+        button = self.keymap.get(key)
+        if button is None:
+            return False
+
+        self.publish(button, 'keyboard', timestamp)
+        return True
+
+    def pin(self, pin, timestamp=None):
+        """
+        Publishes the press of a button on a GPIO pin.
+        :param pin: the GPIO pin of the button
+        :param timestamp: the time.monotonic() time of the press, or None for now
+        :return: True if there is a button on the pin
+        """
+        button = pin_buttons.get(pin)
+        if button is None:
+            return False
+
+        self.publish(button, 'gpio', timestamp)
+        return True
+
+    def publish(self, button, source, timestamp=None):
+        """
+        Adds a press to the events waiting to be dispatched.
+        :param button: the name of the button
+        :param source: where the press came from, either 'keyboard' or 'gpio'
+        :param timestamp: the time.monotonic() time of the press, or None for now
+        """
+        start = time.perf_counter()
+
+        event = InputEvent(button, source, self.clock() if timestamp is None else timestamp)
+        if self.accept is not None and not self.accept(event):
+            self.rejected += 1
+        else:
+            self.events.append(event)
+            self.published[source] = self.published.get(source, 0) + 1
+            if self.dev_code.feed(button):
+                self.dev_code_entered = True
+
+        self.overhead += time.perf_counter() - start
+
+    def dispatch(self, table):
+        """
+        Hands every waiting event to its handler, in the order the buttons were pressed.
+        :param table: dictionary of the function that handles each button by button name
+        """
+        while self.events:
+            start = time.perf_counter()
+            event = self.events.popleft()
+            handler = table.get(event.button)
+
+            if handler is None:
+                self.unhandled += 1
+                self.overhead += time.perf_counter() - start
+                continue
+
+            latency = self.clock() - event.timestamp
+            self.latency_total += latency
+            self.latency_max = max(self.latency_max, latency)
+            self.handled += 1
+            self.overhead += time.perf_counter() - start
+
+            handler()
+
+    def clear(self):
+        """
+        Throws away every waiting event and forgets the presses of the dev code.
+        """
+        self.events.clear()
+        self.dev_code.reset()
+        self.dev_code_entered = False
+
+    def stats(self):
+        """
+        Gets the counters of the bus.
+        :return: dictionary of the bus counters, with times in microseconds and milliseconds
+        """
+        published = sum(self.published.values())
+        return {
+            'published': dict(self.published),
+            'rejected': self.rejected,
+            'handled': self.handled,
+            'unhandled': self.unhandled,
+            'overhead_us': round(self.overhead / published * 1000000, 3) if published else None,
+            'mean_latency_ms': round(self.latency_total / self.handled * 1000, 3) if self.handled else None,
+            'max_latency_ms': round(self.latency_max * 1000, 3),
+        }
+
+
+# Input bus shared by the entire game.
+input_bus = InputBus()
@@ -0,0 +1,178 @@
+"""
+Module for the journaled save format. Instead of rewriting the whole save every time, each change is appended to a
+journal as a small record. The full save is rebuilt on startup from the latest checkpoint plus the records after it,
+and the journal is compacted into a new checkpoint once it gets long enough.
+"""
+import json
+import os
+from .save_writer import write_atomic
+
+# Used to tell apart attributes that are missing from ones that are set to None.
+_missing = object()
+
+
+class JournalStore:
+    """
+    Save storage made up of a checkpoint file holding the full save data and a journal file holding every change made
+    since the checkpoint. Each journal record is one line of JSON with a sequence number, the attributes that were set
+    and the attributes that were removed.
+    """
+
+    def __init__(self, directory, compact_after=256):
+        self.checkpoint_path = directory + '/save.checkpoint.json'
+        self.journal_path = directory + '/save.journal'
+        self.compact_after = compact_after  # Number of journal records before they are compacted into a checkpoint.
+
+        self._state = None  # The save data as of the last record.
+        self.sequence = 0  # Sequence number of the last record.
+        self.records = 0  # Number of records in the journal after the checkpoint.
+
+        # Metrics of the store.
+        self.bytes_appended = 0
+        self.compactions = 0
+
+    def load(self, repair=True):
+        """
+        Rebuilds the save data by replaying the journal on top of the checkpoint.
+        :param repair: False to leave a damaged journal as it is instead of compacting it
+        :return: dictionary of the save data, or None if there is no save
+        """
+        try:
+            with open(self.checkpoint_path, 'r') as checkpoint_file:
+                checkpoint = json.load(checkpoint_file)
+                checkpoint_file.close()
+        except FileNotFoundError:
+            checkpoint = None
+
+        state = dict(checkpoint['attributes']) if checkpoint is not None else {}
+        sequence = checkpoint['sequence'] if checkpoint is not None else 0
+        records = 0
+        damaged = False
+
+        try:
+            with open(self.journal_path, 'r') as journal_file:
+                for line in journal_file:
+                    try:
+                        record = json.loads(line)
+
+                        # Records already in the checkpoint are left over from a compaction that was cut off.
+                        if record['seq'] <= sequence:
+                            continue
+
+                        changed = dict(record.get('set', {}))
+                        removed = list(record.get('del', []))
+                        seq = int(record['seq'])
+                    except (ValueError, KeyError, TypeError):
+                        # A record cut off by a power cut, or one that is not a record at all. Nothing after it can be
+                        # trusted.
+                        damaged = True
+                        break
+
+                    state.update(changed)
+                    for key in removed:
+                        state.pop(key, None)
+                    sequence = seq
+                    records += 1
+                journal_file.close()
+        except FileNotFoundError:
+            pass
+
+        if checkpoint is None and records == 0:
+            return None
+
+        self._state = state
+        self.sequence = sequence
+        self.records = records
+
+        # Start a clean journal so that new records are not appended after a damaged one.
+        if damaged and repair:
+            self.compact()
+
+        return dict(state)
+
+    def write(self, path, data):
+        """
+        Appends the changes between the last save and a new one to the journal. Has the same arguments as
+        write_atomic() so that it can be used by the save writer.
+        :param path: not used, the journal path is always written to
+        :param data: the new save data as a JSON string
+        """
+        attributes = json.loads(data)
+        last = self._state if self._state is not None else {}
+
+        changed = {key: value for key, value in attributes.items() if last.get(key, _missing) != value}
+        removed = [key for key in last if key not in attributes]
+
+        if not changed and not removed:
+            return
+
+        record = {'seq': self.sequence + 1, 'set': changed}
+        if removed:
+            record['del'] = removed
+        line = json.dumps(record, separators=(',', ':')) + '\n'
+
+        with open(self.journal_path, 'a') as journal_file:
+            journal_file.write(line)
+            journal_file.flush()
+            os.fsync(journal_file.fileno())
+            journal_file.close()
+
+        self.sequence += 1
+        self.records += 1
+        self.bytes_appended += len(line)
+        self._state = attributes
+
+        if self.records >= self.compact_after:
+            self.compact()
+
+    def compact(self):
+        """
+        Writes the current save data as a new checkpoint and empties the journal.
+        """
+        state = self._state if self._state is not None else {}
+
+        # The checkpoint is written first. If the journal is not emptied afterwards, its records are skipped on load.
+        write_atomic(self.checkpoint_path, json.dumps({'sequence': self.sequence, 'attributes': state}))
+
+        with open(self.journal_path, 'w') as journal_file:
+            journal_file.flush()
+            os.fsync(journal_file.fileno())
+            journal_file.close()
+
+        self.records = 0
+        self.compactions += 1
+
+    def import_json(self, path, compact=True):
+        """
+        Replaces the save data with a save in the plain JSON format.
+        :param path: the JSON save file to import
+        :param compact: False to only hold the imported save in memory instead of writing it as the checkpoint
+        :return: dictionary of the imported save data
+        """
+        with open(path, 'r') as save_file:
+            attributes = json.load(save_file)
+            save_file.close()
+
+        self._state = attributes
+        if compact:
+            self.compact()
+        return dict(attributes)
+
+    def export_json(self, path):
+        """
+        Writes the save data in the plain JSON format.
+        :param path: the JSON save file to write
+        """
+        write_atomic(path, json.dumps(self._state if self._state is not None else {}))
+
+    def stats(self):
+        """
+        Gets the metrics of the store.
+        :return: dictionary of the metrics
+        """
+        return {
+            'sequence': self.sequence,
+            'records': self.records,
+            'bytes_appended': self.bytes_appended,
+            'compactions': self.compactions,
+        }
@@ -0,0 +1,192 @@
+"""
+Module for the output stage of the renderer, which scales the game surface up to the size of the display. Every
+surface the stage draws into is allocated once, and scaling is exact nearest-neighbour for any display size. Pixel
+art filters (scale2x and scale3x) can be applied before scaling.
+"""
+from bisect import bisect_left
+from array import array
+from collections import OrderedDict
+import pygame
+
+# How much each filter scales the image by.
+filters = {
+    None: 1,
+    'scale2x': 2,
+    'scale3x': 3,
+}
+
+
+def scale3x(source):
+    """
+    Scales a surface to three times its size using the scale3x (AdvMAME3x) pixel art algorithm.
+    :param source: the surface to be scaled
+    :return: the scaled surface
+    """
+    width, height = source.get_size()
+    pixels = array('I', pygame.image.tostring(source, 'RGBA'))
+    scaled = array('I', bytes(len(pixels) * 9 * 4))
+    scaled_width = width * 3
+
+    for y in range(height):
+        above = max(y - 1, 0) * width
+        row = y * width
+        below = min(y + 1, height - 1) * width
+        out = y * 3 * scaled_width
+
+        for x in range(width):
+            left = max(x - 1, 0)
+            right = min(x + 1, width - 1)
+
+            # Neighbouring pixels, named the same as in the algorithm's description.
+            a, b, c = pixels[above + left], pixels[above + x], pixels[above + right]
+            d, e, f = pixels[row + left], pixels[row + x], pixels[row + right]
+            g, h, i = pixels[below + left], pixels[below + x], pixels[below + right]
+
+            e0 = e1 = e2 = e3 = e5 = e6 = e7 = e8 = e
+            if b != h and d != f:
+                if d == b:
+                    e0 = d
+                if (d == b and e != c) or (b == f and e != a):
+                    e1 = b
+                if b == f:
+                    e2 = f
+                if (d == b and e != g) or (d == h and e != a):
+                    e3 = d
+                if (b == f and e != i) or (h == f and e != c):
+                    e5 = f
+                if d == h:
+                    e6 = d
+                if (d == h and e != i) or (h == f and e != g):
+                    e7 = h
+                if h == f:
+                    e8 = f
+
+            index = out + x * 3
+            scaled[index:index + 3] = array('I', (e0, e1, e2))
+            index += scaled_width
+            scaled[index:index + 3] = array('I', (e3, e, e5))
+            index += scaled_width
+            scaled[index:index + 3] = array('I', (e6, e7, e8))
+
+    # Only the colours are compared, so any alpha is thrown away.
+    return pygame.image.fromstring(scaled.tobytes(), (scaled_width, height * 3), 'RGBA').convert(source)
+
+
+class OutputStage:
+    """
+    Scales regions of the game surface onto the window. Integer ratios are scaled directly into the window, other
+    ratios use precomputed nearest-neighbour column and row maps so that every display pixel comes from exactly one
+    game pixel.
+    """
+
+    def __init__(self, surface, window, scale_filter=None):
+        if scale_filter not in filters:
+            raise ValueError('unknown scale filter: {0}'.format(scale_filter))
+
+        self.surface = surface
+        self.window = window
+        self.scale_filter = scale_filter
+        self.factor = filters[scale_filter]
+
+        # Size of the image after filtering, which is what gets scaled onto the window.
+        filtered_size = surface.get_width() * self.factor, surface.get_height() * self.factor
+
+        if self.factor > 1:
+            # Filtered frame, and a scratch surface for filtering regions with a border around them.
+            self.filtered = pygame.Surface(filtered_size, 0, window)
+            self.scratch = pygame.Surface(filtered_size, 0, window)
+        else:
+            self.filtered = surface
+
+        # Filtered regions, keyed by their contents. Only used for filters that are slow to compute.
+        self.cache = OrderedDict()
+        self.cache_size = 64
+
+        window_size = window.get_size()
+        self.integer = window_size[0] % filtered_size[0] == 0 and window_size[1] % filtered_size[1] == 0
+        self.scale = window_size[0] // filtered_size[0], window_size[1] // filtered_size[1]
+
+        # Which column and row of the filtered image each column and row of the window comes from.
+        self.columns = [x * filtered_size[0] // window_size[0] for x in range(window_size[0])]
+        self.rows = [y * filtered_size[1] // window_size[1] for y in range(window_size[1])]
+
+        if not self.integer:
+            # The filtered image after being stretched horizontally, but not yet vertically.
+            self.stretched = pygame.Surface((window_size[0], filtered_size[1]), 0, window)
+
+    def filter(self, region):
+        """
+        Applies the filter to a region of the game surface, storing the result in the filtered frame.
+        :param region: the region of the game surface to filter
+        :return: the filtered region in filtered frame coordinates
+        """
+        factor = self.factor
+
+        # Filters look at neighbouring pixels, so the pixels around a changed region change as well.
+        region = region.inflate(2, 2).clip(self.surface.get_rect())
+        filtered_region = pygame.Rect(region.x * factor, region.y * factor, region.width * factor,
+                                      region.height * factor)
+
+        # A border is filtered as well so the edges of the region have their neighbours, then thrown away.
+        bordered = region.inflate(2, 2).clip(self.surface.get_rect())
+        bordered_filtered = pygame.Rect(bordered.x * factor, bordered.y * factor, bordered.width * factor,
+                                        bordered.height * factor)
+
+        if self.scale_filter == 'scale2x':
+            pygame.transform.scale2x(self.surface.subsurface(bordered), self.scratch.subsurface(bordered_filtered))
+            self.filtered.blit(self.scratch, filtered_region, filtered_region)
+
+        else:
+            source = self.surface.subsurface(bordered)
+            key = bordered.size, pygame.image.tostring(source, 'RGBA')
+
+            try:
+                scaled = self.cache[key]
+                self.cache.move_to_end(key)
+            except KeyError:
+                scaled = scale3x(source)
+                self.cache[key] = scaled
+                if len(self.cache) > self.cache_size:
+                    self.cache.popitem(last=False)
+
+            self.filtered.blit(scaled, filtered_region,
+                               filtered_region.move(-bordered_filtered.x, -bordered_filtered.y))
+
+        return filtered_region
+
+    def scale_region(self, region):
+        """
+        Scales a region of the filtered frame onto the window.
+        :param region: the region of the filtered frame to scale
+        :return: the region of the window that was drawn on
+        """
+        if self.integer:
+            scaled = pygame.Rect(region.x * self.scale[0], region.y * self.scale[1],
+                                 region.width * self.scale[0], region.height * self.scale[1])
+            pygame.transform.scale(self.filtered.subsurface(region), scaled.size, self.window.subsurface(scaled))
+            return scaled
+
+        # The window columns and rows that come from the region.
+        left, right = bisect_left(self.columns, region.left), bisect_left(self.columns, region.right)
+        top, bottom = bisect_left(self.rows, region.top), bisect_left(self.rows, region.bottom)
+
+        # Stretch horizontally one column at a time, then vertically one row at a time.
+        for x in range(left, right):
+            self.stretched.blit(self.filtered, (x, region.y), (self.columns[x], region.y, 1, region.height))
+        for y in range(top, bottom):
+            self.window.blit(self.stretched, (left, y), (left, self.rows[y], right - left, 1))
+
+        return pygame.Rect(left, top, right - left, bottom - top)
+
+    def present(self, regions):
+        """
+        Filters and scales regions of the game surface onto the window.
+        :param regions: the regions of the game surface to draw
+        :return: list of the regions of the window that were drawn on
+        """
+        updated = []
+        for region in regions:
+            if self.factor > 1:
+                region = self.filter(region)
+            updated.append(self.scale_region(region))
+        return updated
@@ -0,0 +1,106 @@
+"""
+Module for saving power while nobody is playing. Keeps track of how long it has been since the last input, decides
+when the game should slow down or stop drawing, and measures how much of the CPU the game uses in each power mode.
+"""
+import time
+
+
+class PowerManager:
+    """
+    Tracks the time since the last input and the CPU time spent in each power mode. The modes are "active" (drawing at
+    the full frame rate), "reduced" (drawing at a lower frame rate because nothing on screen moves) and "idle" (not
+    drawing at all, only running the game logic once a second).
+    """
+
+    def __init__(self, idle_time=60, reduced_fps=4, clock=time.monotonic):
+        self.clock = clock  # Function that gets the current time in seconds.
+        self.idle_time = idle_time  # Seconds without input before going idle. None to never go idle.
+        self.reduced_fps = reduced_fps  # Frame rate used while nothing on screen moves.
+        self.idle_display = 'blank'  # What to show while idle, either 'blank' or 'dim'.
+
+        self.last_input = self.clock()
+        self.mode = 'active'
+
+        # Wall clock and CPU time spent in each mode, in seconds.
+        self.wall_time = {'active': 0.0, 'reduced': 0.0, 'idle': 0.0}
+        self.cpu_time = {'active': 0.0, 'reduced': 0.0, 'idle': 0.0}
+        self._mode_start = self.clock(), time.process_time()
+
+    def input(self):
+        """
+        Records that there has been an input.
+        """
+        self.last_input = self.clock()
+
+    def is_idle(self):
+        """
+        Checks if it has been long enough since the last input to go idle.
+        :return: True if the game should go idle
+        """
+        return self.idle_time is not None and self.clock() - self.last_input >= self.idle_time
+
+    def frame_rate(self, fps, still):
+        """
+        Gets the frame rate the game should draw at.
+        :param fps: the full frame rate of the game. 0 means no limit, which is never reduced.
+        :param still: True if nothing on screen moves
+        :return: the frame rate to draw at
+        """
+        if still and fps > 0:
+            self.enter('reduced')
+            return min(fps, self.reduced_fps)
+
+        self.enter('active')
+        return fps
+
+    def enter(self, mode):
+        """
+        Changes the power mode, adding the time spent in the last mode to its totals.
+        :param mode: the mode to change to
+        """
+        if mode == self.mode:
+            return
+
+        self._add_time()
+        self.mode = mode
+
+    def _add_time(self):
+        """
+        Adds the time spent in the current mode since it was entered or last added to its totals.
+        """
+        now = self.clock(), time.process_time()
+        self.wall_time[self.mode] += now[0] - self._mode_start[0]
+        self.cpu_time[self.mode] += now[1] - self._mode_start[1]
+        self._mode_start = now
+
+    def reset(self):
+        """
+        Goes back to the active mode and clears the time totals.
+        """
+        self.mode = 'active'
+        self.last_input = self.clock()
+        for mode in self.wall_time:
+            self.wall_time[mode] = 0.0
+            self.cpu_time[mode] = 0.0
+        self._mode_start = self.clock(), time.process_time()
+
+    def utilisation(self):
+        """
+        Gets how much of the CPU was used in each mode so far.
+        :return: dictionary of the seconds spent and fraction of one CPU used in each mode
+        """
+        # Count the time spent in the current mode up until now.
+        self._add_time()
+
+        report = {}
+        for mode in self.wall_time:
+            wall = self.wall_time[mode]
+            report[mode] = {
+                'seconds': round(wall, 3),
+                'cpu': round(self.cpu_time[mode] / wall, 4) if wall > 0 else None,
+            }
+        return report
+
+
+# Power manager shared by the entire game.
+power_manager = PowerManager()
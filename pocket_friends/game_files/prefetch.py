@@ -0,0 +1,144 @@
+"""
+Module that loads the save and the assets of the first screen while the title is up. The save is read on a worker
+thread, which then works out whether the egg selection screen or the playground comes next and decodes the images and
+reads the data files that scene lists on the other workers at the same time. Decoded images are handed back to the
+main thread, which converts them to the display format and puts them in the asset cache, as converting has to be done
+where the display lives.
+"""
+from concurrent.futures import ThreadPoolExecutor, wait
+import time
+import pygame
+from .assets import asset_cache
+
+
+class Prefetcher:
+    """
+    Loads the save and the assets of the first screen on a pool of worker threads. Started when the title is shown,
+    and finished by the main thread once it is ready to leave the title.
+    """
+
+    def __init__(self, workers=4):
+        self.workers = workers  # Number of worker threads.
+
+        self._executor = None
+        self._save = None  # Future of reading the save, which gives the next scene and the futures of its assets.
+        self._start = 0.0  # Time the prefetch was started.
+
+        # Timings of the last prefetch in seconds, used to see how much time it saves.
+        self.load_time = 0.0  # From the start until the last file was loaded.
+        self.serial_time = 0.0  # Every task added up, which is how long loading would take one file at a time.
+        self.title_time = 0.0  # From the start until the main thread had everything in the asset cache.
+        self.files = 0  # Number of files loaded.
+
+    def start(self, data_handler, scenes):
+        """
+        Starts reading the save and loading the assets of the screen after it. The data handler should not be used
+        until finish() has been called.
+        :param data_handler: the data handler to read the save into
+        :param scenes: the scene manager to get the assets of the next scene from
+        """
+        self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix='prefetch')
+        self._start = time.perf_counter()
+        self._save = self._executor.submit(self._read_save, data_handler, scenes)
+
+    def _read_save(self, data_handler, scenes):
+        """
+        Reads the save and starts loading the assets of the next scene. Runs on a worker thread.
+        :param data_handler: the data handler to read the save into
+        :param scenes: the scene manager to get the assets of the next scene from
+        :return: tuple of the next scene, the futures of its images, the futures of its data files and the (start, end)
+        of reading the save
+        """
+        start = time.perf_counter()
+        data_handler.read_save()
+
+        # A save with no bloop in it has not picked an egg yet.
+        name = 'egg_select' if data_handler.attributes['bloop'] == '' else 'playground'
+        scene = scenes.scene(name)
+        images = scene.images()
+        data = scene.data()
+        end = time.perf_counter()
+
+        image_futures = [self._executor.submit(self._load_image, path, alpha) for path, alpha in images]
+        data_futures = [self._executor.submit(self._load_data, path) for path in data]
+        return name, image_futures, data_futures, (start, end)
+
+    @staticmethod
+    def _load_image(path, alpha):
+        """
+        Decodes an image without converting it. Runs on a worker thread.
+        :return: tuple of the image path, alpha, the decoded surface and the (start, end) of the load
+        """
+        start = time.perf_counter()
+        surface = pygame.image.load(path)
+        return path, alpha, surface, (start, time.perf_counter())
+
+    @staticmethod
+    def _load_data(path):
+        """
+        Reads a JSON file into the asset cache. Runs on a worker thread.
+        :return: tuple of the path and the (start, end) of the load
+        """
+        start = time.perf_counter()
+        asset_cache.data(path)
+        return path, (start, time.perf_counter())
+
+    def wait(self, timeout):
+        """
+        Waits for the prefetch to be done.
+        :param timeout: the most seconds to wait for
+        :return: True if everything has been loaded
+        """
+        deadline = time.monotonic() + timeout
+        if wait([self._save], timeout).not_done:
+            return False
+
+        # An error reading the save is raised by finish(), so there is nothing else to wait for.
+        if self._save.exception() is not None:
+            return True
+
+        image_futures, data_futures = self._save.result()[1:3]
+        return not wait(image_futures + data_futures, max(deadline - time.monotonic(), 0)).not_done
+
+    def finish(self):
+        """
+        Waits for the prefetch to be done and puts the loaded images in the asset cache. Must be called on the main
+        thread. Any error raised while loading is raised here.
+        :return: the game state to go to after the title
+        """
+        try:
+            scene, image_futures, data_futures, save_time = self._save.result()
+            spans = [save_time]
+
+            for future in image_futures:
+                path, alpha, surface, span = future.result()
+                asset_cache.preload(path, surface, alpha)
+                spans.append(span)
+            for future in data_futures:
+                path, span = future.result()
+                spans.append(span)
+        finally:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+        self.load_time = max(end for start, end in spans) - self._start
+        self.serial_time = sum(end - start for start, end in spans)
+        self.title_time = time.perf_counter() - self._start
+        self.files = len(image_futures) + len(data_futures)
+        return scene
+
+    def stats(self):
+        """
+        Gets the timings of the last prefetch.
+        :return: dictionary of the number of files loaded and the timings in milliseconds
+        """
+        return {
+            'files': self.files,
+            'load_ms': round(self.load_time * 1000, 3),
+            'serial_ms': round(self.serial_time * 1000, 3),
+            'title_ms': round(self.title_time * 1000, 3),
+        }
+
+
+# Prefetcher shared by the entire game.
+prefetcher = Prefetcher()
@@ -0,0 +1,144 @@
+"""
+Module for pushing the rendered game surface to the display. Only the regions of the game surface that have changed
+since the last frame are scaled and sent to the display, which keeps the amount of data pushed over slow displays
+(such as SPI displays) to a minimum.
+"""
+import pygame
+from .output import OutputStage
+from .tracing import tracer
+
+
+class DirtyRenderer:
+    """
+    Tracks the regions of the game surface that have changed and updates only those regions on the display. A full
+    redraw is done whenever the renderer is invalidated, such as when the scene changes.
+    """
+
+    def __init__(self, window, surface, scale_filter=None, display=None):
+        self.window = window
+        self.surface = surface
+
+        # Sends the window to the screen. Either pygame.display or anything else with its flip() and update() functions.
+        self.display = pygame.display if display is None else display
+
+        # Scales the game surface up to the size of the window.
+        self.output = OutputStage(surface, window, scale_filter)
+
+        self.full_redraw = True  # Whether the whole display needs to be redrawn on the next frame.
+        self.dirty = []  # Regions of the game surface that have changed this frame.
+
+        self._sprites = {}  # The rectangle and image of each sprite when it was last drawn.
+        self._blits = {}  # The rectangle of each tracked blit when it was last drawn.
+
+        # Counters to see how much is being sent to the display.
+        self.frames = 0
+        self.pixels_pushed = 0
+
+    def invalidate(self):
+        """
+        Makes the next frame redraw the entire display.
+        """
+        self.full_redraw = True
+
+    def mark(self, rect):
+        """
+        Marks a region of the game surface as changed.
+        :param rect: the region that changed
+        """
+        rect = pygame.Rect(rect).clip(self.surface.get_rect())
+        if rect.width > 0 and rect.height > 0:
+            self.dirty.append(rect)
+
+    def track_sprites(self, sprites):
+        """
+        Marks the old and new regions of every sprite that has moved or changed image since the last frame, as well as
+        the last region of any sprite that is no longer drawn.
+        :param sprites: the sprites drawn this frame
+        """
+        previous = self._sprites
+        self._sprites = {}
+
+        for sprite in sprites:
+            rect = pygame.Rect(sprite.rect)
+            self._sprites[sprite] = rect, sprite.image
+
+            last = previous.pop(sprite, None)
+            if last is None:
+                self.mark(rect)
+            elif last[0] != rect or last[1] is not sprite.image:
+                self.mark(last[0])
+                self.mark(rect)
+
+        # Anything left over was not drawn this frame, so it has to be covered up.
+        for rect, _ in previous.values():
+            self.mark(rect)
+
+    def track_blit(self, key, rect, changed=False):
+        """
+        Marks the old and new regions of something blitted onto the game surface if it has moved or changed.
+        :param key: a name used to identify what was blitted
+        :param rect: the region it was blitted to this frame
+        :param changed: True if what was blitted looks different than last frame
+        """
+        rect = pygame.Rect(rect)
+        last = self._blits.get(key)
+        self._blits[key] = rect
+
+        if last is None or last != rect:
+            if last is not None:
+                self.mark(last)
+            self.mark(rect)
+        elif changed:
+            self.mark(rect)
+
+    def track(self, widget):
+        """
+        Marks the regions a widget reports as changed.
+        :param widget: an object with a dirty_rects() method
+        """
+        for rect in widget.dirty_rects():
+            self.mark(rect)
+
+    @staticmethod
+    def merge(rects):
+        """
+        Merges overlapping rectangles together so that no region is scaled twice.
+        :param rects: the rectangles to merge
+        :return: list of rectangles that do not overlap
+        """
+        merged = []
+        for rect in rects:
+            rect = rect.copy()
+
+            # Keep absorbing rectangles until the new one no longer overlaps any of them.
+            index = rect.collidelist(merged)
+            while index != -1:
+                rect.union_ip(merged.pop(index))
+                index = rect.collidelist(merged)
+
+            merged.append(rect)
+        return merged
+
+    def present(self):
+        """
+        Scales the changed regions of the game surface onto the window and pushes them to the display.
+        """
+        if self.full_redraw:
+            regions = [self.surface.get_rect()]
+        else:
+            regions = self.merge(self.dirty)
+
+        with tracer.span('scale'):
+            updated = self.output.present(regions)
+        for rect in updated:
+            self.pixels_pushed += rect.width * rect.height
+
+        with tracer.span('flip'):
+            if self.full_redraw:
+                self.display.flip()
+            elif updated:
+                self.display.update(updated)
+
+        self.frames += 1
+        self.full_redraw = False
+        self.dirty = []
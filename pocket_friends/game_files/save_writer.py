@@ -0,0 +1,194 @@
+"""
+Module for writing save files on a background thread so that the game never waits on the SD card. Saves are written
+atomically, so a power cut in the middle of a write leaves the last complete save behind instead of a truncated one.
+"""
+import json
+import os
+import threading
+import time
+
+
+def write_atomic(path, data):
+    """
+    Writes data to a file by writing it to a temporary file first, then renaming it over the original.
+    :param path: the file to write to
+    :param data: the string to write
+    """
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w') as temp_file:
+        temp_file.write(data)
+        temp_file.flush()
+        os.fsync(temp_file.fileno())
+        temp_file.close()
+
+    os.replace(temp_path, path)
+
+    # Make sure the rename itself is on disk. Directories cannot be opened like this on Windows.
+    if os.name == 'posix':
+        directory = os.open(os.path.dirname(path) or '.', os.O_RDONLY)
+        try:
+            os.fsync(directory)
+        finally:
+            os.close(directory)
+
+
+def _contents(attributes, ignore):
+    """
+    Gets the part of save data that is compared to tell if two snapshots are the same.
+    :param attributes: dictionary of the save data
+    :param ignore: the attributes to leave out of the comparison
+    :return: the compared attributes as a JSON string
+    """
+    return json.dumps({key: value for key, value in attributes.items() if key not in ignore})
+
+
+class SaveWriter:
+    """
+    Writes snapshots of save data on a background thread. Snapshots submitted while another is waiting replace it, so
+    a burst of saves only causes one write, and snapshots that are the same as the last one written are skipped.
+    Attributes that change on every save, such as when it was made, can be left out of that comparison.
+    """
+
+    def __init__(self, coalesce_time=0.05):
+        self.coalesce_time = coalesce_time  # Seconds to wait for more saves before writing.
+
+        self._condition = threading.Condition()
+        # Snapshots waiting to be written by path, as (data, compared contents, time submitted, write) tuples.
+        self._pending = {}
+        self._written = {}  # The compared contents of the last snapshot written to each path.
+        self._writing = False
+        self._thread = None
+
+        # Metrics of the writer.
+        self.submitted = 0
+        self.writes = 0
+        self.coalesced = 0
+        self.skipped = 0
+        self.failed = 0
+        self.last_error = None
+        self.max_queue_depth = 0
+        self.last_latency = 0.0
+        self.max_latency = 0.0
+        self.total_latency = 0.0
+
+    def submit(self, path, attributes, write=write_atomic, ignore=()):
+        """
+        Queues a snapshot of save data to be written. Returns straight away.
+        :param path: the file to write the save to
+        :param attributes: dictionary of the save data. It is copied, so it can be changed after this returns.
+        :param write: function called with the path and the snapshot as a JSON string to write it
+        :param ignore: attributes that do not count as a change, so the snapshot is skipped if only they differ
+        """
+        # Turning the data into JSON here makes a copy that the game cannot change before it is written.
+        data = json.dumps(attributes)
+        contents = _contents(attributes, ignore)
+
+        with self._condition:
+            self.submitted += 1
+            if path in self._pending:
+                self.coalesced += 1
+            self._pending[path] = data, contents, time.monotonic(), write
+            self.max_queue_depth = max(self.max_queue_depth, self.queue_depth())
+
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='save_writer', daemon=True)
+                self._thread.start()
+
+            self._condition.notify_all()
+
+    def remember(self, path, attributes, ignore=()):
+        """
+        Records save data that is already on disk, such as a save that was just read, so writing it again is skipped.
+        :param path: the file the save is in
+        :param attributes: dictionary of the save data
+        :param ignore: attributes that do not count as a change, the same as given to submit()
+        """
+        contents = _contents(attributes, ignore)
+        with self._condition:
+            self._written[path] = contents
+
+    def queue_depth(self):
+        """
+        Gets the number of saves that are waiting to be written or being written.
+        :return: the queue depth
+        """
+        return len(self._pending) + (1 if self._writing else 0)
+
+    def flush(self, timeout=None):
+        """
+        Waits until every queued save has been written.
+        :param timeout: the most seconds to wait for, or None to wait forever
+        :return: True if everything was written, False if the timeout ran out
+        """
+        with self._condition:
+            return self._condition.wait_for(lambda: not self._pending and not self._writing, timeout)
+
+    def _run(self):
+        """
+        Writes queued saves until there are none left. A save that fails to write is counted and dropped, so one bad
+        save never stops the ones after it or leaves flush() waiting forever.
+        """
+        try:
+            while True:
+                with self._condition:
+                    if not self._pending:
+                        self._thread = None
+                        return
+
+                    # Give a burst of saves a moment to finish so that it is only written once.
+                    deadline = time.monotonic() + self.coalesce_time
+                    while time.monotonic() < deadline:
+                        self._condition.wait(deadline - time.monotonic())
+
+                    path, (data, contents, submitted, write) = next(iter(self._pending.items()))
+                    del self._pending[path]
+                    self._writing = True
+
+                try:
+                    if self._written.get(path) == contents:
+                        self.skipped += 1
+                    else:
+                        write(path, data)
+                        self._written[path] = contents
+                        self.writes += 1
+                except Exception as ex:
+                    self.failed += 1
+                    self.last_error = ex
+                finally:
+                    with self._condition:
+                        self._writing = False
+                        latency = time.monotonic() - submitted
+                        self.last_latency = latency
+                        self.max_latency = max(self.max_latency, latency)
+                        self.total_latency += latency
+                        self._condition.notify_all()
+        finally:
+            # Let the next submit start a new thread if this one stopped any other way.
+            with self._condition:
+                if self._thread is threading.current_thread():
+                    self._thread = None
+                self._condition.notify_all()
+
+    def stats(self):
+        """
+        Gets the metrics of the writer.
+        :return: dictionary of the metrics. Latencies are from when a save was submitted until it was on disk.
+        """
+        with self._condition:
+            handled = self.writes + self.skipped + self.failed
+            return {
+                'submitted': self.submitted,
+                'writes': self.writes,
+                'coalesced': self.coalesced,
+                'skipped': self.skipped,
+                'failed': self.failed,
+                'queue_depth': self.queue_depth(),
+                'max_queue_depth': self.max_queue_depth,
+                'last_latency_ms': round(self.last_latency * 1000, 3),
+                'max_latency_ms': round(self.max_latency * 1000, 3),
+                'mean_latency_ms': round(self.total_latency / handled * 1000, 3) if handled else None,
+            }
+
+
+# Save writer shared by the entire game.
+save_writer = SaveWriter()
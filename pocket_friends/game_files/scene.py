@@ -0,0 +1,159 @@
+"""
+Module for the scenes of the game. Every screen of the game is a scene that is made once and kept for as long as the
+game runs, so the objects on a screen are not made again every time the screen is shown. Each scene lists the assets
+it draws, which are loaded when the scene is entered and kept in memory while it is on screen. Once the scene is left,
+its assets are released back to the asset cache, which keeps them around until its memory budget runs out.
+"""
+from .assets import asset_cache
+
+
+class Scene:
+    """
+    Base class for a screen of the game. Subclasses override the hooks they need.
+    """
+
+    state = None  # The game state the scene belongs to, given to the frame hook.
+    submenu = 'main'  # The submenu of the game state the scene is, given to the frame hook.
+
+    # The name of the method that handles each button the scene uses, by button name.
+    buttons = {}
+
+    def __init__(self, scenes):
+        self.scenes = scenes  # The scene manager the scene belongs to.
+
+        # The method that handles each button, given to the input bus to dispatch presses with.
+        self.dispatch = {button: getattr(self, name) for button, name in self.buttons.items()}
+
+    def images(self):
+        """
+        Gets the images the scene draws, which are loaded when the scene is entered.
+        :return: list of (image path, alpha) tuples
+        """
+        return []
+
+    def data(self):
+        """
+        Gets the JSON files the scene reads, which are loaded when the scene is entered.
+        :return: list of JSON file paths
+        """
+        return []
+
+    def enter(self, previous):
+        """
+        Called when the scene is switched to, after its assets have been loaded.
+        :param previous: the scene that was on screen before, or None if this is the first scene
+        """
+        pass
+
+    def exit(self, following):
+        """
+        Called when the scene is switched away from, before its assets are released.
+        :param following: the scene that is about to be on screen
+        """
+        pass
+
+    def update(self):
+        """
+        Runs the logic of the scene once a frame.
+        """
+        pass
+
+    def render(self, surface):
+        """
+        Draws the scene onto the game surface once a frame. The background has already been drawn, and the sprites are
+        drawn on top afterwards.
+        :param surface: the surface to draw on
+        """
+        pass
+
+    def still(self):
+        """
+        Checks if nothing in the scene moves, which lets the game draw at a reduced frame rate.
+        :return: True if the scene is still
+        """
+        return False
+
+    def can_idle(self):
+        """
+        Checks if the game is allowed to go idle while the scene is on screen.
+        :return: True if the game can go idle
+        """
+        return False
+
+
+class SceneManager:
+    """
+    Holds every scene by name and switches between them. Switches are done once the buttons and logic of a frame have
+    been handled, so a scene can ask for a switch at any point before it is drawn.
+    """
+
+    def __init__(self, surface, renderer, sprites):
+        self.surface = surface  # The surface the game is drawn on.
+        self.renderer = renderer  # The renderer that pushes the surface to the display.
+        self.sprites = sprites  # The sprites on screen, emptied every time the scene changes.
+
+        self.scenes = {}  # Every scene by name.
+        self.current = None  # The scene on screen.
+        self.error = None  # Name of the scene switched to when a scene that does not exist is asked for.
+        self._next = None  # Name of the scene to switch to before the frame is drawn.
+
+        # Number of scene switches done, used to see how often scenes change.
+        self.switches = 0
+
+    def add(self, name, scene):
+        """
+        Adds a scene.
+        :param name: the name the scene is switched to by
+        :param scene: the scene
+        """
+        self.scenes[name] = scene
+
+    def scene(self, name):
+        """
+        Gets a scene by name.
+        :param name: the name of the scene
+        :return: the scene, or the error scene if there is no scene with that name
+        """
+        return self.scenes.get(name, self.scenes.get(self.error))
+
+    def switch(self, name):
+        """
+        Switches to another scene before the frame is drawn.
+        :param name: the name of the scene to switch to
+        """
+        self._next = name
+
+    def apply(self):
+        """
+        Does the switch asked for since the last frame, if any. The assets of the new scene are loaded and kept in
+        memory before the assets of the old scene are released, so assets shared by both are never unloaded.
+        :return: the scene on screen
+        """
+        if self._next is None:
+            return self.current
+
+        previous = self.current
+        following = self.scene(self._next)
+        self._next = None
+
+        if previous is not None:
+            previous.exit(following)
+
+        for path, alpha in following.images():
+            asset_cache.pin(path, alpha)
+        for path in following.data():
+            asset_cache.data(path)
+
+        if previous is not None:
+            for path, alpha in previous.images():
+                asset_cache.unpin(path, alpha)
+
+        # Start from a blank screen.
+        self.sprites.empty()
+        self.renderer.invalidate()
+
+        self.current = following
+        following.enter(previous)
+        self.switches += 1
+
+        return following
@@ -0,0 +1,126 @@
+"""
+Module for the rules of how a bloop changes over time. step() runs one second of the rules and is called while the
+game is on. catch_up() gives the same result as calling step() once for every second the game was off, but works it
+out directly, so a gap of days takes no longer than a gap of seconds.
+
+Only the age of the bloop and the time elapsed change unless decay is asked for. The decay rules make hunger and
+happiness drop over time and missed care cost health. The game does not ask for them until it has a way to look after
+the bloop, as there is nothing to stop it from dying otherwise, so catching up on the time the game was off only ages
+the bloop. The population simulator runs the decay rules to tune them.
+"""
+
+# Seconds between care checks. A care check is missed if the bloop is starving or miserable when it happens.
+care_period = 3600
+
+# Seconds per point of metabolism and contentedness, used to work out how fast hunger and happiness drop.
+period_scale = 1800
+
+
+def hunger_period(species):
+    """
+    Gets how many seconds pass between the hunger of a bloop dropping by one. Bloops with a higher metabolism get hungry
+    faster.
+    :param species: dictionary of the bloop's info file
+    :return: the period in seconds
+    """
+    return period_scale * (6 - species.get('metabolism', 3))
+
+
+def happiness_period(species):
+    """
+    Gets how many seconds pass between the happiness of a bloop dropping by one. Bloops with a higher contentedness stay
+    happy for longer.
+    :param species: dictionary of the bloop's info file
+    :return: the period in seconds
+    """
+    return period_scale * species.get('contentedness', 3)
+
+
+def is_hatched(attributes):
+    """
+    Checks if the save has a bloop that has hatched. Eggs and empty saves only get older, even with decay on.
+    :param attributes: dictionary of the save data
+    :return: True if the bloop has hatched
+    """
+    return attributes['bloop'] != '' and attributes['evolution_stage'] not in ('', 'egg')
+
+
+def step(attributes, species, decay=False):
+    """
+    Runs one second of the rules.
+    :param attributes: dictionary of the save data, changed in place
+    :param species: dictionary of the bloop's info file
+    :param decay: True to also run the hunger, happiness and health rules
+    """
+    attributes['age'] += 1
+    attributes['time_elapsed'] += 1
+
+    if not decay or not is_hatched(attributes):
+        return
+
+    age = attributes['age']
+
+    if age % hunger_period(species) == 0 and attributes['hunger'] > 0:
+        attributes['hunger'] -= 1
+    if age % happiness_period(species) == 0 and attributes['happiness'] > 0:
+        attributes['happiness'] -= 1
+
+    if age % care_period == 0:
+        if attributes['hunger'] == 0 or attributes['happiness'] == 0:
+            attributes['missed_care'] += 1
+            attributes['health'] = max(0, attributes['health'] - 1)
+        else:
+            attributes['care_counter'] += 1
+
+
+def _empty_time(start, value, period):
+    """
+    Gets the age at which a stat that drops by one every period runs out.
+    :param start: the age to start counting from
+    :param value: the value of the stat at that age
+    :param period: seconds between the stat dropping
+    :return: the age the stat reaches 0, or start if it already has
+    """
+    if value <= 0:
+        return start
+    # The stat drops at every multiple of the period, so it runs out at the value-th multiple after the start.
+    return (start // period + value) * period
+
+
+def catch_up(attributes, seconds, species, decay=False):
+    """
+    Runs any number of seconds of the rules at once. Gives exactly the same result as calling step() that many times.
+    :param attributes: dictionary of the save data, changed in place
+    :param seconds: how many seconds to run
+    :param species: dictionary of the bloop's info file
+    :param decay: True to also run the hunger, happiness and health rules
+    """
+    if seconds <= 0:
+        return
+
+    start = attributes['age']
+    end = start + seconds
+    attributes['age'] = end
+    attributes['time_elapsed'] += seconds
+
+    if not decay or not is_hatched(attributes):
+        return
+
+    hunger = hunger_period(species)
+    happiness = happiness_period(species)
+
+    # Work out when the care checks start being missed before changing the stats.
+    empty = min(_empty_time(start, attributes['hunger'], hunger),
+                _empty_time(start, attributes['happiness'], happiness))
+
+    # The number of multiples of a period between the start and end ages is the number of times a rule ran.
+    attributes['hunger'] = max(0, attributes['hunger'] - (end // hunger - start // hunger))
+    attributes['happiness'] = max(0, attributes['happiness'] - (end // happiness - start // happiness))
+
+    # Care checks from the moment a stat runs out onwards are missed. The ones before it are not.
+    checks = end // care_period - start // care_period
+    missed = max(0, end // care_period - max(start, empty - 1) // care_period)
+
+    attributes['care_counter'] += checks - missed
+    attributes['missed_care'] += missed
+    attributes['health'] = max(0, attributes['health'] - missed)
@@ -0,0 +1,122 @@
+"""
+Module for breaking text into lines that fit on the screen. The width of every glyph of a font is measured once and
+kept in a table, line breaks are found with a binary search over the running total of glyph widths, and wrapped text is
+cached so that the same description is only wrapped once. The tables and wrapped text of a font are kept with the font,
+and dropped along with it.
+"""
+import weakref
+from bisect import bisect_right
+from collections import OrderedDict
+from itertools import accumulate
+
+# Characters that will be considered "cuts" aka when a line break can occur.
+cut_chars = '.,! '
+
+# Width in pixels of every glyph measured so far and the most recently wrapped text, by font.
+_fonts = weakref.WeakKeyDictionary()
+
+# Number of wrapped texts kept for each font.
+layout_cache_size = 64
+
+
+def _tables(font):
+    """
+    Gets the glyph widths and wrapped text kept for a font, starting empty ones for a font not seen before.
+    :param font: the font the text is drawn with
+    :return: dictionary of the glyph widths under 'widths', and the wrapped lines by text and width under 'layouts'
+    """
+    tables = _fonts.get(font)
+    if tables is None:
+        # Wrapped text in order of least to most recently used.
+        tables = _fonts[font] = {'widths': {}, 'layouts': OrderedDict()}
+    return tables
+
+
+def glyph_widths(font, text):
+    """
+    Gets the table of glyph widths of a font, measuring any glyphs in the text that have not been measured yet.
+    :param font: the font the glyphs are drawn with
+    :param text: the text that is about to be measured
+    :return: dictionary of the width in pixels of each character
+    """
+    widths = _tables(font)['widths']
+    for char in set(text).difference(widths):
+        widths[char] = font.size(char)[0]
+    return widths
+
+
+def _fits(font, text, max_width):
+    """
+    Checks if text fits in a width, measured with the font itself to take anything like kerning into account.
+    :param font: the font the text is drawn with
+    :param text: the text to measure
+    :param max_width: the maximum width in pixels
+    :return: True if the text is not wider than the maximum width
+    """
+    return font.size(text)[0] <= max_width
+
+
+def wrap(font, text, max_width):
+    """
+    Breaks text up into lines no wider than a maximum width. Lines are broken after a cut character where possible,
+    and words too long for a line are split with a dash. The lines are only worked out the first time.
+    :param font: the font the text is drawn with
+    :param text: the text to wrap
+    :param max_width: the maximum pixel width of a line
+    :return: tuple of the lines
+    """
+    layouts = _tables(font)['layouts']
+    key = (text, max_width)
+
+    try:
+        lines = layouts[key]
+        layouts.move_to_end(key)
+    except KeyError:
+        lines = layouts[key] = _wrap(font, text, max_width)
+        if len(layouts) > layout_cache_size:
+            layouts.popitem(last=False)
+
+    return lines
+
+
+def _wrap(font, text, max_width):
+    """
+    Works out the lines of wrapped text.
+    :param font: the font the text is drawn with
+    :param text: the text to wrap
+    :param max_width: the maximum pixel width of a line
+    :return: tuple of the lines
+    """
+    # Make sure the text ends in a cut character so that the last line always has somewhere to break.
+    if text[-1:] not in cut_chars:
+        text += ' '
+
+    # Running total of glyph widths. The width of text[i:j] is about widths[j] - widths[i].
+    widths = [0] + list(accumulate(map(glyph_widths(font, text).__getitem__, text)))
+
+    lines = []
+    start = 0
+    while start < len(text):
+        # Find how many characters fit from the glyph widths, then check the guess against the font.
+        end = bisect_right(widths, widths[start] + max_width, start) - 1
+        while end < len(text) and _fits(font, text[start:end + 1], max_width):
+            end += 1
+        while end > start and not _fits(font, text[start:end], max_width):
+            end -= 1
+
+        # The index of the first character that does not fit, or the last character if everything fits.
+        index = min(end, len(text) - 1)
+
+        # Break after the last cut character, including the one that does not fit.
+        cut = max(text.rfind(char, start, index + 1) for char in cut_chars)
+        if cut >= 0:
+            lines.append(text[start:cut + 1])
+            start = cut + 1
+        # If there are no cut characters, split the word and add a dash to show that it continues. At least one
+        # character is always taken so that a glyph wider than a line cannot stop the text from ever running out.
+        else:
+            index = max(index, start + 1)
+            lines.append(text[start:index] + '-')
+            start = index
+
+    return tuple(lines)
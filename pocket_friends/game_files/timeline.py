@@ -0,0 +1,391 @@
+"""
+Module for the time the game runs on. The time is read once at the start of every frame, and every part of the game
+that keeps time reads it from here, so everything done in a frame sees the same time. A game can be recorded to a file
+as it is played, with the time of every frame and every button pressed, and played back later frame by frame with
+exactly the same times and presses.
+
+A recording is a gzip file holding a header of JSON followed by one record for every step of the game, where a step is
+either a frame or a wake up while idle. Each record is a byte of flags and the microseconds since the last step, then
+the buttons pressed during the step if there were any, and the save if the title finished loading during the step.
+Numbers are stored as variable length integers, so a frame with nothing pressed takes 4 bytes before compression.
+"""
+from collections import namedtuple
+import gzip
+import hashlib
+import json
+import time
+import zlib
+import pygame
+from .input_bus import input_bus
+from .prefetch import prefetcher
+from ..hardware.gpio_handler import Constants
+
+# Flags of a step.
+IDLE = 1  # The step is a wake up while idle rather than a frame.
+WOKE = 2  # An input ended the idle wait.
+LOADED = 4  # The title finished loading during the step.
+EVENTS = 8  # Buttons were pressed during the step.
+SAVE = 16  # The save as it was once loaded is stored with the step.
+
+# Start of every recording, followed by the format version.
+magic = b'PFREC\x01'
+
+# Buttons and sources are stored as their position in these lists.
+buttons = list(Constants.buttons)
+sources = ['keyboard', 'gpio']
+
+# A step of a recording. The time is in microseconds since the game started, and each event is a (button, source,
+# microseconds since the start of the step) tuple. The attributes are the save once it was loaded, or None.
+Step = namedtuple('Step', ['us', 'flags', 'events', 'attributes'])
+
+
+def _varint(value):
+    """
+    Encodes a number that is 0 or more as a variable length integer, 7 bits to a byte.
+    :param value: the number
+    :return: the encoded bytes
+    """
+    out = bytearray()
+    while value > 0x7f:
+        out.append(value & 0x7f | 0x80)
+        value >>= 7
+    out.append(value)
+    return out
+
+
+def _read_varint(data, position):
+    """
+    Decodes a variable length integer.
+    :param data: the bytes to decode from
+    :param position: the index of the first byte of the number
+    :return: tuple of the number and the index of the byte after it
+    """
+    value = 0
+    shift = 0
+    while True:
+        byte = data[position]
+        position += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, position
+        shift += 7
+
+
+class Recorder:
+    """
+    Writes the steps of a game to a recording file. A step is only written once the next one starts, as the buttons
+    pressed during a step are not known until then. The file is flushed every few hundred steps, so a unit that loses
+    power keeps all but the last few seconds of its recording.
+    """
+
+    def __init__(self, path, header, flush_every=256):
+        self.path = path
+        self.flush_every = flush_every  # Number of steps between flushes.
+
+        self._file = gzip.open(path, 'wb')
+        header = json.dumps(header).encode('utf-8')
+        self._file.write(magic + _varint(len(header)) + header)
+        self._file.flush()
+
+        self._step = None  # The step being recorded, as a [us, flags, events, attributes] list.
+        self._last_us = 0  # Time of the last step written.
+        self.steps = 0  # Number of steps written.
+
+    def step(self, us, flags):
+        """
+        Writes the last step and starts recording a new one.
+        :param us: the time of the step in microseconds since the game started
+        :param flags: the flags of the step
+        """
+        self._write()
+        self._step = [us, flags, [], None]
+
+    def event(self, button, source, us):
+        """
+        Adds a button press to the step being recorded.
+        :param button: the name of the button
+        :param source: where the press came from, either 'keyboard' or 'gpio'
+        :param us: the time of the press in microseconds since the game started
+        """
+        if self._step is not None:
+            self._step[2].append((button, source, us - self._step[0]))
+
+    def loaded(self, attributes):
+        """
+        Marks the step being recorded as the one the title finished loading in, and stores the save with it.
+        :param attributes: the attributes dictionary of the data handler
+        """
+        if self._step is not None:
+            self._step[1] |= LOADED
+            self._step[3] = json.dumps(attributes).encode('utf-8')
+
+    def _write(self):
+        """
+        Writes the step being recorded to the file.
+        """
+        if self._step is None:
+            return
+
+        us, flags, events, attributes = self._step
+        flags |= (EVENTS if events else 0) | (SAVE if attributes is not None else 0)
+
+        out = bytearray([flags])
+        out += _varint(max(us - self._last_us, 0))
+        if events:
+            out += _varint(len(events))
+            for button, source, offset in events:
+                out.append(buttons.index(button) | sources.index(source) << 3)
+
+                # Presses can come before the start of the step, so the offset is zigzag encoded.
+                out += _varint(offset * 2 if offset >= 0 else -offset * 2 - 1)
+        if attributes is not None:
+            out += _varint(len(attributes)) + attributes
+
+        self._file.write(out)
+        self._last_us = us
+        self.steps += 1
+        if self.steps % self.flush_every == 0:
+            self._file.flush()
+
+    def close(self):
+        """
+        Writes the last step and closes the file.
+        """
+        self._write()
+        self._step = None
+        self._file.close()
+
+
+def read_recording(path):
+    """
+    Reads a recording file. A recording that was cut off is read up to the last whole step.
+    :param path: the recording file
+    :return: tuple of the header dictionary and the list of steps
+    """
+    with open(path, 'rb') as recording_file:
+        compressed = recording_file.read()
+        recording_file.close()
+
+    # Unlike the gzip module, a decompressor gives back everything before the point a cut off file ends at.
+    data = zlib.decompressobj(16 + zlib.MAX_WBITS).decompress(compressed)
+
+    if not data.startswith(magic):
+        raise ValueError('{0} is not a recording'.format(path))
+
+    length, position = _read_varint(data, len(magic))
+    header = json.loads(data[position:position + length].decode('utf-8'))
+    position += length
+
+    steps = []
+    us = 0
+    try:
+        while position < len(data):
+            flags = data[position]
+            delta, position = _read_varint(data, position + 1)
+
+            events = []
+            if flags & EVENTS:
+                count, position = _read_varint(data, position)
+                for i in range(count):
+                    code = data[position]
+                    offset, position = _read_varint(data, position + 1)
+
+                    # Presses can come before the start of the step, so the offset is zigzag encoded.
+                    offset = -((offset + 1) >> 1) if offset & 1 else offset >> 1
+                    events.append((buttons[code & 7], sources[code >> 3], offset))
+
+            attributes = None
+            if flags & SAVE:
+                length, position = _read_varint(data, position)
+                if position + length > len(data):
+                    break
+                attributes = json.loads(data[position:position + length].decode('utf-8'))
+                position += length
+
+            us += delta
+            steps.append(Step(us, flags, events, attributes))
+    except IndexError:
+        pass  # The last step was cut off.
+
+    return header, steps
+
+
+class Timeline:
+    """
+    The time of the game, read from the monotonic clock at the start of every frame and every wake up while idle. Times
+    are counted in whole microseconds from the start of the game, so a recording played back gives exactly the same
+    times. Records the game if it is given a recorder.
+    """
+
+    def __init__(self, recorder=None):
+        self.recorder = recorder  # Recorder to write every step to, or None to not record.
+        self.origin = 0.0  # Monotonic time the game started.
+        self.now = 0.0  # Seconds from the start of the game to the start of the current step.
+
+    def start(self):
+        """
+        Starts the time from 0.
+        """
+        self.origin = time.monotonic()
+        self.now = 0.0
+
+    def clock(self):
+        """
+        Gets the time of the current step. Given to everything in the game that keeps time.
+        :return: the time in seconds
+        """
+        return self.now
+
+    def _step(self, flags):
+        """
+        Reads the time for a new step.
+        :param flags: the flags of the step
+        """
+        us = int((time.monotonic() - self.origin) * 1000000)
+        self.now = us / 1000000
+        if self.recorder is not None:
+            self.recorder.step(us, flags)
+
+    def frame(self):
+        """
+        Starts a frame. Called before any input of the frame is read.
+        """
+        self._step(0)
+
+    def wait(self, timeout, wait_for_input):
+        """
+        Waits while idle until there is an input or the timeout runs out, then starts a step.
+        :param timeout: the most seconds to wait for
+        :param wait_for_input: function that does the waiting, returning True if there was an input
+        :return: True if there was an input
+        """
+        woke = wait_for_input(timeout)
+        self._step(IDLE | (WOKE if woke else 0))
+        return woke
+
+    def event(self, event):
+        """
+        Records a button press that went on the input bus.
+        :param event: the input event of the press
+        """
+        if self.recorder is not None:
+            self.recorder.event(event.button, event.source, int((event.timestamp - self.origin) * 1000000))
+
+    def loaded(self, data_handler, timeout):
+        """
+        Checks if the save and the first screen have been loaded while the title is up. How long loading takes depends
+        on other threads, so it is recorded like an input.
+        :param data_handler: the data handler the save is read into
+        :param timeout: the most seconds to wait for the loading to be done
+        :return: True if everything has been loaded
+        """
+        ready = prefetcher.wait(timeout)
+        if ready and self.recorder is not None:
+            self.recorder.loaded(data_handler.attributes)
+        return ready
+
+    def frame_drawn(self, surface):
+        """
+        Called once a frame has been drawn.
+        :param surface: the surface the game is drawn on
+        """
+        pass
+
+    def close(self):
+        """
+        Finishes the recording, if there is one.
+        """
+        if self.recorder is not None:
+            self.recorder.close()
+
+
+class ReplayTimeline(Timeline):
+    """
+    Plays a recording back into the game. Every frame gets the time of the recorded frame and the buttons that were
+    pressed during it, and the game goes idle and wakes up where it did when it was recorded. Stops once the game does
+    something the recording did not, such as drawing a frame where the recording was idle.
+    """
+
+    def __init__(self, steps, hashes=False):
+        Timeline.__init__(self)
+        self.steps = steps
+        self.position = 0  # Index of the next step to play.
+        self.current = None  # The step being played.
+
+        self.diverged = None  # Description of where the game stopped following the recording, if it did.
+        self.hashes = [] if hashes else None  # Hash of every frame drawn, if asked for.
+
+    def start(self):
+        """
+        Starts the time from 0 and times input events on the recorded time.
+        """
+        self.now = 0.0
+        input_bus.clock = self.clock
+
+    def done(self):
+        """
+        Checks if every step of the recording has been played.
+        :return: True if the playback is over
+        """
+        return self.position >= len(self.steps) or self.diverged is not None
+
+    def _next(self, idle):
+        """
+        Moves on to the next step of the recording.
+        :param idle: True if the game is idle, False if it is starting a frame
+        :return: the step, or None if the playback is over
+        """
+        self.current = None
+        if self.done():
+            return None
+
+        step = self.steps[self.position]
+        if bool(step.flags & IDLE) != idle:
+            self.diverged = 'step {0}: the recording {1} but the game {2}'.format(
+                self.position, 'was idle' if step.flags & IDLE else 'drew a frame',
+                'was idle' if idle else 'drew a frame')
+            return None
+
+        self.position += 1
+        self.current = step
+        self.now = step.us / 1000000
+        return step
+
+    def frame(self):
+        """
+        Starts the next recorded frame and puts the buttons pressed during it on the input bus.
+        """
+        step = self._next(False)
+        if step is not None:
+            for button, source, offset in step.events:
+                input_bus.publish(button, source, (step.us + offset) / 1000000)
+
+    def wait(self, timeout, wait_for_input):
+        """
+        Plays the next recorded wake up without waiting.
+        :return: True if an input ended the wait, or if the playback is over
+        """
+        step = self._next(True)
+        return step is None or bool(step.flags & WOKE)
+
+    def loaded(self, data_handler, timeout):
+        """
+        Checks if the title finished loading on this frame of the recording. The prefetch is waited for once the title
+        is left, so it does not matter how long it takes to load here.
+        :return: True if everything was loaded on this frame
+        """
+        return self.current is not None and bool(self.current.flags & LOADED)
+
+    def frame_drawn(self, surface):
+        """
+        Hashes the frame, if hashes were asked for. Frames drawn after the playback is over are not hashed.
+        :param surface: the surface the game is drawn on
+        """
+        if self.hashes is not None and self.current is not None:
+            self.hashes.append(hashlib.blake2b(pygame.image.tostring(surface, 'RGB'), digest_size=16).hexdigest())
+
+    def close(self):
+        """
+        Gives the input bus back the monotonic clock.
+        """
+        input_bus.clock = time.monotonic
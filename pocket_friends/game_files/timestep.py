@@ -0,0 +1,75 @@
+"""
+Module for running the game logic at a fixed rate no matter how fast frames are drawn. Time is read from the monotonic
+clock and added up, and one tick of logic is run for every whole step of time that has built up. A slow frame just
+means more ticks on the next one, so the bloop ages in real time however slowly or rarely the game is drawn.
+"""
+import time
+
+
+class FixedStep:
+    """
+    Accumulator that turns the time passed between frames into a number of fixed length ticks. Only a few ticks are
+    run one at a time in a frame, and any more than that are handed back as a batch to be run all at once, which keeps
+    a long stall from turning into a long burst of ticks.
+    """
+
+    def __init__(self, step=1.0, max_ticks=4, clock=time.monotonic):
+        self.step = step  # Seconds of time per tick.
+        self.max_ticks = max_ticks  # Most ticks to run one at a time in a frame.
+        self.clock = clock  # Function that gets the current time in seconds. Only ever goes forwards.
+
+        self.accumulator = 0.0  # Time that has built up and not been run yet, in seconds.
+        self.last = None  # Time of the last advance. None until the clock is started.
+
+        # Counters to see how well the logic is keeping up.
+        self.ticks = 0  # Ticks run one at a time.
+        self.batched = 0  # Ticks run all at once because there were too many for one frame.
+        self.most_behind = 0.0  # The most time that had built up at a single advance, in seconds.
+
+    def reset(self):
+        """
+        Starts the clock from now, throwing away any time that has built up.
+        """
+        self.last = self.clock()
+        self.accumulator = 0.0
+
+    def advance(self):
+        """
+        Adds the time since the last advance and takes every whole step out of it.
+        :return: tuple of the number of ticks to run one at a time and the number of ticks to run all at once
+        """
+        now = self.clock()
+        if self.last is None:
+            self.last = now
+
+        self.accumulator += max(now - self.last, 0)
+        self.last = now
+        self.most_behind = max(self.most_behind, self.accumulator)
+
+        ticks = int(self.accumulator // self.step)
+        self.accumulator -= ticks * self.step
+
+        single = min(ticks, self.max_ticks)
+        self.ticks += single
+        self.batched += ticks - single
+        return single, ticks - single
+
+    def until_next(self):
+        """
+        Gets how long it is until the next tick is due.
+        :return: the time in seconds, 0 if a tick is already due
+        """
+        if self.last is None:
+            return self.step
+        return max(self.step - self.accumulator - (self.clock() - self.last), 0)
+
+    def stats(self):
+        """
+        Gets the counters of the clock.
+        :return: dictionary of the clock counters
+        """
+        return {
+            'ticks': self.ticks,
+            'batched': self.batched,
+            'most_behind': round(self.most_behind, 3),
+        }
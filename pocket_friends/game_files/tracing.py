@@ -0,0 +1,156 @@
+"""
+Module for timing the parts of every frame. Spans are kept in a fixed size ring buffer and can be dumped as Chrome
+trace events, which can be opened in chrome://tracing or Perfetto. Tracing is off by default, and costs next to
+nothing while it is off.
+"""
+import json
+import time
+
+
+class _NullSpan:
+    """
+    Span that does nothing. Handed out while tracing is off so that timed code does not have to check for it.
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+class _Span:
+    """
+    Span that records how long the code inside of it took to run.
+    """
+
+    def __init__(self, tracer, name):
+        self.tracer = tracer
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.tracer.add(self.name, self.start, time.perf_counter())
+        return False
+
+
+_null_span = _NullSpan()
+
+
+class Tracer:
+    """
+    Records named spans of time into a ring buffer, overwriting the oldest spans once it is full.
+    """
+
+    def __init__(self, size=4096):
+        self.enabled = False
+        self.size = size
+
+        # The ring buffer, stored as three lists so that nothing has to be allocated while recording.
+        self._names = [''] * size
+        self._starts = [0.0] * size
+        self._ends = [0.0] * size
+        self._index = 0  # Where the next span will be written.
+        self.count = 0  # Number of spans in the buffer.
+
+        self._last = {}  # Duration in seconds of the most recent span of each name.
+        self._origin = time.perf_counter()  # Time that trace timestamps are relative to.
+
+    def now(self):
+        """
+        Gets the current time for starting a span by hand. Always 0 while tracing is off.
+        :return: the current time in seconds
+        """
+        if not self.enabled:
+            return 0.0
+        return time.perf_counter()
+
+    def span(self, name):
+        """
+        Times the code inside of a with statement.
+        :param name: the name of the span
+        :return: a context manager that records the span when it exits
+        """
+        if not self.enabled:
+            return _null_span
+        return _Span(self, name)
+
+    def add(self, name, start, end):
+        """
+        Adds a span to the buffer.
+        :param name: the name of the span
+        :param start: the time the span started, from now()
+        :param end: the time the span ended, from now()
+        """
+        if not self.enabled:
+            return
+
+        index = self._index
+        self._names[index] = name
+        self._starts[index] = start
+        self._ends[index] = end
+        self._index = (index + 1) % self.size
+        self.count = min(self.count + 1, self.size)
+        self._last[name] = end - start
+
+    def last(self, name):
+        """
+        Gets how long the most recent span of a name took.
+        :param name: the name of the span
+        :return: the duration in seconds, or 0 if there has been no span with that name
+        """
+        return self._last.get(name, 0.0)
+
+    def clear(self):
+        """
+        Empties the buffer.
+        """
+        self._index = 0
+        self.count = 0
+        self._last.clear()
+
+    def spans(self):
+        """
+        Gets the spans in the buffer from oldest to newest.
+        :return: list of (name, start, end) tuples
+        """
+        first = (self._index - self.count) % self.size
+        spans = []
+        for i in range(self.count):
+            index = (first + i) % self.size
+            spans.append((self._names[index], self._starts[index], self._ends[index]))
+        return spans
+
+    def chrome_trace(self):
+        """
+        Converts the buffer to the Chrome trace event format.
+        :return: dictionary of the trace events
+        """
+        events = []
+        for name, start, end in self.spans():
+            events.append({
+                'name': name,
+                'ph': 'X',
+                'ts': round((start - self._origin) * 1000000, 1),
+                'dur': round((end - start) * 1000000, 1),
+                'pid': 1,
+                'tid': 1,
+            })
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def dump(self, path):
+        """
+        Writes the buffer to a file as Chrome trace events.
+        :param path: the file to write to
+        """
+        with open(path, 'w') as trace_file:
+            json.dump(self.chrome_trace(), trace_file)
+            trace_file.close()
+
+
+# Tracer shared by the entire game.
+tracer = Tracer()
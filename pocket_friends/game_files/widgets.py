@@ -0,0 +1,97 @@
+"""
+Module for retained mode widgets. A widget draws itself once onto a cached surface, and drawing it every frame after
+that is a single blit until something about the widget changes. Widgets that look the same share their cached surface
+through the asset cache.
+"""
+import pygame
+from .assets import asset_cache
+
+
+def blit_over(dest, source, position):
+    """
+    Blits a surface with per pixel alpha onto another one, working out the colour and alpha of every pixel properly.
+    Pygame only gets the colour right when the pixels underneath are fully opaque or fully transparent, which is not
+    the case when two see through layers of a widget overlap. Slow, so only used while baking.
+    :param dest: the surface to draw on, with per pixel alpha
+    :param source: the surface to draw, with per pixel alpha or a colour key
+    :param position: the position on the destination to draw the source at
+    """
+    colorkey = source.get_colorkey()
+    clip = pygame.Rect(position, source.get_size()).clip(dest.get_rect())
+    for y in range(clip.top, clip.bottom):
+        for x in range(clip.left, clip.right):
+            sr, sg, sb, sa = source.get_at((x - position[0], y - position[1]))
+            if sa == 0 or (sr, sg, sb, sa) == colorkey:
+                continue
+
+            dr, dg, db, da = dest.get_at((x, y))
+            # The share of the destination colour that shows through the source.
+            below = da * (255 - sa) / 255
+            alpha = sa + below
+            dest.set_at((x, y), (round((sr * sa + dr * below) / alpha), round((sg * sa + dg * below) / alpha),
+                                 round((sb * sa + db * below) / alpha), round(alpha)))
+
+
+class RetainedWidget:
+    """
+    Base class for widgets that are drawn from a cached surface. Subclasses draw the widget in bake(), and return a key
+    from key() so that widgets that look the same can share the surface.
+    """
+
+    def __init__(self, rect):
+        self.rect = pygame.Rect(rect)  # The region of the screen the widget covers.
+        self.changed = False  # Whether the widget has changed since it was last drawn.
+        self._baked = None  # The cached surface of the widget.
+
+    def key(self):
+        """
+        Gets a key that is the same for every widget that looks the same as this one.
+        :return: a hashable key, or None to not share the surface with other widgets
+        """
+        return None
+
+    def bake(self):
+        """
+        Draws the widget onto a new surface the size of its region.
+        :return: the surface
+        """
+        raise NotImplementedError
+
+    def invalidate(self):
+        """
+        Throws the cached surface away so that it is drawn again on the next frame. Called whenever the look of the
+        widget changes.
+        """
+        self._baked = None
+        self.changed = True
+
+    def baked(self):
+        """
+        Gets the cached surface of the widget, drawing it or getting a shared one if there is none.
+        :return: the surface
+        """
+        if self._baked is None:
+            key = self.key()
+            if key is None:
+                self._baked = asset_cache.prepare(self.bake())
+            else:
+                self._baked = asset_cache.baked((type(self).__name__,) + key, self.bake)
+        return self._baked
+
+    def draw(self, surface):
+        """
+        Draws the widget onto a given surface.
+        :param surface: the surface to draw the widget on
+        """
+        surface.blit(self.baked(), self.rect)
+
+    def dirty_rects(self):
+        """
+        Gets the regions of the screen that have changed since the last call.
+        :return: list of the changed regions
+        """
+        if not self.changed:
+            return []
+
+        self.changed = False
+        return [self.rect]
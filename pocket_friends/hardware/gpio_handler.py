@@ -2,7 +2,10 @@
 Module that helps with the handling of taking inputs from the GPIO pins on the Raspberry
 Pi and converting them to events to be used in other places (pygame, etc.)
 """
+from bisect import bisect_right
 import importlib.util
+import queue
+import time
 
 try:
     importlib.util.find_spec('RPi.GPIO')
@@ -25,12 +28,49 @@ class Constants:
         'j_r': 16  # Joystick right
     }
 
+    # Most button presses that can be waiting to be handled at once.
+    max_queued_presses = 64
+
+    # Seconds after an edge on a button during which another edge on it is taken as the button bouncing. The joystick
+    # bounces for longer than the buttons, especially once it is worn.
+    debounce_windows = {
+        'a': 0.03,
+        'b': 0.03,
+        'j_i': 0.05,
+        'j_u': 0.05,
+        'j_d': 0.05,
+        'j_l': 0.05,
+        'j_r': 0.05
+    }
+
+    # Upper edges in milliseconds of the buckets of the edge to event latency histogram. There is one more bucket for
+    # everything slower than the last edge.
+    latency_buckets = [1, 2, 5, 10, 20, 50, 100, 250]
+
 
 class GPIOHandler:
     """
     Class to handle the GPIO inputs from the buttons.
     """
 
+    # Button presses waiting to be handled, as (button, timestamp) tuples. Filled from the GPIO interrupt thread.
+    presses = queue.Queue(Constants.max_queued_presses)
+    # Number of presses thrown away because the queue was full.
+    dropped_presses = 0
+
+    # Debounce window in seconds of each button, by pin.
+    debounce_windows = {Constants.buttons[name]: window for name, window in Constants.debounce_windows.items()}
+    # Time of the last edge on each pin, whether it was a press or a bounce.
+    last_edges = {}
+
+    # Counters of every button by pin, to see how worn the buttons are.
+    accepted_presses = {}  # Presses put on the queue.
+    bounces = {}  # Edges thrown away as bounces.
+
+    # Number of presses in each bucket of the edge to event latency histogram, and the slowest press in seconds.
+    latency_histogram = [0] * (len(Constants.latency_buckets) + 1)
+    max_latency = 0.0
+
     @staticmethod
     def setup():
         """
@@ -46,13 +86,13 @@ class GPIOHandler:
         GPIO.setup(Constants.buttons.get('j_l'), GPIO.IN)
         GPIO.setup(Constants.buttons.get('j_r'), GPIO.IN)
 
-        GPIO.add_event_detect(Constants.buttons.get('a'), GPIO.FALLING)
-        GPIO.add_event_detect(Constants.buttons.get('b'), GPIO.FALLING)
-        GPIO.add_event_detect(Constants.buttons.get('j_i'), GPIO.FALLING)
-        GPIO.add_event_detect(Constants.buttons.get('j_u'), GPIO.FALLING)
-        GPIO.add_event_detect(Constants.buttons.get('j_d'), GPIO.FALLING)
-        GPIO.add_event_detect(Constants.buttons.get('j_l'), GPIO.FALLING)
-        GPIO.add_event_detect(Constants.buttons.get('j_r'), GPIO.FALLING)
+        GPIO.add_event_detect(Constants.buttons.get('a'), GPIO.FALLING, callback=GPIOHandler.queue_press)
+        GPIO.add_event_detect(Constants.buttons.get('b'), GPIO.FALLING, callback=GPIOHandler.queue_press)
+        GPIO.add_event_detect(Constants.buttons.get('j_i'), GPIO.FALLING, callback=GPIOHandler.queue_press)
+        GPIO.add_event_detect(Constants.buttons.get('j_u'), GPIO.FALLING, callback=GPIOHandler.queue_press)
+        GPIO.add_event_detect(Constants.buttons.get('j_d'), GPIO.FALLING, callback=GPIOHandler.queue_press)
+        GPIO.add_event_detect(Constants.buttons.get('j_l'), GPIO.FALLING, callback=GPIOHandler.queue_press)
+        GPIO.add_event_detect(Constants.buttons.get('j_r'), GPIO.FALLING, callback=GPIOHandler.queue_press)
 
     @staticmethod
     def teardown():
@@ -60,6 +100,8 @@ class GPIOHandler:
         Cleans up the GPIO handler.
         """
         GPIO.cleanup()
+        GPIOHandler.clear_presses()
+        GPIOHandler.last_edges.clear()
 
     @staticmethod
     def get_press(button):
@@ -69,3 +111,117 @@ class GPIOHandler:
         :return: True if the button is has been pressed, False otherwise
         """
         return GPIO.event_detected(button)
+
+    @staticmethod
+    def set_debounce(button, window):
+        """
+        Changes the debounce window of a button.
+        :param button: the name of the button, such as 'a' or 'j_u'
+        :param window: seconds after an edge during which another edge is taken as a bounce
+        """
+        GPIOHandler.debounce_windows[Constants.buttons[button]] = window
+
+    @staticmethod
+    def queue_press(button):
+        """
+        Adds a button press to the queue with the time it happened. Called by the GPIO library when a button is
+        pressed, on a thread of its own. Edges that come within the debounce window of the last edge on the same button
+        are counted as bounces and thrown away, so a bouncing button keeps its window open until it settles.
+        :param button: the button that was pressed
+        """
+        now = time.monotonic()
+        last = GPIOHandler.last_edges.get(button)
+        GPIOHandler.last_edges[button] = now
+
+        if last is not None and now - last < GPIOHandler.debounce_windows.get(button, 0):
+            GPIOHandler.bounces[button] = GPIOHandler.bounces.get(button, 0) + 1
+            return
+
+        try:
+            GPIOHandler.presses.put_nowait((button, now))
+        except queue.Full:
+            GPIOHandler.dropped_presses += 1
+        else:
+            GPIOHandler.accepted_presses[button] = GPIOHandler.accepted_presses.get(button, 0) + 1
+
+    @staticmethod
+    def record_latency(timestamp):
+        """
+        Adds the time from a press to it being taken off the queue to the latency histogram.
+        :param timestamp: the time of the press
+        """
+        latency = time.monotonic() - timestamp
+        GPIOHandler.latency_histogram[bisect_right(Constants.latency_buckets, latency * 1000)] += 1
+        GPIOHandler.max_latency = max(GPIOHandler.max_latency, latency)
+
+    @staticmethod
+    def get_presses():
+        """
+        Takes every waiting button press off of the queue without blocking.
+        :return: list of (button, timestamp) tuples in the order the buttons were pressed
+        """
+        presses = []
+        while True:
+            try:
+                press = GPIOHandler.presses.get_nowait()
+            except queue.Empty:
+                return presses
+
+            GPIOHandler.record_latency(press[1])
+            presses.append(press)
+
+    @staticmethod
+    def wait_for_press(timeout=None):
+        """
+        Blocks until a button is pressed.
+        :param timeout: the most seconds to wait for, or None to wait forever
+        :return: (button, timestamp) tuple of the press, or None if the timeout ran out
+        """
+        try:
+            press = GPIOHandler.presses.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+        GPIOHandler.record_latency(press[1])
+        return press
+
+    @staticmethod
+    def clear_presses():
+        """
+        Throws away every waiting button press.
+        """
+        while True:
+            try:
+                GPIOHandler.presses.get_nowait()
+            except queue.Empty:
+                return
+
+    @staticmethod
+    def stats():
+        """
+        Gets the counters of every button.
+        :return: dictionary of the presses and bounces of each button by name, the presses dropped, and the edge to
+        event latency histogram in milliseconds
+        """
+        names = {pin: name for name, pin in Constants.buttons.items()}
+        buckets = ['<{0}'.format(edge) for edge in Constants.latency_buckets]
+        buckets.append('>={0}'.format(Constants.latency_buckets[-1]))
+
+        return {
+            'presses': {names[pin]: GPIOHandler.accepted_presses.get(pin, 0) for pin in names},
+            'bounces': {names[pin]: GPIOHandler.bounces.get(pin, 0) for pin in names},
+            'dropped': GPIOHandler.dropped_presses,
+            'latency_ms': dict(zip(buckets, GPIOHandler.latency_histogram)),
+            'max_latency_ms': round(GPIOHandler.max_latency * 1000, 3),
+        }
+
+    @staticmethod
+    def reset_stats():
+        """
+        Sets every counter back to 0.
+        """
+        GPIOHandler.accepted_presses.clear()
+        GPIOHandler.bounces.clear()
+        GPIOHandler.dropped_presses = 0
+        GPIOHandler.latency_histogram = [0] * (len(Constants.latency_buckets) + 1)
+        GPIOHandler.max_latency = 0.0